@@ -1,22 +1,49 @@
 """
 MyManus智能体主入口程序
 """
-from src.mymanus import MyManus
+# 需在导入其他模块之前打补丁，使网络IO与线程同步原语在等待时让出执行权，多个请求才能并发处理
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+
+from src.config import KERNEL_POOL_ENABLED, JOB_WORKERS
+from src.mymanus import app, start_job_worker
+from src.services.artifact_service import ArtifactCollector
+from src.services.kernel_pool import get_kernel_pool
 from gevent import pywsgi
 
 
 def main():
     """
     主函数
+    
+    默认启动HTTP服务，并在同一进程中启动JOB_WORKERS个异步任务工作线程；
+    使用 --worker 时只运行任务工作线程，可与设置 JOB_WORKERS=0 的HTTP服务分开部署、独立扩容
     """
+    parser = argparse.ArgumentParser(description="MyManus智能体")
+    parser.add_argument("--worker", action="store_true", help="只运行异步任务工作线程，不启动HTTP服务")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKERS, help="异步任务工作线程数")
+    args = parser.parse_args()
+
     print("=" * 50)
     print("欢迎使用 MyManus 智能体!")
     print("基于DeepSeek的企业级智能体")
     print("=" * 50)
 
-    # 创建MyManus实例
-    print("初始化MyManus智能体...")
-    manus = MyManus()
+    # MyManus实例按会话创建，由src.mymanus中的会话存储统一管理
+    if KERNEL_POOL_ENABLED:
+        # 预先启动Python内核池，避免首个请求等待工作进程导入依赖
+        print("启动Python内核池...")
+        get_kernel_pool()
+    # 按磁盘配额定期清理图片目录
+    ArtifactCollector().start()
+    if args.worker:
+        print(f"启动 {args.concurrency} 个异步任务工作线程...")
+        start_job_worker(max(args.concurrency, 1)).join()
+        return
+    if args.concurrency > 0:
+        start_job_worker(args.concurrency)
     print("MyManus智能体已准备就绪！")
     # print("输入 'exit'、'quit' 或 'q' 退出对话")
     # print("输入 'reset' 或 'r' 重置对话")
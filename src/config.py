@@ -11,23 +11,175 @@ load_dotenv(override=True)
 # os.environ['HTTP_PROXY'] = 'http://127.0.0.1:7890'
 # os.environ['HTTPS_PROXY'] = 'http://127.0.0.1:7890'
 
+# 项目路径配置
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+
 # 模型API配置
 API_KEY = os.getenv("API_KEY")
 MODEL = os.getenv("MODEL")
 BASE_URL = os.getenv("BASE_URL")
 
+# 模型服务连接配置
+# 备用模型服务，按顺序依次尝试，逗号分隔，每项格式为 "base_url|model" 或 "base_url|model|api_key"
+LLM_FALLBACKS = [item.strip() for item in os.getenv('LLM_FALLBACKS', '').split(',') if item.strip()]
+LLM_POOL_SIZE = int(os.getenv('LLM_POOL_SIZE', '20'))
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '5'))
+LLM_READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', '120'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '2'))
+LLM_BACKOFF = float(os.getenv('LLM_BACKOFF', '0.5'))
+LLM_BACKOFF_MAX = float(os.getenv('LLM_BACKOFF_MAX', '8'))
+# 连续失败多少次后熔断，以及熔断后多少秒再放行试探请求
+LLM_BREAKER_THRESHOLD = int(os.getenv('LLM_BREAKER_THRESHOLD', '5'))
+LLM_BREAKER_COOLDOWN = float(os.getenv('LLM_BREAKER_COOLDOWN', '30'))
+# 非流式调用超过该秒数仍未返回时向下一个服务发送对冲请求，0表示不对冲
+LLM_HEDGE_DELAY = float(os.getenv('LLM_HEDGE_DELAY', '0'))
+
+# 模型回复缓存配置
+# 采样温度，未设置时使用模型服务的默认值
+LLM_TEMPERATURE = float(os.getenv('LLM_TEMPERATURE')) if os.getenv('LLM_TEMPERATURE') else None
+# off: 不缓存；on: 温度为0时读写缓存；record: 总是请求模型并记录回复；replay: 只从记录中回放，不访问网络
+LLM_CACHE_MODE = os.getenv('LLM_CACHE_MODE', 'off').lower()
+LLM_CACHE_DIR = os.getenv('LLM_CACHE_DIR', os.path.join(DATA_DIR, 'llm_cache'))
+LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', '256'))
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', str(24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
 # MySQL数据库配置
 DB_HOST = os.getenv("HOST")
 DB_USER = os.getenv("USER")
 DB_PASSWORD = os.getenv("MYSQL_PW")
 DB_NAME = os.getenv("DB_NAME")
 DB_PORT = os.getenv("PORT")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))
+DB_POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", "3600"))
+
+# SQL查询结果缓存配置
+SQL_CACHE_ENABLED = os.getenv("SQL_CACHE_ENABLED", "true").lower() == "true"
+SQL_CACHE_SIZE = int(os.getenv("SQL_CACHE_SIZE", "256"))
+SQL_CACHE_TTL = float(os.getenv("SQL_CACHE_TTL", "60"))
+SQL_CACHE_SCHEMA_TTL = float(os.getenv("SQL_CACHE_SCHEMA_TTL", "600"))
+SQL_CACHE_MAX_ROWS = int(os.getenv("SQL_CACHE_MAX_ROWS", "10000"))
+
+# 数据库结构索引配置
+SCHEMA_REFRESH_INTERVAL = float(os.getenv("SCHEMA_REFRESH_INTERVAL", "600"))
+SCHEMA_PROMPT_MAX_TOKENS = int(os.getenv("SCHEMA_PROMPT_MAX_TOKENS", "1500"))
+
+# 数据提取配置
+EXTRACT_CHUNK_SIZE = int(os.getenv("EXTRACT_CHUNK_SIZE", "10000"))
+EXTRACT_MAX_ROWS = int(os.getenv("EXTRACT_MAX_ROWS", "5000000"))
+EXTRACT_MAX_BYTES = int(os.getenv("EXTRACT_MAX_BYTES", str(1024 * 1024 * 1024)))
+EXTRACT_SPILL_BYTES = int(os.getenv("EXTRACT_SPILL_BYTES", str(256 * 1024 * 1024)))
+EXTRACT_SPILL_DIR = os.getenv("EXTRACT_SPILL_DIR", os.path.join(DATA_DIR, 'extract'))
+EXTRACT_SPILL_TTL = float(os.getenv("EXTRACT_SPILL_TTL", str(24 * 3600)))
 
 # GitHub配置
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+GITHUB_CACHE_DIR = os.getenv("GITHUB_CACHE_DIR", os.path.join(DATA_DIR, 'github'))
+GITHUB_CACHE_SIZE = int(os.getenv("GITHUB_CACHE_SIZE", "128"))
+GITHUB_CACHE_TTL = float(os.getenv("GITHUB_CACHE_TTL", str(30 * 24 * 3600)))
+GITHUB_CACHE_MAX_BYTES = int(os.getenv("GITHUB_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+GITHUB_FRESH_SECONDS = float(os.getenv("GITHUB_FRESH_SECONDS", "300"))
+GITHUB_MAX_WORKERS = int(os.getenv("GITHUB_MAX_WORKERS", "4"))
+GITHUB_RATE_LIMIT_WAIT = float(os.getenv("GITHUB_RATE_LIMIT_WAIT", "30"))
+GITHUB_README_MAX_CHARS = int(os.getenv("GITHUB_README_MAX_CHARS", "6000"))
+
+# HTTP客户端配置
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '3'))
+HTTP_BACKOFF = float(os.getenv('HTTP_BACKOFF', '0.5'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
 
 # 搜索配置
 SEARCH_API_KEY = os.getenv('SEARCH_API_KEY')
+SEARCH_MAX_WORKERS = int(os.getenv('SEARCH_MAX_WORKERS', '4'))
+SEARCH_CACHE_ENABLED = os.getenv('SEARCH_CACHE_ENABLED', 'true').lower() == 'true'
+SEARCH_CACHE_DIR = os.getenv('SEARCH_CACHE_DIR', os.path.join(DATA_DIR, 'auto_search'))
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', '256'))
+SEARCH_CACHE_TTL = float(os.getenv('SEARCH_CACHE_TTL', str(7 * 24 * 3600)))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv('SEARCH_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# 排放因子库配置
+# CSV为可编辑的数据源，SQLite库在CSV更新后自动重建
+EMISSION_FACTOR_CSV = os.getenv('EMISSION_FACTOR_CSV', os.path.join(DATA_DIR, 'factors', 'emission_factors.csv'))
+EMISSION_FACTOR_DB = os.getenv('EMISSION_FACTOR_DB', os.path.join(DATA_DIR, 'factors', 'emission_factors.db'))
+EMISSION_FACTOR_MATCH_CUTOFF = float(os.getenv('EMISSION_FACTOR_MATCH_CUTOFF', '0.6'))
+
+# 请求调度配置
+ANALYZE_MAX_CONCURRENCY = int(os.getenv('ANALYZE_MAX_CONCURRENCY', '4'))
+ANALYZE_MAX_QUEUE = int(os.getenv('ANALYZE_MAX_QUEUE', '16'))
+ANALYZE_QUEUE_TIMEOUT = float(os.getenv('ANALYZE_QUEUE_TIMEOUT', '30'))
+
+# /analyze 响应缓存配置（只缓存未携带session_id的请求）
+ANALYZE_CACHE_ENABLED = os.getenv('ANALYZE_CACHE_ENABLED', 'true').lower() == 'true'
+ANALYZE_CACHE_SIZE = int(os.getenv('ANALYZE_CACHE_SIZE', '256'))
+ANALYZE_CACHE_TTL = float(os.getenv('ANALYZE_CACHE_TTL', '3600'))
+
+# 异步任务配置
+JOB_DB_PATH = os.getenv('JOB_DB_PATH', os.path.join(DATA_DIR, 'jobs', 'jobs.db'))
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1'))
+JOB_STALE_SECONDS = float(os.getenv('JOB_STALE_SECONDS', '3600'))
+
+# 会话配置
+SESSION_MAX_SIZE = int(os.getenv('SESSION_MAX_SIZE', '256'))
+SESSION_TTL = float(os.getenv('SESSION_TTL', '3600'))
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory')
+SESSION_DIR = os.getenv('SESSION_DIR', os.path.join(DATA_DIR, 'sessions'))
+
+# 工具执行配置
+# 向模型公开的工具，逗号分隔
+ENABLED_TOOLS = [name.strip() for name in
+                 os.getenv('ENABLED_TOOLS', 'python_inter,fig_inter,calculate_emissions,lookup_emission_factor,expand_result').split(',') if name.strip()]
+TOOL_MAX_WORKERS = int(os.getenv('TOOL_MAX_WORKERS', '8'))
+TOOL_TIMEOUT = float(os.getenv('TOOL_TIMEOUT', '120'))
+# 按工具覆盖超时时间，格式如 "get_search_result=30,python_inter=300"
+TOOL_TIMEOUTS = {
+    name.strip(): float(seconds)
+    for name, seconds in (item.split('=') for item in os.getenv('TOOL_TIMEOUTS', '').split(',') if '=' in item)
+}
+
+# 智能体执行预算配置
+AGENT_MAX_STEPS = int(os.getenv('AGENT_MAX_STEPS', '10'))
+AGENT_DEADLINE = float(os.getenv('AGENT_DEADLINE', '300'))
+AGENT_TOKEN_BUDGET = int(os.getenv('AGENT_TOKEN_BUDGET', '200000'))
+
+# 上下文管理配置
+TOKENIZER_ENCODING = os.getenv('TOKENIZER_ENCODING', 'cl100k_base')
+CONTEXT_MAX_TOKENS = int(os.getenv('CONTEXT_MAX_TOKENS', '48000'))
+CONTEXT_SUMMARIZE = os.getenv('CONTEXT_SUMMARIZE', 'false').lower() == 'true'
+CONTEXT_SUMMARY_MAX_TOKENS = int(os.getenv('CONTEXT_SUMMARY_MAX_TOKENS', '1000'))
+
+# Python内核池配置
+KERNEL_POOL_ENABLED = os.getenv('KERNEL_POOL_ENABLED', 'true').lower() == 'true'
+KERNEL_POOL_SIZE = int(os.getenv('KERNEL_POOL_SIZE', str(min(4, os.cpu_count() or 1))))
+KERNEL_TIMEOUT = float(os.getenv('KERNEL_TIMEOUT', '60'))
+KERNEL_MAX_TASKS = int(os.getenv('KERNEL_MAX_TASKS', '200'))
+KERNEL_MEMORY_MB = int(os.getenv('KERNEL_MEMORY_MB', '2048'))
+KERNEL_CPU_SECONDS = int(os.getenv('KERNEL_CPU_SECONDS', '60'))
+
+# 图片渲染配置
+FIGURE_DIR = os.getenv('FIGURE_DIR', os.path.join(BASE_DIR, 'pics'))
+# 默认图片格式：png、svg或webp
+FIGURE_FORMAT = os.getenv('FIGURE_FORMAT', 'png').lower()
+FIGURE_DPI = int(os.getenv('FIGURE_DPI', '100'))
+FIGURE_MAX_DPI = int(os.getenv('FIGURE_MAX_DPI', '200'))
+# 图片长边的最大像素数
+FIGURE_MAX_PIXELS = int(os.getenv('FIGURE_MAX_PIXELS', '4000'))
+# 返回给调用方的图片地址前缀
+FIGURE_URL_PREFIX = os.getenv('FIGURE_URL_PREFIX', '/artifacts')
+# 图片目录的磁盘配额（字节，0表示不限制）及后台清理间隔（秒）
+FIGURE_MAX_BYTES = int(os.getenv('FIGURE_MAX_BYTES', str(1024 * 1024 * 1024)))
+FIGURE_GC_INTERVAL = float(os.getenv('FIGURE_GC_INTERVAL', '600'))
+
+# 工具结果渲染配置
+RESULT_MAX_CHARS = int(os.getenv('RESULT_MAX_CHARS', '4000'))
+RESULT_MAX_TOKENS = int(os.getenv('RESULT_MAX_TOKENS', '1500'))
+RESULT_PREVIEW_ROWS = int(os.getenv('RESULT_PREVIEW_ROWS', '5'))
+RESULT_STORE_SIZE = int(os.getenv('RESULT_STORE_SIZE', '32'))
 
 # 日志配置
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -0,0 +1,187 @@
+"""
+上下文管理模块，按token预算裁剪发送给模型的对话历史
+"""
+import json
+import logging
+
+from src.config import (CONTEXT_MAX_TOKENS, CONTEXT_SUMMARIZE, CONTEXT_SUMMARY_MAX_TOKENS,
+                        LOG_LEVEL, LOG_FORMAT)
+from src.utils.token_utils import count_message_tokens, count_tools_tokens, truncate_tokens
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "你负责压缩一段智能体的历史对话。请用简洁的中文总结其中的用户需求、已确认的参数与数据、"
+    "工具调用得到的关键结果以及尚未完成的事项，只保留后续对话需要用到的信息。"
+)
+SUMMARY_PREFIX = "以下是较早对话的摘要：\n"
+
+
+class ContextManager:
+    """
+    上下文管理类，增量统计对话历史的token数，超出预算时从最早的消息开始淘汰
+    """
+
+    def __init__(self, max_tokens=CONTEXT_MAX_TOKENS, summarize=CONTEXT_SUMMARIZE, llm=None,
+                 summary_max_tokens=CONTEXT_SUMMARY_MAX_TOKENS):
+        """
+        初始化上下文管理器
+
+        参数:
+        - max_tokens: 对话历史与工具定义合计的token上限，0表示不限制
+        - summarize: 是否将被淘汰的消息滚动总结为一条摘要消息
+        - llm: 用于生成摘要的LLMService实例，summarize为True时必须提供
+        - summary_max_tokens: 摘要消息的token上限
+        """
+        self.max_tokens = max_tokens
+        self.summarize = summarize and llm is not None
+        self.llm = llm
+        self.summary_max_tokens = summary_max_tokens
+        self.summary_message = None
+        # 按消息对象身份缓存的 {id: (消息对象, token数)}，持有对象引用以避免id被复用
+        self._counts = {}
+        self._tools_id = None
+        self._tools_tokens = 0
+
+    def count(self, messages):
+        """
+        统计每条消息的token数，仅对新增或被替换的消息重新计数
+
+        参数:
+        - messages: 对话消息列表
+
+        返回:
+        - 与messages对应的token数列表
+        """
+        counts = {}
+        for message in messages:
+            cached = self._counts.get(id(message))
+            if cached is not None and cached[0] is message:
+                counts[id(message)] = cached
+            else:
+                counts[id(message)] = (message, count_message_tokens(message))
+        self._counts = counts
+        return [counts[id(message)][1] for message in messages]
+
+    def tools_tokens(self, tools):
+        """
+        统计工具定义的token数，工具列表不变时直接复用结果
+        """
+        if tools is not self._tools_id:
+            self._tools_id = tools
+            self._tools_tokens = count_tools_tokens(tools)
+        return self._tools_tokens
+
+    def total_tokens(self, messages, tools=None):
+        """
+        计算对话历史与工具定义合计的token数
+
+        参数:
+        - messages: 对话消息列表
+        - tools: 工具定义列表
+
+        返回:
+        - token总数（int）
+        """
+        return sum(self.count(messages)) + self.tools_tokens(tools)
+
+    def fit(self, messages, tools=None):
+        """
+        原地裁剪对话历史，使其不超过token预算
+
+        开头的system消息与摘要消息始终保留；带tool_calls的assistant消息与其后的tool消息作为整体淘汰，
+        最后一条user消息及之后的当前轮次消息不会被淘汰。
+
+        参数:
+        - messages: 对话消息列表（会被原地修改）
+        - tools: 工具定义列表
+
+        返回:
+        - 被淘汰的消息条数
+        """
+        if not self.max_tokens:
+            return 0
+        counts = self.count(messages)
+        total = sum(counts) + self.tools_tokens(tools)
+        if total <= self.max_tokens:
+            return 0
+
+        evicted_indexes = set()
+        for unit in self._evictable_units(messages):
+            if total <= self.max_tokens:
+                break
+            evicted_indexes.update(unit)
+            total -= sum(counts[index] for index in unit)
+        if not evicted_indexes:
+            logger.warning(f"当前轮次对话已超出上下文预算（{total} > {self.max_tokens} tokens），无可淘汰的历史消息")
+            return 0
+
+        evicted = [messages[index] for index in sorted(evicted_indexes)]
+        messages[:] = [message for index, message in enumerate(messages) if index not in evicted_indexes]
+        logger.info(f"上下文超出预算，已淘汰 {len(evicted)} 条较早的消息")
+
+        if self.summarize:
+            self._update_summary(messages, evicted)
+        return len(evicted)
+
+    def _evictable_units(self, messages):
+        """
+        将可淘汰的历史消息按从旧到新划分为若干整体
+
+        返回:
+        - 由消息下标列表组成的列表
+        """
+        last_user = max((index for index, message in enumerate(messages) if message.get("role") == "user"),
+                        default=len(messages))
+        units = []
+        leading = True
+        for index, message in enumerate(messages[:last_user]):
+            role = message.get("role")
+            leading = leading and role == "system"
+            if leading or message is self.summary_message:
+                # 开头的system提示与摘要消息始终保留
+                continue
+            if role == "tool" and units:
+                # tool消息与发起调用的assistant消息一同淘汰
+                units[-1].append(index)
+            else:
+                units.append([index])
+        return units
+
+    def _update_summary(self, messages, evicted):
+        """
+        将被淘汰的消息与已有摘要合并为新的摘要，并放在开头的system消息之后
+        """
+        previous = self.summary_message["content"][len(SUMMARY_PREFIX):] if self.summary_message else ""
+        transcript = "\n".join(
+            f"[{message.get('role')}] {message.get('content') or ''}"
+            + (f" 调用工具: {json.dumps(message['tool_calls'], ensure_ascii=False)}" if message.get("tool_calls") else "")
+            for message in evicted
+        )
+        prompt = (f"已有摘要：\n{previous}\n\n" if previous else "") + f"需要合并的对话：\n{transcript}"
+        try:
+            summary = self.llm.chat_completion([
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": prompt},
+            ])
+        except Exception as e:
+            logger.error(f"生成对话摘要失败: {str(e)}")
+            return
+
+        summary_message = {"role": "system",
+                           "content": SUMMARY_PREFIX + truncate_tokens(summary or "", self.summary_max_tokens)}
+        if self.summary_message is not None:
+            for index, message in enumerate(messages):
+                if message is self.summary_message:
+                    messages[index] = summary_message
+                    break
+            else:
+                self.summary_message = None
+        if self.summary_message is None:
+            position = 0
+            while position < len(messages) and messages[position].get("role") == "system":
+                position += 1
+            messages.insert(position, summary_message)
+        self.summary_message = summary_message
@@ -1,52 +1,305 @@
 """
 大语言模型接口模块，提供与模型交互的功能
 """
-from openai import OpenAI
+import threading
 
-from src.config import API_KEY, MODEL, BASE_URL
+from openai.types.chat import ChatCompletionMessage
+
+from src.config import (MODEL, LLM_TEMPERATURE, LLM_CACHE_MODE, LLM_CACHE_DIR, LLM_CACHE_SIZE, LLM_CACHE_TTL,
+                        LLM_CACHE_MAX_BYTES)
+from src.models.provider import get_llm_provider
+from src.utils.cache_utils import PersistentCache, make_cache_key
+
+
+class CompletionCacheMiss(RuntimeError):
+    """回放模式下请求的回复不在记录中"""
+
+
+def message_to_dict(message):
+    """
+    将模型返回的消息对象转换为可直接放入对话历史的字典
+
+    参数:
+    - message: 模型回复消息对象
+
+    返回:
+    - 消息字典（仅包含role、content及tool_calls字段）
+    """
+    result = {"role": "assistant", "content": message.content}
+    if getattr(message, 'tool_calls', None):
+        result["tool_calls"] = [
+            {
+                "id": tool_call.id,
+                "type": "function",
+                "function": {
+                    "name": tool_call.function.name,
+                    "arguments": tool_call.function.arguments,
+                },
+            }
+            for tool_call in message.tool_calls
+        ]
+    return result
+
+
+def usage_to_dict(usage):
+    """
+    将模型返回的用量对象转换为字典
+
+    参数:
+    - usage: 响应中的usage对象，可能为None
+
+    返回:
+    - 用量字典（包含prompt_tokens、completion_tokens、total_tokens等字段）
+    """
+    if usage is None:
+        return {}
+    return usage.model_dump(exclude_none=True)
+
+
+def cached_prompt_tokens(usage):
+    """
+    读取用量字典中命中模型服务端前缀缓存的提示词token数
+
+    参数:
+    - usage: usage_to_dict返回的用量字典
+
+    返回:
+    - 命中缓存的token数（DeepSeek为prompt_cache_hit_tokens，OpenAI为prompt_tokens_details.cached_tokens）
+    """
+    if usage.get("prompt_cache_hit_tokens") is not None:
+        return usage["prompt_cache_hit_tokens"]
+    return (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+
+
+def create_completion_cache(mode=LLM_CACHE_MODE):
+    """
+    按缓存模式创建模型回复缓存
+
+    参数:
+    - mode: off、on、record或replay
+
+    返回:
+    - PersistentCache实例，mode为off时返回None
+    """
+    if mode == 'off':
+        return None
+    if mode == 'on':
+        return PersistentCache(LLM_CACHE_DIR, maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL,
+                               max_bytes=LLM_CACHE_MAX_BYTES)
+    # 记录的回复用于回放，不过期也不按容量淘汰
+    return PersistentCache(LLM_CACHE_DIR, maxsize=LLM_CACHE_SIZE)
 
 
 class LLMService:
     """
     大语言模型服务类，封装了与模型交互的方法
     """
-    def __init__(self):
+    def __init__(self, provider=None, cache_mode=LLM_CACHE_MODE, temperature=LLM_TEMPERATURE):
         """
         初始化LLM服务
+
+        参数:
+        - provider: 可选的LLMProvider实例，默认使用进程内共享的实例（连接池、熔断状态在各会话间共享）
+        - cache_mode: 函数调用回复的缓存模式，off、on（仅温度为0时生效）、record或replay
+        - temperature: 采样温度，None表示使用模型服务的默认值
         """
-        self.client = OpenAI(api_key=API_KEY, base_url=BASE_URL)
+        if cache_mode not in ('off', 'on', 'record', 'replay'):
+            raise ValueError(f"未知的缓存模式: {cache_mode}")
         self.model = MODEL
-        
+        self.temperature = temperature
+        self.cache_mode = cache_mode
+        self.cache = create_completion_cache(cache_mode)
+        # 首次请求模型时才创建到模型服务的连接，回放模式下全部命中记录时无需配置模型服务
+        self._provider = provider
+        # 累计的提示词token数及其中命中服务端前缀缓存的部分
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self._usage_lock = threading.Lock()
+
+    @property
+    def provider(self):
+        if self._provider is None:
+            self._provider = get_llm_provider()
+        return self._provider
+
+    def stats(self):
+        """
+        返回模型服务与回复缓存的运行指标
+
+        返回:
+        - 包含provider与cache的字典，尚未创建或未启用时为None
+        """
+        with self._usage_lock:
+            prompt_cache = {
+                "prompt_tokens": self.prompt_tokens,
+                "cached_prompt_tokens": self.cached_prompt_tokens,
+                "hit_rate": round(self.cached_prompt_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+            }
+        return {
+            "provider": self._provider.stats() if self._provider is not None else None,
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "prompt_cache": prompt_cache,
+        }
+
+    def _record_usage(self, usage):
+        with self._usage_lock:
+            self.prompt_tokens += usage.get("prompt_tokens", 0)
+            self.cached_prompt_tokens += cached_prompt_tokens(usage)
+
+    def _sampling_kwargs(self):
+        return {} if self.temperature is None else {"temperature": self.temperature}
+
+    def _cache_key(self, messages, tools, tool_choice):
+        """
+        计算函数调用回复的缓存键，不使用缓存时返回None
+
+        模型、工具定义、对话消息、工具选择策略与温度完全相同时才视为同一请求
+        """
+        if self.cache is None or (self.cache_mode == 'on' and self.temperature != 0):
+            return None
+        return make_cache_key(self.model, tools, messages, tool_choice, self.temperature)
+
+    def _cached_reply(self, key):
+        """
+        读取缓存的回复，record模式总是请求模型
+
+        返回:
+        - {"message": assistant消息字典, "usage": 用量字典}，未命中时返回None
+        """
+        if key is None or self.cache_mode == 'record':
+            return None
+        entry = self.cache.get(key)
+        if entry is None and self.cache_mode == 'replay':
+            raise CompletionCacheMiss(f"回放记录中没有该请求的回复（缓存键 {key}）")
+        return entry
+
+    def _save_reply(self, key, message, usage):
+        if key is not None:
+            self.cache.set(key, {"message": message, "usage": usage})
+
     def chat_completion(self, messages):
         """
         调用模型进行对话生成
-        
+
         参数:
         - messages: 对话消息列表
-        
+
         返回:
         - 模型回复内容
         """
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages
-        )
+        response = self.provider.create(messages=messages, **self._sampling_kwargs())
         return response.choices[0].message.content
-    
-    def function_calling(self, messages, tools):
+
+    def chat_completion_stream(self, messages):
+        """
+        以流式方式调用模型进行对话生成
+
+        参数:
+        - messages: 对话消息列表
+
+        返回:
+        - 生成器，逐段产出模型回复的文本片段
+        """
+        stream = self.provider.create(messages=messages, stream=True, **self._sampling_kwargs())
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def function_calling(self, messages, tools, tool_choice=None, return_usage=False):
         """
         调用模型进行函数调用
-        
+
         参数:
         - messages: 对话消息列表
         - tools: 工具列表
-        
+        - tool_choice: 可选的工具选择策略，如 "none" 表示禁止继续调用工具
+        - return_usage: 是否同时返回本次调用的token用量
+
         返回:
-        - 模型回复或工具调用结果
+        - 模型回复或工具调用结果；return_usage为True时返回 (回复, 用量字典)，命中缓存时用量字典为 {"cached": True}
         """
-        response = self.client.chat.completions.create(
-            model=self.model,
+        key = self._cache_key(messages, tools, tool_choice)
+        entry = self._cached_reply(key)
+        if entry is not None:
+            message, usage = ChatCompletionMessage.model_validate(entry["message"]), {"cached": True}
+        else:
+            kwargs = {"tool_choice": tool_choice} if tool_choice else {}
+            # 非流式调用需等待完整回复，主服务迟迟未返回时可向备用服务发送对冲请求
+            response = self.provider.create(hedge=True, messages=messages, tools=tools,
+                                            **kwargs, **self._sampling_kwargs())
+            message, usage = response.choices[0].message, usage_to_dict(response.usage)
+            self._record_usage(usage)
+            self._save_reply(key, message_to_dict(message), usage)
+        if return_usage:
+            return message, usage
+        return message
+
+    def function_calling_stream(self, messages, tools, tool_choice=None):
+        """
+        以流式方式调用模型进行函数调用，并增量拼装工具调用片段
+
+        参数:
+        - messages: 对话消息列表
+        - tools: 工具列表
+        - tool_choice: 可选的工具选择策略，如 "none" 表示禁止继续调用工具
+
+        返回:
+        - 生成器，产出事件字典：
+          {"type": "token", "content": 文本片段}，
+          以及最后一个 {"type": "message", "message": 完整的assistant消息字典, "usage": 用量字典}
+        """
+        key = self._cache_key(messages, tools, tool_choice)
+        entry = self._cached_reply(key)
+        if entry is not None:
+            # 命中缓存时一次性推送完整文本
+            if entry["message"].get("content"):
+                yield {"type": "token", "content": entry["message"]["content"]}
+            yield {"type": "message", "message": entry["message"], "usage": {"cached": True}}
+            return
+
+        kwargs = {"tool_choice": tool_choice} if tool_choice else {}
+        stream = self.provider.create(
             messages=messages,
-            tools=tools
+            tools=tools,
+            stream=True,
+            stream_options={"include_usage": True},
+            **kwargs,
+            **self._sampling_kwargs()
         )
-        return response.choices[0].message 
\ No newline at end of file
+
+        content_parts = []
+        # 按index拼装工具调用，模型会将id、name、arguments拆分在多个chunk中返回
+        tool_calls = {}
+        usage = {}
+        for chunk in stream:
+            if getattr(chunk, 'usage', None):
+                # 开启include_usage后，最后一个chunk的choices为空，仅携带用量
+                usage = usage_to_dict(chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+
+            if delta.content:
+                content_parts.append(delta.content)
+                yield {"type": "token", "content": delta.content}
+
+            for tool_call_delta in delta.tool_calls or []:
+                tool_call = tool_calls.setdefault(tool_call_delta.index, {
+                    "id": "",
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""},
+                })
+                if tool_call_delta.id:
+                    tool_call["id"] = tool_call_delta.id
+                if tool_call_delta.function:
+                    if tool_call_delta.function.name:
+                        tool_call["function"]["name"] += tool_call_delta.function.name
+                    if tool_call_delta.function.arguments:
+                        tool_call["function"]["arguments"] += tool_call_delta.function.arguments
+
+        message = {"role": "assistant", "content": "".join(content_parts) or None}
+        if tool_calls:
+            message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+        self._record_usage(usage)
+        self._save_reply(key, message, usage)
+        yield {"type": "message", "message": message, "usage": usage}
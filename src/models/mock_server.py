@@ -0,0 +1,131 @@
+"""
+本地模拟模型服务，实现OpenAI兼容的 /v1/chat/completions 接口，用于离线调试与测试
+
+用法:
+    python -m src.models.mock_server --port 8808 --delay 0.5 --fail-rate 0.2
+并设置 BASE_URL=http://127.0.0.1:8808/v1（API_KEY 可为任意非空值）
+"""
+import os
+import json
+import time
+import uuid
+import random
+import argparse
+from collections import deque
+
+from flask import Flask, Response, request
+
+app = Flask(__name__)
+
+# 模拟服务的行为，可通过命令行参数修改
+settings = {
+    "delay": 0.0,
+    "fail_rate": 0.0,
+    "fail_status": 503,
+}
+
+# 最近的请求提示词，用于模拟前缀缓存
+_recent_prompts = deque(maxlen=64)
+
+
+def mock_reply(messages):
+    """
+    根据最后一条用户消息生成固定格式的回复，相同输入总是得到相同输出
+
+    参数:
+    - messages: 对话消息列表
+
+    返回:
+    - 回复文本
+    """
+    last_user = next((message for message in reversed(messages) if message.get("role") == "user"), None)
+    content = (last_user or {}).get("content") or ""
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return f"[mock] 已收到: {content[:200]}"
+
+
+def usage_for(body, reply):
+    """
+    按字符数粗略估计token用量，并按与此前请求的最长公共前缀模拟服务端的前缀缓存命中
+    """
+    prompt = json.dumps([body.get("tools"), body.get("messages", [])], ensure_ascii=False)
+    hit = max((len(os.path.commonprefix([prompt, previous])) for previous in _recent_prompts), default=0)
+    _recent_prompts.append(prompt)
+    prompt_tokens = len(prompt) // 2
+    completion_tokens = max(len(reply) // 2, 1)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_cache_hit_tokens": hit // 2,
+        "prompt_cache_miss_tokens": prompt_tokens - hit // 2,
+    }
+
+
+def stream_chunks(completion_id, model, reply, usage, include_usage):
+    """
+    以server-sent events形式逐段产出回复
+    """
+    base = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+    for index in range(0, len(reply), 8):
+        delta = {"content": reply[index:index + 8]}
+        if index == 0:
+            delta["role"] = "assistant"
+        chunk = dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}])
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+    yield f"data: {json.dumps(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))}\n\n"
+    if include_usage:
+        yield f"data: {json.dumps(dict(base, choices=[], usage=usage))}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.route(rule='/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    """
+    模拟 chat.completions 接口，按配置延迟响应或随机返回错误
+    """
+    body = request.get_json()
+    if settings["delay"]:
+        time.sleep(settings["delay"])
+    if random.random() < settings["fail_rate"]:
+        status = settings["fail_status"]
+        return {"error": {"message": "mock failure", "type": "server_error", "code": status}}, status
+
+    messages = body.get("messages", [])
+    model = body.get("model") or "mock"
+    reply = mock_reply(messages)
+    usage = usage_for(body, reply)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    if body.get("stream"):
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+        return Response(stream_chunks(completion_id, model, reply, usage, include_usage),
+                        mimetype='text/event-stream')
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": reply},
+            "finish_reason": "stop",
+        }],
+        "usage": usage,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟模型服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--delay", type=float, default=0.0, help="每个请求的响应延迟（秒）")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="随机返回错误的比例（0~1）")
+    parser.add_argument("--fail-status", type=int, default=503, help="返回错误时的HTTP状态码")
+    args = parser.parse_args()
+    settings.update(delay=args.delay, fail_rate=args.fail_rate, fail_status=args.fail_status)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
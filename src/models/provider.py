@@ -0,0 +1,324 @@
+"""
+模型服务提供方模块，管理到一个或多个OpenAI兼容服务的连接，负责超时、重试、熔断、备用服务切换与对冲请求
+"""
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait, FIRST_COMPLETED
+
+import httpx
+import openai
+from openai import OpenAI
+
+from src.config import (
+    API_KEY, MODEL, BASE_URL, LLM_FALLBACKS, LLM_POOL_SIZE, LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT,
+    LLM_MAX_RETRIES, LLM_BACKOFF, LLM_BACKOFF_MAX, LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN,
+    LLM_HEDGE_DELAY, LOG_LEVEL, LOG_FORMAT
+)
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# 可重试的HTTP状态码（另外所有5xx均可重试）
+RETRY_STATUS_CODES = (408, 409, 429)
+
+# 服务本身的问题（鉴权失败、模型不存在等），不重试但可切换到备用服务
+FALLBACK_STATUS_CODES = (401, 403, 404)
+
+
+class LLMUnavailableError(RuntimeError):
+    """所有模型服务均已熔断，没有可用的服务"""
+
+
+def _is_retryable(error):
+    if isinstance(error, openai.APIConnectionError):
+        # 包括连接失败与超时
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRY_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+def _should_fallback(error):
+    if isinstance(error, LLMUnavailableError) or _is_retryable(error):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in FALLBACK_STATUS_CODES
+
+
+def _retry_after(error):
+    """
+    读取429/503响应中的Retry-After秒数，没有时返回None
+    """
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败达到阈值后熔断，冷却期内拒绝请求；
+    冷却期结束后只放行一个试探请求，成功则恢复，失败则重新熔断
+    """
+
+    def __init__(self, threshold=LLM_BREAKER_THRESHOLD, cooldown=LLM_BREAKER_COOLDOWN):
+        """
+        Args:
+            threshold (int): 熔断前允许的连续失败次数，0表示不熔断
+            cooldown (float): 熔断后的冷却时间（秒）
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return 'open'
+        return 'half_open'
+
+    def allow(self):
+        """
+        判断是否放行请求
+
+        Returns:
+            bool: 是否放行
+        """
+        if self.threshold <= 0:
+            return True
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'open' or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.threshold > 0 and (self._probing or self.failures >= self.threshold):
+                if self.opened_at is None or self._probing:
+                    logger.warning(f"模型服务连续失败 {self.failures} 次，熔断 {self.cooldown} 秒")
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+
+class Endpoint:
+    """单个模型服务：服务地址、模型名称、连接池大小受限的客户端及其熔断器"""
+
+    def __init__(self, base_url, model, api_key=API_KEY, pool_size=LLM_POOL_SIZE,
+                 connect_timeout=LLM_CONNECT_TIMEOUT, read_timeout=LLM_READ_TIMEOUT, breaker=None):
+        """
+        初始化模型服务
+
+        Args:
+            base_url (str): 服务的基础URL
+            model (str): 模型名称
+            api_key (str): API密钥
+            pool_size (int): HTTP连接池的最大连接数
+            connect_timeout (float): 建立连接的超时时间（秒）
+            read_timeout (float): 等待响应数据的超时时间（秒）
+            breaker (CircuitBreaker): 熔断器，默认新建
+        """
+        self.base_url = base_url
+        self.model = model
+        self.name = f"{model}@{base_url}"
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=timeout,
+        )
+        # 重试由LLMProvider统一处理，客户端自身不再重试
+        self.client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client,
+                             timeout=timeout, max_retries=0)
+        self.breaker = breaker or CircuitBreaker()
+        self.calls = 0
+        self.failures = 0
+
+    def stats(self):
+        return {"name": self.name, "calls": self.calls, "failures": self.failures, "state": self.breaker.state}
+
+
+class LLMProvider:
+    """
+    模型服务提供方：按顺序使用各个服务，单个服务的可重试错误按带随机抖动的指数退避重试，
+    重试用尽、服务熔断或鉴权失败时切换到下一个服务
+    """
+
+    def __init__(self, endpoints, max_retries=LLM_MAX_RETRIES, backoff=LLM_BACKOFF, backoff_max=LLM_BACKOFF_MAX,
+                 hedge_delay=LLM_HEDGE_DELAY):
+        """
+        初始化模型服务提供方
+
+        Args:
+            endpoints (list): Endpoint列表，第一个为主服务，其余按顺序作为备用服务
+            max_retries (int): 单个服务的最大重试次数
+            backoff (float): 退避的基础秒数，第n次重试最多等待 backoff * 2^n 秒
+            backoff_max (float): 单次退避的最长秒数，服务要求等待更久时直接切换到备用服务
+            hedge_delay (float): 对冲请求的等待秒数，0表示不对冲
+        """
+        self.endpoints = list(endpoints)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge_delay = hedge_delay
+        self.hedged = 0
+        self._hedge_pool = None
+        self._lock = threading.Lock()
+        logger.info(f"LLMProvider 初始化完成，模型服务: {', '.join(endpoint.name for endpoint in self.endpoints)}")
+
+    def create(self, hedge=False, **kwargs):
+        """
+        调用 chat.completions.create，model参数由各服务的配置决定
+
+        Args:
+            hedge (bool): 是否对冲，仅用于非流式调用：主请求超过hedge_delay秒未返回时，
+                向下一个服务再发送一次相同的请求，采用先成功的结果
+            **kwargs: 传给 chat.completions.create 的其余参数，可包含单次调用的timeout
+
+        Returns:
+            ChatCompletion 或流式响应
+        """
+        if hedge and self.hedge_delay > 0 and len(self.endpoints) > 1 and not kwargs.get('stream'):
+            return self._create_hedged(kwargs)
+        return self._create(self.endpoints, kwargs)
+
+    def stats(self):
+        """
+        返回各服务的调用次数、失败次数与熔断状态
+        """
+        return {"endpoints": [endpoint.stats() for endpoint in self.endpoints], "hedged": self.hedged}
+
+    def _create(self, endpoints, kwargs):
+        last_error = None
+        for endpoint in endpoints:
+            try:
+                return self._call(endpoint, kwargs)
+            except Exception as e:
+                if not _should_fallback(e):
+                    raise
+                last_error = e
+                logger.warning(f"模型服务 {endpoint.name} 调用失败: {str(e)}")
+        raise last_error or LLMUnavailableError("没有可用的模型服务")
+
+    def _call(self, endpoint, kwargs):
+        """
+        调用单个服务，可重试的错误在退避后重试
+        """
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if not endpoint.breaker.allow():
+                break
+            endpoint.calls += 1
+            try:
+                response = endpoint.client.chat.completions.create(model=endpoint.model, **kwargs)
+            except Exception as e:
+                if not _should_fallback(e):
+                    # 请求本身有误（如参数错误），服务是正常的
+                    endpoint.breaker.record_success()
+                    raise
+                endpoint.failures += 1
+                endpoint.breaker.record_failure()
+                last_error = e
+                delay = self._backoff_delay(attempt, e)
+                if (not _is_retryable(e) or attempt >= self.max_retries or delay is None
+                        or endpoint.breaker.state == 'open'):
+                    break
+                logger.warning(f"模型服务 {endpoint.name} 调用失败: {str(e)}，{delay:.2f} 秒后重试")
+                time.sleep(delay)
+                continue
+            endpoint.breaker.record_success()
+            return response
+        raise last_error or LLMUnavailableError(f"模型服务 {endpoint.name} 已熔断")
+
+    def _backoff_delay(self, attempt, error):
+        """
+        计算第attempt次失败后的等待秒数（full jitter），服务要求的等待时间超过backoff_max时返回None
+        """
+        retry_after = _retry_after(error)
+        if retry_after is not None and retry_after > self.backoff_max:
+            return None
+        delay = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+        return max(delay, retry_after or 0)
+
+    def _create_hedged(self, kwargs):
+        pool = self._get_hedge_pool()
+        primary = pool.submit(self._create, self.endpoints, kwargs)
+        try:
+            return primary.result(timeout=self.hedge_delay)
+        except FutureTimeoutError:
+            pass
+        # 主请求迟迟未返回，从下一个服务开始发送对冲请求；未被采用的请求无法取消，会在后台执行完毕
+        with self._lock:
+            self.hedged += 1
+        secondary = pool.submit(self._create, self.endpoints[1:] + self.endpoints[:1], kwargs)
+        pending, errors = {primary, secondary}, []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                errors.append(future.exception())
+        raise errors[0]
+
+    def _get_hedge_pool(self):
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=LLM_POOL_SIZE, thread_name_prefix="llm-hedge")
+            return self._hedge_pool
+
+
+def parse_endpoints(primary=(BASE_URL, MODEL, API_KEY), fallbacks=LLM_FALLBACKS):
+    """
+    根据配置创建服务列表
+
+    Args:
+        primary (tuple): 主服务的 (base_url, model, api_key)
+        fallbacks (list): 备用服务，每项格式为 "base_url|model" 或 "base_url|model|api_key"
+
+    Returns:
+        list: Endpoint列表
+    """
+    endpoints = [Endpoint(*primary)]
+    for item in fallbacks:
+        parts = [part.strip() for part in item.split('|')]
+        if len(parts) < 2:
+            raise ValueError(f"LLM_FALLBACKS 配置格式错误: {item}")
+        endpoints.append(Endpoint(parts[0], parts[1], parts[2] if len(parts) > 2 and parts[2] else primary[2]))
+    return endpoints
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_llm_provider():
+    """
+    获取进程内共享的模型服务提供方
+
+    Returns:
+        LLMProvider: 模型服务提供方
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = LLMProvider(parse_endpoints())
+        return _provider
@@ -0,0 +1,248 @@
+"""
+工具注册模块，声明可用工具及其实现位置，按需导入实现并根据函数签名生成工具定义
+"""
+import ast
+import json
+import logging
+import importlib
+import importlib.util
+import re
+import threading
+from collections.abc import Mapping
+from functools import lru_cache
+
+from src.config import ENABLED_TOOLS, LOG_LEVEL, LOG_FORMAT
+from src.models import tools
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# 由运行环境注入、不向模型公开的参数
+HIDDEN_PARAMS = {"g", "session_id"}
+
+# 默认值类型到JSON Schema类型的映射
+_JSON_TYPES = {bool: "boolean", int: "integer", float: "number", str: "string"}
+
+# 文档字符串中形如 "- name: 说明" 的参数说明
+_PARAM_DOC_PATTERN = re.compile(r"^\s*-\s*(\w+)\s*[:：]\s*(.+?)\s*$", re.M)
+
+
+class ToolSpec:
+    """单个工具的声明：工具名、实现所在的模块及函数名，以及可选的手写工具定义"""
+
+    def __init__(self, name, module, function=None, schema=None):
+        """
+        初始化工具声明
+
+        Args:
+            name (str): 工具名
+            module (str): 实现所在的模块，如 'src.services.python_service'
+            function (str): 函数名，默认与工具名相同
+            schema (callable): 返回手写工具定义的函数，其中的描述优先于文档字符串
+        """
+        self.name = name
+        self.module = module
+        self.function = function or name
+        self.schema = schema
+
+
+# 全部工具声明，顺序即向模型公开的顺序
+TOOL_SPECS = [
+    ToolSpec("python_inter", "src.services.python_service", schema=tools.get_python_tool),
+    ToolSpec("fig_inter", "src.services.python_service", schema=tools.get_fig_tool),
+    ToolSpec("sql_inter", "src.services.db_service", schema=tools.get_sql_tool),
+    ToolSpec("lookup_schema", "src.services.schema_service", schema=tools.get_lookup_schema_tool),
+    ToolSpec("extract_data", "src.services.db_service", schema=tools.get_extract_data_tool),
+    ToolSpec("get_search_result", "src.services.search_service", schema=tools.get_search_tool),
+    ToolSpec("get_answer_github", "src.services.search_service", schema=tools.get_github_search_tool),
+    ToolSpec("read_github_readme", "src.services.github_service", schema=tools.get_github_readme_tool),
+    ToolSpec("calculate_emissions", "src.services.emission_service", schema=tools.get_emission_tool),
+    ToolSpec("lookup_emission_factor", "src.services.factor_service", schema=tools.get_emission_factor_tool),
+    ToolSpec("expand_result", "src.services.python_service", schema=tools.get_expand_result_tool),
+]
+
+
+def _find_function(module, function):
+    """
+    在不导入模块的情况下解析其源码，找到函数定义
+
+    Returns:
+        (ast.FunctionDef, 文档字符串)
+    """
+    spec = importlib.util.find_spec(module)
+    if spec is None or spec.origin is None:
+        raise ValueError(f"找不到模块 {module}")
+    with open(spec.origin, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=spec.origin)
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == function:
+            return node, ast.get_docstring(node) or ""
+    raise ValueError(f"模块 {module} 中没有函数 {function}")
+
+
+def _signature_params(node):
+    """
+    从函数定义中读取参数名与默认值
+
+    Returns:
+        list: [(参数名, 是否有默认值, 默认值)]，默认值不是字面量时为None
+    """
+    args = node.args.posonlyargs + node.args.args
+    defaults = [None] * (len(args) - len(node.args.defaults)) + list(node.args.defaults)
+    params = list(zip(args, defaults)) + list(zip(node.args.kwonlyargs, node.args.kw_defaults))
+    result = []
+    for arg, default in params:
+        value = default.value if isinstance(default, ast.Constant) else None
+        result.append((arg.arg, default is not None, value))
+    return result
+
+
+@lru_cache(maxsize=None)
+def build_schema(name):
+    """
+    根据函数签名生成工具定义并缓存：参数列表、是否必填以签名为准，
+    参数及工具的描述优先使用手写定义，其次使用文档字符串
+
+    Args:
+        name (str): 工具名
+
+    Returns:
+        dict: OpenAI工具定义
+    """
+    spec = next((item for item in TOOL_SPECS if item.name == name), None)
+    if spec is None:
+        raise ValueError(f"未注册的工具: {name}")
+    node, docstring = _find_function(spec.module, spec.function)
+    base = spec.schema()["function"] if spec.schema else {}
+    base_properties = base.get("parameters", {}).get("properties", {})
+    param_docs = dict(_PARAM_DOC_PATTERN.findall(docstring))
+
+    properties, required = {}, []
+    for param_name, has_default, default in _signature_params(node):
+        if param_name in HIDDEN_PARAMS:
+            continue
+        if param_name in base_properties:
+            prop = dict(base_properties[param_name])
+        else:
+            prop = {"type": _JSON_TYPES.get(type(default), "string"),
+                    "description": param_docs.get(param_name, param_name)}
+        if has_default:
+            if default is not None:
+                prop.setdefault("default", default)
+        else:
+            required.append(param_name)
+        properties[param_name] = prop
+
+    description = base.get("description") or docstring.split("\n\n")[0].strip()
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": {"type": "object", "properties": properties, "required": required},
+        },
+    }
+
+
+class LazyTools(Mapping):
+    """工具名到函数的只读映射，首次取用某个工具时才导入其实现"""
+
+    def __init__(self, registry, names):
+        self._registry = registry
+        self._names = list(names)
+
+    def __getitem__(self, name):
+        if name not in self._names:
+            raise KeyError(name)
+        return self._registry.get_function(name)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+
+class ToolRegistry:
+    """工具注册表，只向模型公开已启用的工具"""
+
+    def __init__(self, specs=TOOL_SPECS, enabled=ENABLED_TOOLS):
+        """
+        初始化工具注册表
+
+        Args:
+            specs (list): 工具声明列表
+            enabled (list): 启用的工具名列表
+        """
+        self.specs = {spec.name: spec for spec in specs}
+        unknown = [name for name in enabled if name not in self.specs]
+        if unknown:
+            logger.warning(f"ENABLED_TOOLS 中存在未注册的工具，已忽略: {', '.join(unknown)}")
+        # 按声明顺序排列，使工具定义列表保持稳定
+        self.enabled = [spec.name for spec in specs if spec.name in enabled]
+        self._functions = {}
+        self._lock = threading.Lock()
+        self._schemas = None
+
+    def schemas(self):
+        """
+        返回已启用工具的定义列表（多个智能体共享同一个列表，调用方不应修改）
+
+        Returns:
+            list: OpenAI工具定义列表
+        """
+        if self._schemas is None:
+            # 按键排序后重建，保证工具定义每次序列化的结果逐字节相同，便于模型服务端复用提示词前缀缓存
+            schemas = [build_schema(name) for name in self.enabled]
+            self._schemas = json.loads(json.dumps(schemas, ensure_ascii=False, sort_keys=True))
+        return self._schemas
+
+    def functions(self):
+        """
+        返回已启用工具的名称到函数的映射，函数在首次取用时导入
+
+        Returns:
+            LazyTools: 工具映射
+        """
+        return LazyTools(self, self.enabled)
+
+    def get_function(self, name):
+        """
+        导入并返回工具的实现函数
+
+        Args:
+            name (str): 工具名
+
+        Returns:
+            callable: 工具函数
+        """
+        with self._lock:
+            function = self._functions.get(name)
+            if function is None:
+                spec = self.specs[name]
+                function = getattr(importlib.import_module(spec.module), spec.function)
+                self._functions[name] = function
+                logger.info(f"已加载工具 {name}")
+            return function
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_tool_registry():
+    """
+    获取进程内共享的工具注册表
+
+    Returns:
+        ToolRegistry: 工具注册表
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ToolRegistry()
+        return _registry
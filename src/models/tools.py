@@ -59,14 +59,15 @@ def get_fig_tool():
                 "1. `py_code`: 一个字符串形式的 Python 绘图代码，**必须是完整、可独立运行的脚本**，"
                 "代码必须创建并返回一个命名为 `fname` 的 matplotlib 图像对象；\n"
                 "2. `fname`: 图像对象的变量名（字符串形式），例如 'fig'；\n"
-                "3. `g`: 全局变量环境，默认保持为 'globals()' 即可。\n\n"
+                "3. `image_format`: 图片格式，可选 png、svg、webp，默认为 png；\n"
+                "4. `dpi`: 图片分辨率，默认为100，过大时会被自动限制。\n\n"
                 "📌 请确保绘图代码满足以下要求：\n"
                 "- 包含所有必要的 import（如 `import matplotlib.pyplot as plt`, `import seaborn as sns` 等）；\n"
                 "- 必须包含数据定义（如 `df = pd.DataFrame(...)`），不要依赖外部变量；\n"
                 "- 推荐使用 `fig, ax = plt.subplots()` 显式创建图像；\n"
                 "- 使用 `ax` 对象进行绘图操作（例如：`sns.lineplot(..., ax=ax)`）；\n"
                 "- 最后明确将图像对象保存为 `fname` 变量（如 `fig = plt.gcf()`）。\n\n"
-                "📌 不需要自己保存图像，函数会自动保存并展示。\n\n"
+                "📌 不需要自己保存图像，函数会自动保存并返回图片地址。\n\n"
                 "✅ 合规示例代码：\n"
                 "```python\n"
                 "import matplotlib.pyplot as plt\n"
@@ -93,10 +94,16 @@ def get_fig_tool():
                         "type": "string",
                         "description": "图像对象的变量名（例如 'fig'），代码中必须使用这个变量名保存绘图对象。"
                     },
-                    "g": {
+                    "image_format": {
                         "type": "string",
-                        "description": "运行环境变量，默认保持为 'globals()' 即可。",
-                        "default": "globals()"
+                        "enum": ["png", "svg", "webp"],
+                        "description": "图片格式，默认为png；线条、文字为主的图表可使用svg",
+                        "default": "png"
+                    },
+                    "dpi": {
+                        "type": "integer",
+                        "description": "图片分辨率",
+                        "default": 100
                     }
                 },
                 "required": ["py_code", "fname"]
@@ -145,6 +152,41 @@ def get_sql_tool():
     }
 
 
+def get_lookup_schema_tool():
+    """
+    获取数据库结构查看工具定义
+    
+    返回:
+    - 数据库结构查看工具的定义
+    """
+    return {
+        "type": "function",
+        "function": {
+            "name": "lookup_schema",
+            "description": (
+                "当需要了解MySQL数据库中有哪些表、表中有哪些列及其类型、主外键和大致行数时，请调用该函数，"
+                "无需使用sql_inter逐条执行SHOW TABLES或DESCRIBE语句。"
+                "传入table_names查看指定表的完整结构，传入keyword按表名、列名及注释查找相关的表，"
+                "两者都不传时返回全部表的结构摘要。"
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "table_names": {
+                        "type": "string",
+                        "description": "需要查看结构的表名，多个表名以逗号分隔，例如 'orders,users'"
+                    },
+                    "keyword": {
+                        "type": "string",
+                        "description": "在表名、列名及注释中查找的关键字"
+                    }
+                },
+                "required": []
+            }
+        }
+    }
+
+
 def get_extract_data_tool():
     """
     获取数据提取工具定义
@@ -175,6 +217,10 @@ def get_extract_data_tool():
                         "type": "string",
                         "description": "The name of the variable to store the extracted table in the local environment."
                     },
+                    "max_rows": {
+                        "type": "integer",
+                        "description": "Optional maximum number of rows to extract; rows beyond this limit are skipped."
+                    },
                     "g": {
                         "type": "string",
                         "description": "Global environment variables, default to globals().",
@@ -247,6 +293,196 @@ def get_github_search_tool():
     }
 
 
+def get_github_readme_tool():
+    """
+    获取GitHub README读取工具定义
+    
+    返回:
+    - GitHub README读取工具的定义
+    """
+    return {
+        "type": "function",
+        "function": {
+            "name": "read_github_readme",
+            "description": (
+                "当需要了解某个或某几个GitHub仓库的用途、安装或使用方法时，调用该函数读取仓库的README。"
+                "为避免内容过长，函数只返回开头的简介以及与query相关的章节，并在末尾列出未展示的章节标题，"
+                "如需查看这些章节，可再次调用并通过sections参数指定。"
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "repos": {
+                        "type": "string",
+                        "description": "仓库标识，例如 'pandas-dev/pandas'，多个仓库以逗号分隔"
+                    },
+                    "query": {
+                        "type": "string",
+                        "description": "关注的问题或关键词，用于挑选相关章节"
+                    },
+                    "sections": {
+                        "type": "string",
+                        "description": "需要查看的章节标题，多个标题以逗号分隔"
+                    }
+                },
+                "required": ["repos"]
+            }
+        }
+    }
+
+
+def get_emission_tool():
+    """
+    获取碳排放计算工具定义
+    
+    返回:
+    - 碳排放计算工具的定义
+    """
+    activity = {
+        "type": "object",
+        "properties": {
+            "name": {"type": "string", "description": "活动名称，例如 '电力'、'柴油'"},
+            "activity": {"type": "number", "description": "活动水平A，例如用电量、燃料消耗量"},
+            "unit": {"type": "string", "description": "活动水平的单位，例如 'kWh'、't'"},
+            "factor": {"type": "number", "description": "排放因子EF，即单位活动水平的排放量"}
+        },
+        "required": ["name", "activity"]
+    }
+    return {
+        "type": "function",
+        "function": {
+            "name": "calculate_emissions",
+            "description": (
+                "当需要根据活动水平和排放因子计算碳排放量时，调用该函数按 E(i)=A(i)*EF(i) 计算每项活动的排放量、"
+                "占比及总排放量。如需对比多个情景（例如不同年份或不同减排方案），请通过scenarios参数一次性传入，"
+                "不要多次调用。计算前请确认活动水平与排放因子的单位相互匹配。"
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "activities": {
+                        "type": "array",
+                        "description": "单个情景的活动列表",
+                        "items": activity
+                    },
+                    "scenarios": {
+                        "type": "array",
+                        "description": "多个情景，每个情景包含名称与各自的活动列表",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "name": {"type": "string", "description": "情景名称，各情景的名称不能重复"},
+                                "activities": {"type": "array", "items": activity}
+                            },
+                            "required": ["name", "activities"]
+                        }
+                    },
+                    "factors": {
+                        "type": "object",
+                        "description": "活动名称到排放因子的映射，供未单独给出factor的活动使用，例如 {\"电力\": 0.5703}",
+                        "additionalProperties": {"type": "number"}
+                    },
+                    "emission_unit": {
+                        "type": "string",
+                        "description": "排放量的单位，仅用于展示",
+                        "default": "kgCO2e"
+                    }
+                }
+            }
+        }
+    }
+
+
+def get_emission_factor_tool():
+    """
+    获取排放因子查找工具定义
+    
+    返回:
+    - 排放因子查找工具的定义
+    """
+    return {
+        "type": "function",
+        "function": {
+            "name": "lookup_emission_factor",
+            "description": (
+                "当需要某项活动（如用电、燃料燃烧）的排放因子时，优先调用该函数从本地排放因子库中查找，"
+                "找不到时再考虑联网搜索。函数会按名称模糊匹配，并可将因子换算为指定的活动水平单位和排放量单位，"
+                "换算结果可直接作为calculate_emissions的factor使用。"
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "activity": {
+                        "type": "string",
+                        "description": "活动名称，例如 '柴油'、'电力'，多个名称以逗号分隔"
+                    },
+                    "region": {
+                        "type": "string",
+                        "description": "优先使用的地区，例如 '中国'"
+                    },
+                    "category": {
+                        "type": "string",
+                        "description": "类别，例如 '燃料燃烧'、'电力'"
+                    },
+                    "unit": {
+                        "type": "string",
+                        "description": "活动水平的单位，例如 'GJ'、'kWh'、't'，因子将换算为该单位"
+                    },
+                    "emission_unit": {
+                        "type": "string",
+                        "description": "排放量的单位，例如 'kgCO2'、'tCO2'"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "每个名称最多返回的条数",
+                        "default": 5
+                    }
+                },
+                "required": ["activity"]
+            }
+        }
+    }
+
+
+def get_expand_result_tool():
+    """
+    获取结果分段查看工具定义
+    
+    返回:
+    - 结果分段查看工具的定义
+    """
+    return {
+        "type": "function",
+        "function": {
+            "name": "expand_result",
+            "description": (
+                "当python_inter或sql_inter返回的结果过长被截断，并在提示中给出了结果句柄（handle）时，"
+                "可调用该函数按行分段查看完整结果。请只查看回答问题所需的部分，避免一次查看过多内容。"
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "handle": {
+                        "type": "string",
+                        "description": "截断提示中给出的结果句柄，例如 'py-1' 或 'sql-2'"
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "起始行（元素）序号，从0开始",
+                        "default": 0
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "查看的行（元素）数",
+                        "default": 50
+                    }
+                },
+                "required": ["handle"]
+            }
+        }
+    }
+
+
 def get_all_tools():
     """
     获取所有工具定义
@@ -258,7 +494,12 @@ def get_all_tools():
         get_python_tool(),
         get_fig_tool(),
         get_sql_tool(),
+        get_lookup_schema_tool(),
         get_extract_data_tool(),
         get_search_tool(),
-        get_github_search_tool()
+        get_github_search_tool(),
+        get_github_readme_tool(),
+        get_emission_tool(),
+        get_emission_factor_tool(),
+        get_expand_result_tool()
     ] 
\ No newline at end of file
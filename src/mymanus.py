@@ -1,20 +1,56 @@
 """
 MyManus主程序模块，集成所有功能
 """
+import re
+import sys
+import copy
 import json
-import inspect
-
-from src.models.llm import LLMService
-from src.models.tools import get_all_tools
-from src.services.python_service import python_inter, fig_inter
-from src.services.db_service import sql_inter, extract_data
-from src.services.search_service import get_search_result, get_answer_github
-from flask import Flask, request, jsonify
+import time
+import uuid
+
+from src.config import (MODEL, AGENT_MAX_STEPS, AGENT_DEADLINE, AGENT_TOKEN_BUDGET, KERNEL_POOL_ENABLED,
+                        JOB_WORKERS, ANALYZE_CACHE_ENABLED, ANALYZE_CACHE_SIZE, ANALYZE_CACHE_TTL)
+from src.models.context import ContextManager
+from src.models.llm import LLMService, message_to_dict, cached_prompt_tokens
+from src.models.registry import get_tool_registry
+from src.services.artifact_service import find_artifact
+from src.services.job_service import JobWorker, get_job_store, job_to_dict
+from src.services.kernel_pool import get_kernel_pool
+from src.services.scheduler import AdmissionRejected, get_scheduler
+from src.services.session_service import SessionStore
+from src.services.tool_executor import ToolExecutor
+from src.utils.cache_utils import TTLCache, SingleFlight, make_cache_key
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 import json
 from gevent import pywsgi
 
 
+# 固定的系统提示词，与工具定义一起构成各请求相同的提示词前缀，不要在其中加入时间、会话ID等可变内容
+SYSTEM_PROMPT = ('你是MyManus，一个擅长碳排放核算与数据分析的智能体。'
+                 '需要计算、查询数据、检索资料或绘图时，请调用提供的工具完成，不要臆造数据或计算结果；'
+                 '排放因子等关键数值请注明来源。最终回答使用中文，列出计算过程、所用参数与结果。')
+
+# /analyze 请求中固定的任务说明，可变的请求参数放在其后，使相同前缀在不同请求间保持一致
+ANALYZE_INSTRUCTION = ('通过公式 E(i)=A(i)*EF(i) 计算下述计算对象的碳排放总量，其中E(i)表示脐橙产品生产过程中'
+                       '第i种活动的二氧化碳排放量，A(i)表示第i种活动的活动水平，EF(i)表示第i种活动的碳排放因子。'
+                       '请按照给出的计算参数计算，并考虑给出的碳排放场景。')
+
+# 超出执行预算时追加的提示，要求模型停止调用工具并直接作答
+FINISH_NOW_PROMPT = '已达到本轮任务的执行上限，请不要再调用任何工具，直接根据已有信息给出最终回答；如有未完成的部分，请简要说明。'
+
+# 会话开头附加的数据库结构摘要提示
+SCHEMA_PROMPT = '以下是MySQL数据库中与问题相关的表结构摘要，编写SQL前请优先参考，如需其他表的结构请调用lookup_schema工具：\n'
+
+# 使用数据库时才需要附加结构摘要
+SQL_TOOLS = ("sql_inter", "extract_data", "lookup_schema")
+
+# 产物响应的缓存时间（秒）
+ARTIFACT_MAX_AGE = 365 * 24 * 3600
+
+# fig_inter返回结果中的图片地址
+FIGURE_URL_PATTERN = re.compile(r'图片地址: (\S+)')
+
 # 创建一个服务
 app = Flask(__name__)
 CORS(app, origins='http://localhost:3000')
@@ -25,21 +61,32 @@ class MyManus:
     MyManus智能体主类
     """
     
-    def __init__(self):
+    def __init__(self, llm=None, max_steps=AGENT_MAX_STEPS, deadline=AGENT_DEADLINE,
+                 token_budget=AGENT_TOKEN_BUDGET, session_id=None):
         """
         初始化MyManus智能体
+        
+        参数:
+        - llm: 可选的LLMService实例，多个会话可共享同一个实例以复用HTTP连接
+        - max_steps: 单轮对话中模型回复的最大次数（不含超出预算后的收尾回复）
+        - deadline: 单轮对话的最长耗时（秒），0表示不限制
+        - token_budget: 单轮对话累计token用量上限，0表示不限制
+        - session_id: 会话ID，用于隔离该会话的Python运行环境，默认随机生成
         """
-        self.llm = LLMService()
+        self.session_id = session_id or uuid.uuid4().hex
+        self.llm = llm or LLMService()
+        self.max_steps = max_steps
+        self.deadline = deadline
+        self.token_budget = token_budget
+        self.step_logs = []
+        self.figures = []
         self.messages = []
-        self.tools = get_all_tools()
-        self.available_tools = {
-            "python_inter": python_inter,
-            "fig_inter": fig_inter,
-            # "sql_inter": sql_inter,
-            # "extract_data": extract_data,
-            # "get_search_result": get_search_result,
-            # "get_answer_github": get_answer_github,
-        }
+        self.context = ContextManager(llm=self.llm)
+        # 只公开ENABLED_TOOLS中的工具，工具实现在首次调用时才导入
+        registry = get_tool_registry()
+        self.tools = registry.schemas()
+        self.available_tools = registry.functions()
+        self.tool_executor = ToolExecutor(self.available_tools, session_id=self.session_id)
         
     def chat(self, user_message):
         """
@@ -51,94 +98,408 @@ class MyManus:
         返回:
         - 智能体的回复
         """
+        answer = None
+        for event in self._run(user_message, stream=False):
+            if event["type"] == "final":
+                answer = event["content"]
+        return answer
+
+    def chat_stream(self, user_message):
+        """
+        以流式方式与智能体进行对话
+        
+        参数:
+        - user_message: 用户输入的消息
+        
+        返回:
+        - 生成器，依次产出模型文本片段、工具调用开始/结束以及最终回复事件
+        """
+        return self._run(user_message, stream=True)
+
+    def _run(self, user_message, stream=False):
+        """
+        执行一轮对话，按发生顺序产出事件
+        
+        模型每回复一次记为一步，工具调用以循环而非递归方式处理。
+        当步数、总耗时或累计token用量超出预算时，会要求模型不再调用工具并立即给出最终回复。
+        
+        参数:
+        - user_message: 用户输入的消息
+        - stream: 是否以流式方式调用模型
+        
+        返回:
+        - 生成器，产出事件字典
+        """
         # 添加用户消息
+        self._ensure_system_prompt()
+        self._update_schema_prompt(user_message)
         self.messages.append({"role": "user", "content": user_message})
+        self.step_logs = []
+        self.figures = []
+        started_at = time.monotonic()
+        tokens_used = 0
         
-        # 获取模型回复
-        response = self.llm.function_calling(self.messages, self.tools)
-        
-        if hasattr(response, 'tool_calls') and response.tool_calls:
+        step = 0
+        while True:
+            stop_reason = self._check_budget(step, started_at, tokens_used)
+            if stop_reason:
+                break
+            step += 1
+            step_started = time.monotonic()
+            
+            # 获取模型回复
+            message, usage = yield from self._request_completion(stream)
+            tokens_used += usage.get("total_tokens", 0)
+            self.messages.append(message)
+            llm_seconds = time.monotonic() - step_started
+            
+            if not message.get("tool_calls"):
+                # 直接文本回复
+                yield self._log_step(step, llm_seconds, 0.0, usage, [])
+                yield {"type": "final", "content": message["content"], "stop_reason": "completed"}
+                return
+            
             # 处理工具调用
-            return self._process_tool_calls(response)
-        else:
-            # 直接文本回复
-            self.messages.append(response)
-            return response.content
+            tool_started = time.monotonic()
+            yield from self._process_tool_calls(message)
+            tool_names = [tool_call["function"]["name"] for tool_call in message["tool_calls"]]
+            yield self._log_step(step, llm_seconds, time.monotonic() - tool_started, usage, tool_names)
+        
+        # 超出预算，要求模型基于已有信息直接作答
+        print(f"智能体执行超出预算（{stop_reason}），要求模型直接给出最终回复")
+        # 提示只用于本次请求，之后移除，避免同一会话后续各轮仍被要求不调用工具
+        finish_prompt = {"role": "system", "content": FINISH_NOW_PROMPT}
+        self.messages.append(finish_prompt)
+        step_started = time.monotonic()
+        try:
+            message, usage = yield from self._request_completion(stream, tool_choice="none")
+        finally:
+            self.messages[:] = [item for item in self.messages if item is not finish_prompt]
+        # 部分模型即使tool_choice为none仍可能返回工具调用，此处只保留文本内容
+        message = {"role": "assistant", "content": message["content"]}
+        self.messages.append(message)
+        yield self._log_step(step + 1, time.monotonic() - step_started, 0.0, usage, [])
+        yield {"type": "final", "content": message["content"], "stop_reason": stop_reason}
+
+    def _ensure_system_prompt(self):
+        """
+        确保对话以固定的系统提示词开头
+        """
+        if not self.messages or self.messages[0] != {"role": "system", "content": SYSTEM_PROMPT}:
+            self.messages.insert(0, {"role": "system", "content": SYSTEM_PROMPT})
+
+    def _update_schema_prompt(self, user_message):
+        """
+        启用数据库工具时，在本轮用户消息之前附加与问题相关的表结构摘要，避免模型逐步探查表结构
+
+        摘要随问题变化，因此不放在对话开头，以免改动之前已被模型服务缓存的提示词前缀；
+        与最近一次附加的摘要相同时不再重复附加
+        
+        参数:
+        - user_message: 用户输入的消息，用于挑选相关的表
+        """
+        if not any(name in self.available_tools for name in SQL_TOOLS):
+            return
+        try:
+            from src.services.schema_service import get_schema_index
+            summary = get_schema_index().summary(user_message)
+        except Exception as e:
+            print(f"读取数据库结构失败，本轮不附加结构摘要: {e}")
+            return
+        if not summary:
+            return
+        content = SCHEMA_PROMPT + summary
+        previous = next((message for message in reversed(self.messages)
+                         if message["role"] == "system" and (message["content"] or "").startswith(SCHEMA_PROMPT)),
+                        None)
+        if previous is None or previous["content"] != content:
+            self.messages.append({"role": "system", "content": content})
+
+    def _check_budget(self, step, started_at, tokens_used):
+        """
+        检查本轮对话是否超出步数、耗时或token预算
+        
+        参数:
+        - step: 已执行的步数
+        - started_at: 本轮开始时间（time.monotonic）
+        - tokens_used: 已累计使用的token数
+        
+        返回:
+        - 超出的预算名称，未超出时返回None
+        """
+        if step >= self.max_steps:
+            return "max_steps"
+        if self.deadline and time.monotonic() - started_at >= self.deadline:
+            return "deadline"
+        if self.token_budget and tokens_used >= self.token_budget:
+            return "token_budget"
+        return None
+
+    def _log_step(self, step, llm_seconds, tool_seconds, usage, tool_names):
+        """
+        记录单步耗时及用量，并返回对应的step事件
+        """
+        step_log = {
+            "step": step,
+            "llm_seconds": round(llm_seconds, 3),
+            "tool_seconds": round(tool_seconds, 3),
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "cached_prompt_tokens": cached_prompt_tokens(usage),
+            "cached": usage.get("cached", False),
+            "tool_calls": tool_names,
+        }
+        self.step_logs.append(step_log)
+        return {"type": "step", **step_log}
+
+    def _request_completion(self, stream, tool_choice=None):
+        """
+        请求模型回复，流式模式下转发文本片段事件
+        
+        参数:
+        - stream: 是否以流式方式调用模型
+        - tool_choice: 可选的工具选择策略
+        
+        返回:
+        - (assistant消息字典, 用量字典)
+        """
+        # 发送前按token预算裁剪对话历史
+        self.context.fit(self.messages, self.tools)
+        
+        if not stream:
+            response, usage = self.llm.function_calling(self.messages, self.tools, tool_choice=tool_choice,
+                                                        return_usage=True)
+            return message_to_dict(response), usage
+
+        message, usage = None, {}
+        for event in self.llm.function_calling_stream(self.messages, self.tools, tool_choice=tool_choice):
+            if event["type"] == "message":
+                message, usage = event["message"], event["usage"]
+            else:
+                yield event
+        return message, usage
     
-    def _process_tool_calls(self, response):
+    def _process_tool_calls(self, message):
         """
         处理工具调用
         
         参数:
-        - response: 模型回复对象
+        - message: 包含工具调用的assistant消息字典
         
         返回:
-        - 处理后的回复内容
+        - 生成器，产出工具调用开始/结束事件
         """
-        self.messages.append(response)
-        
-        # 处理工具调用
-        for tool_call in response.tool_calls:
-            function_name = tool_call.function.name
-            function_args = json.loads(tool_call.function.arguments)
+        # 并发执行工具调用，按完成先后推送结束事件
+        tool_calls = message["tool_calls"]
+        for tool_call in tool_calls:
+            function_name = tool_call["function"]["name"]
             
             # 打印调用信息
             print(f"调用函数: {function_name}")
-            print(f"函数参数: {function_args}")
-            
-            if function_name in self.available_tools:
-                # 获取函数参数
-                function = self.available_tools[function_name]
-                sig = inspect.signature(function)
-                
-                # 准备参数
-                kwargs = {}
-                for param_name, param in sig.parameters.items():
-                    if param_name in function_args:
-                        kwargs[param_name] = function_args[param_name]
-                    elif param.default != inspect.Parameter.empty:
-                        pass  # 使用默认值
-                    else:
-                        # 必需参数未提供
-                        print(f"缺少必要参数: {param_name}")
-                
-                # 调用函数
-                tool_result = function(**kwargs)
-                
-                # 添加工具结果到消息列表
-                self.messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "name": function_name,
-                    "content": str(tool_result),
-                })
-            else:
-                # 工具不可用
-                self.messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "name": function_name,
-                    "content": f"工具 {function_name} 不可用",
-                })
-        
-        # 获取模型的后续回复
-        response = self.llm.function_calling(self.messages, self.tools)
-        
-        # 如果还有工具调用，继续处理
-        if hasattr(response, 'tool_calls') and response.tool_calls:
-            return self._process_tool_calls(response)
-        else:
-            # 添加最终回复
-            self.messages.append(response)
-            return response.content
+            print(f"函数参数: {tool_call['function']['arguments']}")
+            yield {"type": "tool_call_start", "id": tool_call["id"], "name": function_name,
+                   "arguments": tool_call["function"]["arguments"]}
+        
+        results = {}
+        for tool_call, tool_result in self.tool_executor.run(tool_calls):
+            results[tool_call["id"]] = tool_result
+            if tool_call["function"]["name"] == "fig_inter":
+                # 记录本轮生成的图片，供任务结果返回
+                self.figures.extend(FIGURE_URL_PATTERN.findall(tool_result))
+            yield {"type": "tool_call_finish", "id": tool_call["id"], "name": tool_call["function"]["name"],
+                   "result": tool_result}
+        
+        # 按tool_calls原有顺序添加工具结果到消息列表
+        for tool_call in tool_calls:
+            self.messages.append({
+                "role": "tool",
+                "tool_call_id": tool_call["id"],
+                "name": tool_call["function"]["name"],
+                "content": results[tool_call["id"]],
+            })
     
     def reset(self):
         """
         重置对话历史
         """
         self.messages = []
+        self.context = ContextManager(llm=self.llm)
+        self.close()
         print("对话历史已重置")
 
+    def close(self):
+        """
+        释放该会话占用的Python运行环境
+        """
+        if KERNEL_POOL_ENABLED:
+            get_kernel_pool().release(self.session_id)
+
+
+def build_analyze_prompt(request_body):
+    """
+    根据请求体构造碳排放计算的提示词
+    
+    参数:
+    - request_body: /analyze 请求的JSON字典
+    
+    返回:
+    - 发送给智能体的用户输入
+    """
+    target = request_body.get("target", "")
+    parameter = request_body.get("parameter", "")
+    scenario = request_body.get("scenario", "")
+    illustrate = request_body.get("illustrate", "")
+    # 固定说明在前、可变参数在后，不同请求共享相同的前缀
+    lines = [ANALYZE_INSTRUCTION, '计算对象: ' + target, '计算参数: ' + parameter, '碳排放场景: ' + scenario]
+    if illustrate != '':
+        lines.append('补充说明: ' + illustrate)
+    return '\n'.join(lines)
+
+
+def analyze_cache_key(request_body):
+    """
+    计算 /analyze 响应缓存的键：规范化后的请求字段（去除首尾及多余空白）、模型名称与启用的工具集合
+    
+    参数:
+    - request_body: /analyze 请求的JSON字典
+    
+    返回:
+    - 缓存键
+    """
+    fields = {name: " ".join(str(request_body.get(name) or "").split())
+              for name in ("target", "parameter", "scenario", "illustrate")}
+    return make_cache_key("analyze", build_analyze_prompt(fields), MODEL, get_tool_registry().enabled)
+
+
+def cache_bypassed(request_body):
+    """
+    判断请求是否要求跳过响应缓存：请求头 Cache-Control: no-cache 或请求体 "cache": false
+    """
+    return ('no-cache' in request.headers.get('Cache-Control', '').lower()
+            or request_body.get('cache') is False)
+
+
+def restore_session(entry):
+    """
+    为命中缓存的请求新建会话，并写入缓存的对话历史，使客户端可以在此基础上继续对话
+    （Python运行环境中的变量不会恢复）
+    """
+    session = sessions.get(None)
+    with session.lock:
+        session.agent.messages = copy.deepcopy(entry["messages"])
+        sessions.save(session)
+    return session.session_id
+
+
+def run_analyze(user_input, session=None):
+    """
+    申请运行名额并在会话中执行一轮分析
+    
+    参数:
+    - user_input: 发送给智能体的用户输入
+    - session: 会话对象，为None时新建会话
+    
+    返回:
+    - {"answer": 最终回复, "messages": 对话历史副本, "session_id": 会话ID}
+    
+    异常:
+    - AdmissionRejected: 队列已满或排队超时
+    """
+    release = admit_request()
+    try:
+        session = session or sessions.get(None)
+        with session.lock:
+            try:
+                answer = session.agent.chat(user_input)
+            finally:
+                sessions.save(session)
+            return {"answer": answer, "messages": copy.deepcopy(session.agent.messages),
+                    "session_id": session.session_id}
+    finally:
+        release()
+
+
+def analyze_with_cache(request_body, user_input):
+    """
+    带响应缓存的 /analyze 处理：命中时直接返回，未命中时相同请求只执行一次，并发的相同请求共享结果
+    
+    返回:
+    - (响应字典, 缓存状态)，缓存状态为 HIT、MISS、SHARED 或 BYPASS
+    """
+    key = analyze_cache_key(request_body)
+    bypass = cache_bypassed(request_body)
+    entry = None if bypass else analyze_cache.get(key)
+    if entry is not None:
+        return {'code': 0, 'message': '', 'data': entry["answer"], 'session_id': restore_session(entry)}, 'HIT'
+
+    def compute():
+        result = run_analyze(user_input)
+        analyze_cache.set(key, result)
+        return result
+
+    if bypass:
+        # 跳过缓存的请求总是重新执行，不与正在执行的相同请求共享结果，执行结果用于刷新缓存
+        entry = compute()
+        return {'code': 0, 'message': '', 'data': entry["answer"], 'session_id': entry["session_id"]}, 'BYPASS'
+
+    entry, leader = analyze_flights.do(key, compute)
+    session_id = entry["session_id"] if leader else restore_session(entry)
+    status = 'MISS' if leader else 'SHARED'
+    return {'code': 0, 'message': '', 'data': entry["answer"], 'session_id': session_id}, status
+
+
+def format_sse(event):
+    """
+    将事件字典编码为server-sent events格式
+    
+    参数:
+    - event: 包含type字段的事件字典
+    
+    返回:
+    - SSE文本帧
+    """
+    payload = {key: value for key, value in event.items() if key != "type"}
+    return f"event: {event['type']}\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+
+
+def get_session(request_body):
+    """
+    根据请求体中的session_id获取会话，未提供时新建会话
+    
+    参数:
+    - request_body: 请求的JSON字典
+    
+    返回:
+    - Session对象
+    """
+    return sessions.get(request_body.get("session_id"))
+
+
+def admit_request():
+    """
+    为当前请求申请运行名额，客户端可通过 X-Queue-Timeout 请求头缩短最长排队时间（秒）
+    
+    返回:
+    - 释放名额的函数
+    
+    异常:
+    - AdmissionRejected: 队列已满或排队超时
+    """
+    timeout = request.headers.get('X-Queue-Timeout')
+    try:
+        timeout = float(timeout) if timeout else None
+    except ValueError:
+        timeout = None
+    return get_scheduler().admit(timeout)
+
+
+def rejected_response(error):
+    """
+    将AdmissionRejected转换为带Retry-After头的响应
+    """
+    return ({'code': error.status, 'message': str(error), 'data': None}, error.status,
+            {'Retry-After': str(error.retry_after)})
+
 
 # 创建一个接口 指定路由和请求方法 定义处理请求的函数
 @app.route(rule='/analyze', methods=['POST'])
@@ -146,27 +507,243 @@ def everything():
     # 1.获取 JSON 格式的请求体 并解析拿到数据
     request_body = request.get_json()
     print('request_body:', request_body)
-    target = request_body.get("target", "")
-    parameter = request_body.get("parameter", "")
-    scenario = request_body.get("scenario", "")
-    illustrate = request_body.get("illustrate", "")
-    user_input = '通过公式 E(i)=A(i)*EF(i)计算' + target + '的碳排放总量，其中E(i)表示脐橙产品生产过程中第i种活动的二氧化碳排放量，A(i)表示第i种活动的活动水平，EF(i)表示第i种活动的碳排放因子。'
-    user_input = user_input + '按照以下参数计算:' + parameter + '。'
-    user_input = user_input + '产生碳排放的场景可能有:' + scenario + '。'
-    if illustrate != '':
-        user_input = user_input + '补充说明:' + illustrate
+    user_input = build_analyze_prompt(request_body)
+    if ANALYZE_CACHE_ENABLED and not request_body.get("session_id"):
+        # 新会话的请求结果只取决于请求字段，可以缓存
+        try:
+            response, cache_status = analyze_with_cache(request_body, user_input)
+        except AdmissionRejected as e:
+            return rejected_response(e)
+        except Exception as e:
+            return {'code': 400, 'message': str(e), 'data': None}
+        return response, 200, {'X-Cache': cache_status}
+    try:
+        session = get_session(request_body)
+    except ValueError as e:
+        return {'code': 400, 'message': str(e), 'data': None}
     try:
-        response = {'code': 0, 'message': '', 'data': manus.chat(user_input)}
+        result = run_analyze(user_input, session)
+        response = {'code': 0, 'message': '', 'data': result["answer"]}
+    except AdmissionRejected as e:
+        return rejected_response(e)
     except Exception as e:
-        response = {'code': 400, 'message': e, 'data': manus.chat(user_input)}
+        response = {'code': 400, 'message': str(e), 'data': None}
+    response['session_id'] = session.session_id
+    return response
+
+
+@app.route(rule='/analyze/stream', methods=['POST'])
+def everything_stream():
+    """
+    /analyze 的流式版本，以server-sent events形式实时推送
+    模型文本片段、工具调用开始/结束事件以及最终回复
+    """
+    request_body = request.get_json()
+    print('request_body:', request_body)
+    user_input = build_analyze_prompt(request_body)
+    try:
+        session = get_session(request_body)
+    except ValueError as e:
+        return {'code': 400, 'message': str(e), 'data': None}
+    try:
+        release = admit_request()
+    except AdmissionRejected as e:
+        return rejected_response(e)
+
+    def generate():
+        try:
+            with session.lock:
+                yield format_sse({"type": "session", "session_id": session.session_id})
+                try:
+                    for event in session.agent.chat_stream(user_input):
+                        yield format_sse(event)
+                except Exception as e:
+                    yield format_sse({"type": "error", "message": str(e)})
+                finally:
+                    sessions.save(session)
+        finally:
+            release()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+    # 客户端提前断开、生成器未被执行时也要归还名额
+    response.call_on_close(release)
     return response
 
+
+@app.route(rule='/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    """
+    删除会话及其对话历史
+    """
+    sessions.delete(session_id)
+    return {'code': 0, 'message': '', 'data': None}
+
+
+def run_job(job):
+    """
+    在后台工作线程中执行一个分析任务
+    
+    参数:
+    - job: 任务字典，request字段为 /analyze 请求体
+    
+    返回:
+    - 包含最终回复、步骤日志、图片地址及会话ID的字典
+    """
+    request_body = job["request"]
+    user_input = build_analyze_prompt(request_body)
+    session = get_session(request_body)
+    with session.lock:
+        try:
+            result = session.agent.chat(user_input)
+        finally:
+            sessions.save(session)
+        return {
+            "result": result,
+            "step_logs": session.agent.step_logs,
+            "figures": session.agent.figures,
+            "session_id": session.session_id,
+        }
+
+
+def start_job_worker(concurrency=JOB_WORKERS):
+    """
+    启动后台任务工作线程
+    
+    参数:
+    - concurrency: 工作线程数
+    
+    返回:
+    - JobWorker对象
+    """
+    worker = JobWorker(get_job_store(), run_job, concurrency=concurrency)
+    worker.start()
+    return worker
+
+
+@app.route(rule='/jobs', methods=['POST'])
+def submit_job():
+    """
+    提交异步分析任务，请求体与 /analyze 相同，可额外携带webhook地址，立即返回任务ID
+    """
+    request_body = request.get_json()
+    print('request_body:', request_body)
+    session_id = request_body.get("session_id")
+    if session_id and not SessionStore.is_valid_session_id(session_id):
+        return {'code': 400, 'message': f"非法的会话ID: {session_id}", 'data': None}, 400
+    webhook = request_body.pop("webhook", None)
+    if webhook and not webhook.startswith(("http://", "https://")):
+        return {'code': 400, 'message': 'webhook必须是http或https地址', 'data': None}, 400
+    job_id = get_job_store().submit(request_body, webhook=webhook)
+    return {'code': 0, 'message': '', 'data': {'job_id': job_id, 'status': 'queued'}}, 202
+
+
+@app.route(rule='/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    查询任务状态，任务结束后返回最终回复、步骤日志与生成的图片
+    """
+    job = get_job_store().get(job_id)
+    if job is None:
+        return {'code': 404, 'message': f'任务 {job_id} 不存在', 'data': None}, 404
+    return {'code': 0, 'message': '', 'data': job_to_dict(job)}
+
+
+@app.route(rule='/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """
+    取消仍在排队的任务
+    """
+    if not get_job_store().cancel(job_id):
+        return {'code': 409, 'message': f'任务 {job_id} 不存在或已开始执行，无法取消', 'data': None}, 409
+    return {'code': 0, 'message': '', 'data': None}
+
+
+@app.route(rule='/artifacts/<name>', methods=['GET'])
+def get_artifact(name):
+    """
+    返回fig_inter生成的图片；文件名即内容哈希，内容不会变化，可被客户端与CDN长期缓存，
+    并支持If-None-Match条件请求与Range分段请求
+    """
+    artifact = find_artifact(name)
+    if artifact is None:
+        return {'code': 404, 'message': f'产物 {name} 不存在或已被清理', 'data': None}, 404
+    path, digest, mimetype = artifact
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=digest, max_age=ARTIFACT_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@app.route(rule='/metrics', methods=['GET'])
+def metrics():
+    """
+    返回请求调度、会话、模型服务、数据库与各类缓存的运行指标
+    """
+    return {'code': 0, 'message': '', 'data': {
+        'scheduler': get_scheduler().stats(),
+        'sessions': len(sessions),
+        'jobs': get_job_store().stats(),
+        'analyze_cache': analyze_cache.stats(),
+        'llm': llm_service.stats(),
+        'db_pool': _component_stats('src.services.db_pool', '_pool'),
+        'query_cache': _component_stats('src.services.query_cache', '_cache'),
+        'search_cache': _search_cache_stats(),
+        'github': _github_stats(),
+    }}
+
+
+def _component(module_name, attribute):
+    """
+    返回模块中已创建的进程内单例；模块未被加载（对应工具未启用或尚未使用）或单例尚未创建时返回None，
+    读取指标时不会为此导入模块或创建组件
+    """
+    module = sys.modules.get(module_name)
+    return getattr(module, attribute, None) if module is not None else None
+
+
+def _component_stats(module_name, attribute):
+    component = _component(module_name, attribute)
+    return component.stats() if component is not None else None
+
+
+def _search_cache_stats():
+    searcher = _component('src.services.search_service', '_searcher')
+    if searcher is None or searcher.cache is None:
+        return None
+    return searcher.cache.stats()
+
+
+def _github_stats():
+    """
+    返回GitHub响应缓存的命中情况及最近一次响应中的剩余请求配额
+    """
+    client = _component('src.services.github_service', '_client')
+    if client is None:
+        return None
+    return {
+        'cache': client.cache.stats() if client.cache is not None else None,
+        'rate_remaining': client.rate_remaining,
+        'rate_reset': client.rate_reset,
+    }
+
+
+# 所有会话共享同一个LLMService，每个会话拥有独立的对话历史
+llm_service = LLMService()
+sessions = SessionStore(lambda session_id: MyManus(llm=llm_service, session_id=session_id))
+# /analyze 响应缓存，以及合并并发相同请求的单飞控制
+analyze_cache = TTLCache(maxsize=ANALYZE_CACHE_SIZE, ttl=ANALYZE_CACHE_TTL)
+analyze_flights = SingleFlight()
+
 if __name__ == "__main__":
     """
     主程序入口
     """
-    print("初始化MyManus智能体...")
-    manus = MyManus()
+    if KERNEL_POOL_ENABLED:
+        get_kernel_pool()
     print("MyManus智能体已准备就绪！")
     # print("输入 'exit'、'quit' 或 'q' 退出对话")
     # print("输入 'reset' 或 'r' 重置对话")
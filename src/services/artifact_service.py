@@ -0,0 +1,137 @@
+"""
+产物服务模块，定位按内容寻址保存的图片等产物，并在后台按磁盘配额清理最久未访问的文件
+"""
+import os
+import re
+import time
+import logging
+import threading
+
+from src.config import FIGURE_DIR, FIGURE_MAX_BYTES, FIGURE_GC_INTERVAL, LOG_LEVEL, LOG_FORMAT
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# 支持的产物格式及其MIME类型
+MIME_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'webp': 'image/webp',
+}
+
+# 产物文件名：内容哈希加扩展名
+ARTIFACT_NAME_PATTERN = re.compile(r'^([0-9a-f]{32})\.(png|svg|webp)$')
+
+# 写入中途退出而残留的临时文件，超过该秒数后清理
+_TEMP_FILE_AGE = 3600
+
+
+def find_artifact(name, directory=FIGURE_DIR):
+    """
+    根据文件名定位产物，并刷新其访问时间，使清理时优先保留最近被访问的文件
+
+    Args:
+        name (str): 产物文件名
+        directory (str): 产物目录
+
+    Returns:
+        tuple: (文件路径, 内容哈希, MIME类型)，文件名不合法或文件不存在时返回None
+    """
+    match = ARTIFACT_NAME_PATTERN.match(name)
+    if match is None:
+        return None
+    path = os.path.join(directory, name)
+    try:
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+    except FileNotFoundError:
+        return None
+    return path, match.group(1), MIME_TYPES[match.group(2)]
+
+
+def prune_artifacts(directory=FIGURE_DIR, max_bytes=FIGURE_MAX_BYTES):
+    """
+    产物总大小超出max_bytes时，按最近访问时间从旧到新删除产物，并清理残留的临时文件
+
+    Args:
+        directory (str): 产物目录
+        max_bytes (int): 磁盘配额（字节），0表示不限制
+
+    Returns:
+        int: 删除的文件数
+    """
+    if not os.path.isdir(directory):
+        return 0
+    now = time.time()
+    entries, removed = [], 0
+    for item in os.scandir(directory):
+        try:
+            stat = item.stat()
+        except FileNotFoundError:
+            continue
+        if item.name.endswith('.tmp'):
+            if now - stat.st_mtime > _TEMP_FILE_AGE:
+                removed += _remove(item.path)
+            continue
+        if ARTIFACT_NAME_PATTERN.match(item.name):
+            entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, item.path))
+    if not max_bytes:
+        return removed
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        removed += _remove(path)
+        total -= size
+    return removed
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return 1
+    except FileNotFoundError:
+        return 0
+
+
+class ArtifactCollector:
+    """产物清理器，在后台线程中定期执行prune_artifacts"""
+
+    def __init__(self, directory=FIGURE_DIR, max_bytes=FIGURE_MAX_BYTES, interval=FIGURE_GC_INTERVAL):
+        """
+        初始化产物清理器
+
+        Args:
+            directory (str): 产物目录
+            max_bytes (int): 磁盘配额（字节）
+            interval (float): 清理间隔（秒）
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        启动后台清理线程
+        """
+        self._thread = threading.Thread(target=self._loop, name="artifact-gc", daemon=True)
+        self._thread.start()
+        logger.info(f"ArtifactCollector 已启动，目录: {self.directory}，配额: {self.max_bytes} 字节")
+
+    def stop(self):
+        """
+        通知后台清理线程退出
+        """
+        self._stopped.set()
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            try:
+                removed = prune_artifacts(self.directory, self.max_bytes)
+                if removed:
+                    logger.info(f"已清理 {removed} 个产物文件")
+            except Exception as e:
+                logger.error(f"清理产物失败: {str(e)}")
+            self._stopped.wait(self.interval)
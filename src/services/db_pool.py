@@ -0,0 +1,227 @@
+"""
+数据库连接池模块，在进程内复用MySQL连接
+"""
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import pymysql
+
+from src.config import (DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT, DB_POOL_SIZE, DB_POOL_TIMEOUT,
+                        DB_POOL_IDLE_TIMEOUT, DB_POOL_RECYCLE, LOG_LEVEL, LOG_FORMAT)
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+
+# MySQL的COM_RESET_CONNECTION命令（pymysql未提供该常量），重置会话状态而不重新建立连接
+_COM_RESET_CONNECTION = 0x1f
+
+
+class PoolTimeoutError(Exception):
+    """等待空闲连接超时"""
+
+
+class ConnectionPool:
+    """
+    MySQL连接池类，限制连接总数，借出时检查连接健康状况，并回收空闲过久或存活过久的连接
+
+    使用threading同步原语实现；在gevent monkey patch之后这些原语会变为协程友好的版本，
+    等待连接时不会阻塞整个事件循环。
+    """
+
+    def __init__(self, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, idle_timeout=DB_POOL_IDLE_TIMEOUT,
+                 recycle=DB_POOL_RECYCLE, **connect_kwargs):
+        """
+        初始化连接池（连接按需创建）
+
+        Args:
+            size (int): 最大连接数
+            timeout (float): 借出连接时的最长等待时间（秒）
+            idle_timeout (float): 连接空闲超过该时长（秒）后关闭，0表示不限制
+            recycle (float): 连接创建超过该时长（秒）后重建，0表示不限制
+            **connect_kwargs: 传给pymysql.connect的参数
+        """
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.recycle = recycle
+        self.connect_kwargs = connect_kwargs
+        # 空闲连接栈，元素为 (连接, 创建时间, 最近归还时间)，后进先出以便长期空闲的连接自然过期
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        # 归还时需要直接关闭的连接（按id记录）
+        self._invalidated = set()
+        logger.info(f"ConnectionPool 初始化完成，最大连接数: {size}")
+
+    @contextmanager
+    def connection(self, cursorclass=None):
+        """
+        借出一个连接，退出上下文时自动归还
+
+        Args:
+            cursorclass: 可选的游标类型，如 pymysql.cursors.SSCursor
+
+        Yields:
+            pymysql连接对象
+
+        Raises:
+            PoolTimeoutError: 在timeout内没有可用连接
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeoutError(f"等待数据库连接超时（{self.timeout} 秒）")
+        entry = None
+        try:
+            entry = self._checkout()
+            connection = entry[0]
+            if cursorclass is not None:
+                connection.cursorclass = cursorclass
+            yield connection
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            # 连接层面的错误，连接可能已不可用，直接关闭而不归还
+            if entry is not None:
+                self._close(entry[0])
+                entry = None
+            raise
+        finally:
+            if entry is not None:
+                with self._lock:
+                    invalidated = id(entry[0]) in self._invalidated
+                    self._invalidated.discard(id(entry[0]))
+                if invalidated:
+                    self._close(entry[0])
+                else:
+                    self._checkin(entry)
+            self._slots.release()
+
+    def invalidate(self, connection):
+        """
+        标记连接在归还时直接关闭，用于未读完结果的流式游标等无法安全复用的情况
+
+        Args:
+            connection: 当前借出的连接
+        """
+        with self._lock:
+            self._invalidated.add(id(connection))
+
+    def close_all(self):
+        """
+        关闭所有空闲连接
+        """
+        with self._lock:
+            entries = list(self._idle)
+            self._idle.clear()
+        for connection, _, _ in entries:
+            self._close(connection)
+
+    def stats(self):
+        """
+        返回连接池状态
+        """
+        with self._lock:
+            return {"size": self.size, "idle": len(self._idle)}
+
+    def _checkout(self):
+        """
+        取出一个健康的空闲连接，没有时新建
+        """
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                return self._connect()
+            connection, created_at, returned_at = entry
+            if self.recycle and now - created_at > self.recycle:
+                self._close(connection)
+                continue
+            if self.idle_timeout and now - returned_at > self.idle_timeout:
+                self._close(connection)
+                continue
+            try:
+                # 健康检查，连接失效时丢弃
+                connection.ping(reconnect=False)
+            except Exception as e:
+                logger.info(f"丢弃失效的数据库连接: {str(e)}")
+                self._close(connection)
+                continue
+            return entry
+
+    def _checkin(self, entry):
+        """
+        归还连接：重置会话状态并恢复默认游标类型，同时清理空闲过久的连接
+        """
+        connection, created_at, _ = entry
+        try:
+            self._reset_session(connection)
+            connection.cursorclass = pymysql.cursors.Cursor
+        except Exception as e:
+            # 服务端不支持重置或连接已不可用时直接关闭，下一个借用者会拿到新建的连接
+            logger.info(f"重置数据库连接失败，关闭该连接: {str(e)}")
+            self._close(connection)
+            return
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            self._idle.append((connection, created_at, now))
+            # 栈底是最久未使用的连接，顺带关闭其中已空闲过久的连接
+            while self.idle_timeout and self._idle and now - self._idle[0][2] > self.idle_timeout:
+                expired.append(self._idle.popleft()[0])
+        for stale in expired:
+            self._close(stale)
+
+    @staticmethod
+    def _reset_session(connection):
+        """
+        清除上一个借用者留下的会话状态（未提交的事务、USE切换的数据库、用户变量、
+        SET SESSION修改的变量、临时表与预处理语句），恢复到刚建立连接时的状态
+        """
+        connection._execute_command(_COM_RESET_CONNECTION, b"")
+        connection._read_ok_packet()
+        # 重置后会话变量回到全局默认值，需重新设置建立连接时指定的字符集、自动提交模式与数据库
+        connection.set_character_set(connection.charset, connection.collation)
+        if connection.autocommit_mode is not None:
+            connection.autocommit(connection.autocommit_mode)
+        if connection.db:
+            connection.select_db(connection.db)
+
+    def _connect(self):
+        connection = pymysql.connect(**self.connect_kwargs)
+        now = time.monotonic()
+        return connection, now, now
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_db_pool():
+    """
+    获取进程内共享的数据库连接池，使用src/config.py中的数据库配置
+
+    Returns:
+        ConnectionPool: 连接池
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                host=DB_HOST,
+                user=DB_USER,
+                passwd=DB_PASSWORD,
+                db=DB_NAME,
+                port=int(DB_PORT),
+                charset='utf8',
+            )
+        return _pool
@@ -1,10 +1,36 @@
 """
 数据库服务模块，提供SQL查询和数据提取功能
 """
+import os
 import json
+import time
+import uuid
+import logging
 import pymysql
 import pandas as pd
-from src.config import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT
+from src.config import (KERNEL_POOL_ENABLED, SQL_CACHE_ENABLED, RESULT_MAX_CHARS, RESULT_PREVIEW_ROWS, EXTRACT_CHUNK_SIZE,
+                        EXTRACT_MAX_ROWS, EXTRACT_MAX_BYTES, EXTRACT_SPILL_BYTES, EXTRACT_SPILL_DIR,
+                        EXTRACT_SPILL_TTL, LOG_LEVEL, LOG_FORMAT)
+from src.services.db_pool import get_db_pool
+from src.services.query_cache import get_query_cache
+from src.services.schema_service import detect_ddl, get_schema_index
+from src.utils.dataframe_utils import compact_dtypes, load_feather
+from src.utils.file_utils import ensure_dir
+from src.utils.render_utils import ResultStore, render_result, expand
+
+try:
+    # pyarrow为可选依赖，未安装时大结果集不落盘
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401
+except ImportError:
+    pa = None
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# 保存被截断的SQL查询结果，供expand_result分段查看
+_sql_results = ResultStore('sql')
 
 
 def sql_inter(sql_query, g=None):
@@ -22,56 +48,295 @@ def sql_inter(sql_query, g=None):
     """
     print("正在调用sql_inter工具运行SQL代码...")
     
-    connection = pymysql.connect(
-        host=DB_HOST,  
-        user=DB_USER, 
-        passwd=DB_PASSWORD,  
-        db=DB_NAME,
-        port=int(DB_PORT),
-        charset='utf8',
+    cache = get_query_cache() if SQL_CACHE_ENABLED else None
+    key = cache.key(sql_query) if cache is not None else None
+    results = cache.get(key) if key is not None else None
+    if results is not None:
+        logger.info("SQL查询命中缓存")
+    else:
+        try:
+            with get_db_pool().connection() as connection:
+                with connection.cursor() as cursor:
+                    sql = sql_query
+                    cursor.execute(sql)
+                    results = cursor.fetchall()
+                    print("SQL代码已顺利运行，正在整理答案...")
+        finally:
+            # 写入与DDL语句即使执行失败也可能已部分生效，一律清空缓存
+            if cache is not None and key is None and cache.is_write(sql_query):
+                cache.invalidate()
+            is_ddl, table = detect_ddl(sql_query)
+            if is_ddl:
+                get_schema_index().mark_stale(table)
+        if key is not None:
+            cache.set(key, results)
+
+    text = json.dumps(results, ensure_ascii=False, default=str)
+    if len(text) <= RESULT_MAX_CHARS:
+        return render_result(text)
+    # 结果过长时只展示前若干行，完整结果通过句柄分段查看
+    preview = json.dumps(results[:RESULT_PREVIEW_ROWS], ensure_ascii=False, default=str)
+    handle = _sql_results.put(results)
+    return render_result(
+        f"共 {len(results)} 行，前 {min(len(results), RESULT_PREVIEW_ROWS)} 行: {preview}\n"
+        f"...（结果过长，已截断。可调用 expand_result 工具并传入 handle='{handle}'、offset 与 limit 分段查看完整内容）"
     )
-    
-    try:
-        with connection.cursor() as cursor:
-            sql = sql_query
-            cursor.execute(sql)
-            results = cursor.fetchall()
-            print("SQL代码已顺利运行，正在整理答案...")
 
-    finally:
-        connection.close()
 
-    return json.dumps(results)
+def expand_sql_result(handle, offset=0, limit=50):
+    """
+    分段查看被截断的SQL查询结果
+    
+    参数:
+    - handle: 结果句柄
+    - offset: 起始行序号
+    - limit: 展示的行数
+    
+    返回:
+    - 分段内容（JSON字符串）
+    """
+    results = _sql_results.get(handle)
+    if results is None:
+        return f"结果句柄 {handle} 不存在或已过期，请重新执行查询"
+    return expand(results, offset, limit)
 
 
-def extract_data(sql_query, df_name, g=None):
+def extract_data(sql_query, df_name, g=None, session_id=None, max_rows=None):
     """
     借助pymysql将MySQL中的某张表读取并保存到本地Python环境中。
+    使用服务端游标分块读取，超过阈值时落盘为Feather文件并以内存映射方式加载。
     
     参数:
     - sql_query: 字符串形式的SQL查询语句
     - df_name: 将查询结果保存的变量名
-    - g: 环境变量字典，默认为None，使用全局变量
+    - g: 环境变量字典，默认为None，启用内核池时保存到会话的Python运行环境，否则使用全局变量
+    - session_id: 会话ID，用于在内核池中定位该会话的运行环境
+    - max_rows: 最多读取的行数，默认使用EXTRACT_MAX_ROWS配置
     
     返回:
     - 操作结果信息（字符串）
     """
     print("正在调用extract_data工具运行SQL代码...")
     
-    if g is None:
+    use_kernel = not isinstance(g, dict) and KERNEL_POOL_ENABLED
+    if not isinstance(g, dict):
         g = globals()
     
-    connection = pymysql.connect(
-        host=DB_HOST,  
-        user=DB_USER, 
-        passwd=DB_PASSWORD,  
-        db=DB_NAME,
-        port=int(DB_PORT),
-        charset='utf8',
-    )
+    extraction = stream_query(sql_query, max_rows=max_rows or EXTRACT_MAX_ROWS)
     
-    g[df_name] = pd.read_sql(sql_query, connection)
-    connection.close()
+    if use_kernel:
+        # 将数据写入会话的运行环境，供后续python_inter/fig_inter使用；已落盘的数据只传递文件路径
+        from src.services.kernel_pool import get_kernel_pool
+        try:
+            if extraction.path:
+                get_kernel_pool().load_dataframe(session_id, df_name, extraction.path)
+            else:
+                get_kernel_pool().set_variable(session_id, df_name, extraction.df)
+        except RuntimeError as e:
+            return f"数据已查询，但写入Python运行环境失败：{e}"
+    else:
+        g[df_name] = extraction.df if extraction.df is not None else load_feather(extraction.path)
     
     print("代码已顺利执行，正在进行结果梳理...")
-    return f"已成功创建pandas对象：{df_name}，该变量保存了查询结果" 
\ No newline at end of file
+    message = f"已成功创建pandas对象：{df_name}，该变量保存了查询结果（{extraction.rows} 行，约 {extraction.nbytes / 1024 / 1024:.1f} MB）"
+    if extraction.truncated:
+        message += f"。注意：结果超过行数或内存上限，仅读取了前 {extraction.rows} 行，如需完整数据请在SQL中先做聚合或筛选"
+    return message
+
+
+class Extraction:
+    """流式提取的结果：内存中的DataFrame或落盘文件路径，二者其一"""
+
+    def __init__(self, df, path, rows, nbytes, truncated):
+        self.df = df
+        self.path = path
+        self.rows = rows
+        self.nbytes = nbytes
+        self.truncated = truncated
+
+
+def stream_query(sql_query, max_rows=EXTRACT_MAX_ROWS, max_bytes=EXTRACT_MAX_BYTES,
+                 chunk_size=EXTRACT_CHUNK_SIZE, spill_bytes=EXTRACT_SPILL_BYTES, progress=None):
+    """
+    通过服务端游标（SSCursor）分块读取查询结果，避免同时在内存中保留全部元组和DataFrame
+    
+    参数:
+    - sql_query: 字符串形式的SQL查询语句
+    - max_rows: 最多读取的行数，0表示不限制
+    - max_bytes: 最多读取的数据量（按DataFrame内存占用估算），0表示不限制
+    - chunk_size: 每次从服务端读取的行数
+    - spill_bytes: 数据量超过该值时写入Feather文件（需要安装pyarrow），0表示不落盘
+    - progress: 可选的进度回调，签名为 progress(已读取行数, 已读取字节数)
+    
+    返回:
+    - Extraction对象
+    """
+    pool = get_db_pool()
+    chunks = []
+    rows = 0
+    nbytes = 0
+    truncated = False
+    writer = None
+    path = None
+    schema = None
+    # 落盘失败（如各分块的列类型无法统一）后不再尝试落盘
+    spill_enabled = bool(spill_bytes) and pa is not None
+    finished = False
+    with pool.connection(cursorclass=pymysql.cursors.SSCursor) as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(sql_query)
+            columns = [column[0] for column in cursor.description]
+            while True:
+                batch = cursor.fetchmany(chunk_size)
+                if not batch:
+                    finished = True
+                    break
+                if max_rows and rows + len(batch) >= max_rows:
+                    truncated = rows + len(batch) > max_rows or bool(cursor.fetchmany(1))
+                    finished = not truncated
+                    batch = batch[:max_rows - rows]
+                chunk = pd.DataFrame.from_records(batch, columns=columns)
+                rows += len(chunk)
+                nbytes += int(chunk.memory_usage(deep=True).sum())
+
+                if writer is None and spill_enabled and nbytes > spill_bytes:
+                    # 数据量较大，之后的分块直接写入磁盘
+                    try:
+                        path, writer, schema = _open_spill_file(pd.concat(chunks + [chunk], ignore_index=True))
+                        chunks = []
+                    except pa.ArrowException as e:
+                        logger.warning(f"extract_data 查询结果无法转换为Arrow格式（{e}），改为在内存中保存")
+                        spill_enabled = False
+                        chunks.append(chunk)
+                elif writer is not None:
+                    try:
+                        path, writer, schema = _write_spill_chunk(path, writer, schema, chunk)
+                    except pa.ArrowException as e:
+                        logger.warning(f"extract_data 分块的列类型与落盘文件不兼容（{e}），改为在内存中保存")
+                        chunks = [_read_spill_file(path, writer), chunk]
+                        path, writer, spill_enabled = None, None, False
+                else:
+                    chunks.append(chunk)
+
+                if progress is not None:
+                    progress(rows, nbytes)
+                if rows // chunk_size % 10 == 0:
+                    logger.info(f"extract_data 已读取 {rows} 行，约 {nbytes / 1024 / 1024:.1f} MB")
+                if finished:
+                    break
+                if truncated or (max_bytes and nbytes >= max_bytes):
+                    truncated = True
+                    break
+        finally:
+            if finished:
+                cursor.close()
+            else:
+                # 服务端游标关闭时会读完剩余结果，提前结束或出错时直接关闭并丢弃该连接
+                pool.invalidate(connection)
+                connection.close()
+            if writer is not None and not finished and not truncated:
+                writer.close()
+    logger.info(f"extract_data 读取完成，共 {rows} 行，约 {nbytes / 1024 / 1024:.1f} MB")
+
+    if writer is not None:
+        writer.close()
+        return Extraction(None, path, rows, nbytes, truncated)
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+    return Extraction(compact_dtypes(df), None, rows, nbytes, truncated)
+
+
+def _open_spill_file(df):
+    """
+    创建Feather（Arrow IPC）文件并写入第一批数据
+
+    返回:
+    - (文件路径, 写入器, 表结构)
+    """
+    ensure_dir(EXTRACT_SPILL_DIR)
+    _cleanup_spill_files()
+    path = os.path.join(EXTRACT_SPILL_DIR, f"{uuid.uuid4().hex}.feather")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    writer = pa.ipc.new_file(path, table.schema)
+    writer.write_table(table)
+    logger.info(f"extract_data 数据量较大，落盘至 {path}")
+    return path, writer, table.schema
+
+
+def _write_spill_chunk(path, writer, schema, chunk):
+    """
+    将分块追加到落盘文件。分块的列类型与文件不一致时（如前面的分块中某列全为空、
+    DECIMAL精度不同），先尝试转换为文件的表结构，不能转换时放宽表结构并重写文件
+
+    返回:
+    - (文件路径, 写入器, 表结构)，重写后为新文件
+
+    异常:
+    - pyarrow.ArrowException: 列类型无法统一
+    """
+    table = pa.Table.from_pandas(chunk, preserve_index=False)
+    if not table.schema.equals(schema):
+        try:
+            table = table.cast(schema)
+        except pa.ArrowException:
+            widened = _unify_schemas(schema, table.schema)
+            table = table.cast(widened)
+            path, writer = _rewrite_spill_file(path, writer, widened)
+            schema = widened
+    writer.write_table(table)
+    return path, writer, schema
+
+
+def _unify_schemas(schema, other):
+    try:
+        return pa.unify_schemas([schema, other], promote_options='permissive')
+    except TypeError:
+        # pyarrow 14 之前的版本不支持promote_options，只能合并空类型的列
+        return pa.unify_schemas([schema, other])
+
+
+def _rewrite_spill_file(path, writer, schema):
+    """
+    按放宽后的表结构将已落盘的数据逐批转换并写入新文件，删除原文件
+
+    返回:
+    - (新文件路径, 新写入器)
+    """
+    writer.close()
+    new_path = os.path.join(EXTRACT_SPILL_DIR, f"{uuid.uuid4().hex}.feather")
+    new_writer = pa.ipc.new_file(new_path, schema)
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for index in range(reader.num_record_batches):
+            new_writer.write_table(pa.Table.from_batches([reader.get_batch(index)]).cast(schema))
+    os.remove(path)
+    logger.info(f"extract_data 落盘文件的列类型已放宽，改写至 {new_path}")
+    return new_path, new_writer
+
+
+def _read_spill_file(path, writer):
+    """
+    关闭写入器，将已落盘的数据读回内存并删除文件
+
+    返回:
+    - DataFrame
+    """
+    writer.close()
+    with pa.memory_map(path) as source:
+        df = pa.ipc.open_file(source).read_all().to_pandas()
+    os.remove(path)
+    return df
+
+
+def _cleanup_spill_files():
+    """
+    删除超过EXTRACT_SPILL_TTL的落盘文件
+    """
+    now = time.time()
+    for name in os.listdir(EXTRACT_SPILL_DIR):
+        file_path = os.path.join(EXTRACT_SPILL_DIR, name)
+        try:
+            if now - os.path.getmtime(file_path) > EXTRACT_SPILL_TTL:
+                os.remove(file_path)
+        except OSError:
+            pass
@@ -0,0 +1,208 @@
+"""
+碳排放计算服务模块，按公式 E(i)=A(i)*EF(i) 向量化计算各活动及总的碳排放量
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.utils.render_utils import render_result
+
+# 未命名情景的默认名称
+DEFAULT_SCENARIO = '默认情景'
+
+
+def _to_number(values):
+    """
+    将活动水平、排放因子等输入统一转换为浮点数，去掉千分位逗号，无法解析的值为NaN
+    """
+    series = pd.Series(values, dtype=object)
+    if series.empty:
+        return series.astype(float)
+    cleaned = series.map(lambda value: value.replace(',', '').replace('，', '').strip()
+                         if isinstance(value, str) else value)
+    return pd.to_numeric(cleaned, errors='coerce').astype(float)
+
+
+def _parse_argument(value, name, expected):
+    """
+    解析工具参数：模型常把数组或对象参数序列化为JSON字符串传入，此时先反序列化；
+    期望列表时单个对象视为只有一项的列表
+
+    参数:
+    - value: 参数值
+    - name: 参数名，用于错误提示
+    - expected: 期望的类型，list或dict
+
+    返回:
+    - 解析后的参数值，为空时返回None
+
+    异常:
+    - ValueError: 参数不是合法的JSON或类型不符
+    """
+    if isinstance(value, str):
+        if not value.strip():
+            return None
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"参数 {name} 不是合法的JSON: {e}") from e
+    if not value:
+        return None
+    if expected is list and isinstance(value, dict):
+        value = [value]
+    if not isinstance(value, expected):
+        kind = '数组' if expected is list else '对象'
+        raise ValueError(f"参数 {name} 应为{kind}，实际为 {type(value).__name__}")
+    return value
+
+
+def _collect_groups(activities=None, scenarios=None):
+    """
+    校验并整理各情景的活动列表
+
+    返回:
+    - [(情景名称, 活动列表)]，活动列表可能为空
+
+    异常:
+    - ValueError: 参数格式不正确或情景名称重复
+    """
+    groups = []
+    activities = _parse_argument(activities, 'activities', list)
+    if activities:
+        groups.append((DEFAULT_SCENARIO, activities))
+    for index, scenario in enumerate(_parse_argument(scenarios, 'scenarios', list) or []):
+        if not isinstance(scenario, dict):
+            raise ValueError(f"scenarios 的第 {index + 1} 项应为包含 name 与 activities 的对象")
+        name = scenario.get('name') or f'情景{index + 1}'
+        if any(name == existing for existing, _ in groups):
+            # 按情景名称汇总，同名情景会被合并为一个总量，因此要求名称唯一
+            raise ValueError(f"情景名称重复: {name}，请为每个情景使用不同的名称")
+        groups.append((name, _parse_argument(scenario.get('activities'), f'{name} 的 activities', list) or []))
+    for scenario_name, items in groups:
+        for item in items:
+            if not isinstance(item, dict):
+                raise ValueError(f"{scenario_name} 的活动应为包含 name、activity 的对象，实际为: {item!r}")
+    return groups
+
+
+def build_activity_table(activities=None, scenarios=None, factors=None):
+    """
+    将一个或多个情景的活动清单展开为一张明细表
+
+    参数:
+    - activities: 单个情景的活动列表，元素为 {"name", "activity", "factor"(可选), "unit"(可选)}
+    - scenarios: 多个情景，元素为 {"name", "activities"}；与activities同时提供时activities作为默认情景
+    - factors: 活动名称到排放因子的映射，活动未给出factor时使用
+
+    返回:
+    - DataFrame，列为 scenario、name、unit、activity、factor
+
+    异常:
+    - ValueError: 参数格式不正确
+    """
+    return _table_from_groups(_collect_groups(activities, scenarios), _parse_argument(factors, 'factors', dict))
+
+
+def _table_from_groups(groups, factors=None):
+    """
+    根据_collect_groups整理好的情景活动列表构造明细表
+
+    参数:
+    - groups: [(情景名称, 活动列表)]
+    - factors: 活动名称到排放因子的映射
+
+    返回:
+    - DataFrame，列为 scenario、name、unit、activity、factor
+    """
+    rows = [
+        {
+            'scenario': scenario_name,
+            'name': str(item.get('name', '')).strip(),
+            'unit': item.get('unit') or '',
+            'activity': item.get('activity'),
+            'factor': item.get('factor'),
+        }
+        for scenario_name, items in groups
+        for item in items
+    ]
+    table = pd.DataFrame(rows, columns=['scenario', 'name', 'unit', 'activity', 'factor'])
+    table['activity'] = _to_number(table['activity'].tolist())
+    table['factor'] = _to_number(table['factor'].tolist())
+    if factors:
+        # 活动自带的排放因子优先，缺失时按名称从因子表中补齐
+        lookup = _to_number(list(factors.values()))
+        lookup.index = [str(name).strip() for name in factors]
+        table['factor'] = table['factor'].fillna(table['name'].map(lookup))
+    return table
+
+
+def compute_emissions(table):
+    """
+    向量化计算明细表中每项活动的排放量、在所属情景中的占比以及各情景的总量
+
+    参数:
+    - table: build_activity_table返回的明细表
+
+    返回:
+    - (含emission与share列的明细表, 各情景总量的Series)
+    """
+    table = table.copy()
+    table['emission'] = table['activity'].to_numpy() * table['factor'].to_numpy()
+    totals = table.groupby('scenario', sort=False)['emission'].sum(min_count=1)
+    scenario_totals = table['scenario'].map(totals).to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['share'] = np.where(scenario_totals > 0, table['emission'].to_numpy() / scenario_totals, np.nan)
+    return table, totals
+
+
+def calculate_emissions(activities=None, scenarios=None, factors=None, emission_unit='kgCO2e'):
+    """
+    按公式 E(i)=A(i)*EF(i) 计算各项活动的碳排放量及总量，支持一次计算多个情景。
+
+    参数:
+    - activities: 活动列表，每项包含 name（活动名称）、activity（活动水平A）、factor（排放因子EF，可选）、unit（活动水平单位，可选）
+    - scenarios: 多个情景，每项包含 name（情景名称，不能重复）与 activities（该情景的活动列表）
+    - factors: 活动名称到排放因子的映射，活动未给出factor时使用
+    - emission_unit: 排放量的单位，仅用于展示
+
+    返回:
+    - 各情景的排放明细与总量（字符串形式）
+    """
+    print("正在调用calculate_emissions工具计算碳排放量...")
+
+    try:
+        groups = _collect_groups(activities, scenarios)
+        table = _table_from_groups(groups, _parse_argument(factors, 'factors', dict))
+    except ValueError as e:
+        return f"参数格式错误: {e}"
+    if table.empty:
+        return "请至少提供一项活动（activities）或一个包含活动的情景（scenarios）"
+    table, totals = compute_emissions(table)
+
+    lines = []
+    empty = [name for name, items in groups if not items]
+    if empty:
+        lines.append(f"以下情景未提供任何活动，未进行计算: {', '.join(empty)}")
+    for scenario, rows in table.groupby('scenario', sort=False):
+        total = totals[scenario]
+        total_text = f"{total:.6g} {emission_unit}" if pd.notna(total) else "无法计算"
+        lines.append(f"【{scenario}】总排放量: {total_text}")
+        detail = pd.DataFrame({
+            '活动': rows['name'],
+            '活动水平': [f"{value:.6g} {unit}".strip() if pd.notna(value) else '缺失'
+                      for value, unit in zip(rows['activity'], rows['unit'])],
+            '排放因子': [f"{value:.6g}" if pd.notna(value) else '缺失' for value in rows['factor']],
+            f'排放量({emission_unit})': [f"{value:.6g}" if pd.notna(value) else '-' for value in rows['emission']],
+            '占比': [f"{value:.1%}" if pd.notna(value) else '-' for value in rows['share']],
+        })
+        lines.append(detail.to_string(index=False))
+        missing = rows.loc[rows['emission'].isna(), 'name'].tolist()
+        if missing:
+            lines.append(f"以下活动缺少有效的活动水平或排放因子，未计入总量: {', '.join(missing)}")
+
+    if len(totals) > 1:
+        summary = ", ".join(f"{name}: {value:.6g}" if pd.notna(value) else f"{name}: 无法计算"
+                            for name, value in totals.items())
+        lines.append(f"各情景总排放量（{emission_unit}）: {summary}")
+    return render_result("\n".join(lines))
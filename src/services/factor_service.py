@@ -0,0 +1,304 @@
+"""
+排放因子库服务模块，从本地因子库中按活动名称、类别、地区查找排放因子并换算单位
+"""
+import os
+import csv
+import re
+import sqlite3
+import difflib
+import logging
+import threading
+from collections import defaultdict
+
+from src.config import (
+    EMISSION_FACTOR_CSV, EMISSION_FACTOR_DB, EMISSION_FACTOR_MATCH_CUTOFF, LOG_LEVEL, LOG_FORMAT
+)
+from src.utils.file_utils import ensure_dir
+from src.utils.render_utils import render_result
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE factors (
+    id INTEGER PRIMARY KEY,
+    activity TEXT NOT NULL,
+    aliases TEXT,
+    category TEXT,
+    region TEXT,
+    factor REAL NOT NULL,
+    unit TEXT NOT NULL,
+    emission_unit TEXT NOT NULL,
+    source TEXT
+);
+CREATE INDEX idx_factors_activity ON factors (activity);
+CREATE INDEX idx_factors_category ON factors (category);
+CREATE INDEX idx_factors_region ON factors (region);
+CREATE INDEX idx_factors_unit ON factors (unit);
+"""
+
+_COLUMNS = ('activity', 'aliases', 'category', 'region', 'factor', 'unit', 'emission_unit', 'source')
+
+# 活动水平单位换算到各量纲基准单位的倍数（能量: J，质量: kg，体积: m3）
+UNITS = {
+    'j': ('energy', 1.0), 'kj': ('energy', 1e3), 'mj': ('energy', 1e6),
+    'gj': ('energy', 1e9), 'tj': ('energy', 1e12),
+    'wh': ('energy', 3.6e3), 'kwh': ('energy', 3.6e6), 'mwh': ('energy', 3.6e9), 'gwh': ('energy', 3.6e12),
+    '度': ('energy', 3.6e6), '千瓦时': ('energy', 3.6e6), '兆瓦时': ('energy', 3.6e9),
+    'g': ('mass', 1e-3), 'kg': ('mass', 1.0), 't': ('mass', 1e3), 'kt': ('mass', 1e6),
+    '克': ('mass', 1e-3), '千克': ('mass', 1.0), '公斤': ('mass', 1.0), '吨': ('mass', 1e3),
+    'l': ('volume', 1e-3), 'm3': ('volume', 1.0), '升': ('volume', 1e-3), '立方米': ('volume', 1.0),
+}
+
+# 缓存的模糊匹配结果数上限
+_MATCH_CACHE_SIZE = 1024
+
+# 排放量单位中的质量前缀，如 kgCO2e 中的 kg
+_EMISSION_UNIT_PATTERN = re.compile(r'^(kt|kg|g|t)(.*)$')
+
+
+def normalize_name(name):
+    """
+    规范化活动名称：转为小写并去掉空白及常见标点，用于名称匹配
+    """
+    return re.sub(r"[\s_\-·,，()（）]+", "", str(name or "")).lower()
+
+
+def convert_factor(factor, unit, to_unit=None, emission_unit=None, to_emission_unit=None):
+    """
+    将排放因子换算为以to_unit为活动水平单位、以to_emission_unit为排放量单位的数值
+
+    参数:
+    - factor: 排放因子数值
+    - unit: 排放因子对应的活动水平单位，如 'TJ'
+    - to_unit: 目标活动水平单位，如 'GJ'，为空时不换算
+    - emission_unit: 排放量单位，如 'kgCO2'
+    - to_emission_unit: 目标排放量单位，如 'tCO2'、'kg'，为空时不换算
+
+    返回:
+    - (换算后的因子, 活动水平单位, 排放量单位)
+
+    异常:
+    - ValueError: 单位无法识别或量纲不同
+    """
+    if to_unit and normalize_name(to_unit) != normalize_name(unit):
+        source, target = UNITS.get(normalize_name(unit)), UNITS.get(normalize_name(to_unit))
+        if source is None or target is None:
+            raise ValueError(f"无法识别单位 {unit if source is None else to_unit}")
+        if source[0] != target[0]:
+            raise ValueError(f"单位 {unit} 与 {to_unit} 的量纲不同，需要先按热值或密度换算活动水平")
+        # 每单位活动水平的排放量与活动水平单位的大小成正比
+        factor = factor * target[1] / source[1]
+        unit = to_unit
+    if to_emission_unit and emission_unit:
+        source, target = _EMISSION_UNIT_PATTERN.match(emission_unit), _EMISSION_UNIT_PATTERN.match(to_emission_unit)
+        if source is None or target is None:
+            raise ValueError(f"无法识别排放量单位 {emission_unit if source is None else to_emission_unit}")
+        factor = factor * UNITS[source.group(1)][1] / UNITS[target.group(1)][1]
+        emission_unit = target.group(1) + (target.group(2) or source.group(2))
+    return factor, unit, emission_unit
+
+
+class EmissionFactorStore:
+    """
+    排放因子库：数据保存在带索引的SQLite库中，首次使用时整体加载到内存，
+    按名称（含别名）、类别、地区建立索引，查找时不再访问磁盘
+    """
+
+    def __init__(self, db_path=EMISSION_FACTOR_DB, csv_path=EMISSION_FACTOR_CSV, cutoff=EMISSION_FACTOR_MATCH_CUTOFF):
+        """
+        初始化排放因子库，CSV比SQLite库新时先用CSV重建SQLite库
+
+        Args:
+            db_path (str): SQLite库文件路径
+            csv_path (str): 作为数据源的CSV文件路径
+            cutoff (float): 模糊匹配的最低相似度（0~1）
+        """
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self.cutoff = cutoff
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _needs_rebuild(self):
+        if not os.path.exists(self.csv_path):
+            return False
+        return not os.path.exists(self.db_path) or os.path.getmtime(self.csv_path) > os.path.getmtime(self.db_path)
+
+    def rebuild(self):
+        """
+        用CSV中的数据重建SQLite库，先写入临时文件再替换，避免其他进程读到不完整的库
+        """
+        with open(self.csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+            rows = [tuple(row.get(column) or None for column in _COLUMNS) for row in csv.DictReader(f)]
+        ensure_dir(os.path.dirname(self.db_path))
+        temp_path = f"{self.db_path}.{os.getpid()}.tmp"
+        connection = sqlite3.connect(temp_path)
+        try:
+            connection.executescript(_SCHEMA)
+            connection.executemany(
+                f"INSERT INTO factors ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})", rows
+            )
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(temp_path, self.db_path)
+        logger.info(f"已从 {self.csv_path} 重建排放因子库，共 {len(rows)} 条")
+
+    def reload(self):
+        """
+        必要时重建SQLite库，并将全部排放因子加载到内存、建立索引
+        """
+        with self._lock:
+            if self._needs_rebuild():
+                self.rebuild()
+            records = []
+            if os.path.exists(self.db_path):
+                connection = sqlite3.connect(self.db_path)
+                connection.row_factory = sqlite3.Row
+                try:
+                    records = [dict(row) for row in connection.execute("SELECT * FROM factors ORDER BY id")]
+                finally:
+                    connection.close()
+            else:
+                logger.warning(f"排放因子库不存在: {self.db_path}")
+
+            names = defaultdict(list)
+            for index, record in enumerate(records):
+                for name in [record['activity']] + (record['aliases'] or '').split('|'):
+                    if name.strip():
+                        names[normalize_name(name)].append(index)
+            self.records = records
+            self._names = dict(names)
+            # 模糊匹配结果的缓存，因子库重新加载后失效
+            self._matches = {}
+            logger.info(f"排放因子库加载完成，共 {len(records)} 条")
+
+    def match(self, activity):
+        """
+        按名称匹配排放因子：精确匹配名称及别名，未命中时再匹配包含关系并按相似度模糊匹配
+
+        Args:
+            activity (str): 活动名称
+
+        Returns:
+            list: [(记录序号, 匹配得分)]，按得分从高到低排列
+        """
+        key = normalize_name(activity)
+        if not key:
+            return []
+        if key in self._names:
+            # 精确命中名称或别名时直接返回，不再逐一比较相似度
+            return [(index, 1.0) for index in self._names[key]]
+        cached = self._matches.get(key)
+        if cached is not None:
+            return cached
+        scores = {}
+        for name, indexes in self._names.items():
+            if key in name or name in key:
+                score = 0.8 + 0.1 * min(len(key), len(name)) / max(len(key), len(name))
+            else:
+                score = difflib.SequenceMatcher(None, key, name).ratio()
+                if score < self.cutoff:
+                    continue
+                score *= 0.8
+            for index in indexes:
+                scores[index] = max(scores.get(index, 0.0), score)
+        result = sorted(scores.items(), key=lambda item: -item[1])
+        if len(self._matches) >= _MATCH_CACHE_SIZE:
+            self._matches.clear()
+        self._matches[key] = result
+        return result
+
+    def lookup(self, activity, region=None, category=None, unit=None, emission_unit=None, limit=5):
+        """
+        查找排放因子，指定地区时优先返回该地区的因子
+
+        Args:
+            activity (str): 活动名称
+            region (str): 地区，如 '中国'
+            category (str): 类别，如 '燃料燃烧'
+            unit (str): 希望使用的活动水平单位，因子将换算为该单位
+            emission_unit (str): 希望使用的排放量单位，如 'tCO2'
+            limit (int): 最多返回的条数
+
+        Returns:
+            list: 排放因子记录，含换算后的factor、unit、emission_unit以及匹配得分score，
+                无法换算时记录中带有error
+        """
+        results = []
+        for index, score in self.match(activity):
+            record = self.records[index]
+            if category and normalize_name(category) != normalize_name(record['category']):
+                continue
+            result = dict(record, score=round(score, 3))
+            try:
+                result['factor'], result['unit'], result['emission_unit'] = convert_factor(
+                    record['factor'], record['unit'], unit, record['emission_unit'], emission_unit)
+            except ValueError as e:
+                result['error'] = str(e)
+            results.append(result)
+        if region:
+            # 排序稳定，相同地区内仍按匹配得分排列
+            results.sort(key=lambda item: normalize_name(item['region']) != normalize_name(region))
+        return results[:limit]
+
+
+def _format_factor(record):
+    line = (f"- {record['activity']}（{record['category'] or '未分类'}，{record['region'] or '未注明地区'}）: "
+            f"{record['factor']:.6g} {record['emission_unit']}/{record['unit']}")
+    if record.get('source'):
+        line += f"，来源: {record['source']}"
+    if record.get('error'):
+        line += f"（{record['error']}，以上为原始单位）"
+    return line
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_factor_store():
+    """
+    获取进程内共享的排放因子库
+
+    Returns:
+        EmissionFactorStore: 排放因子库
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = EmissionFactorStore()
+        return _store
+
+
+def lookup_emission_factor(activity, region=None, category=None, unit=None, emission_unit=None, limit=5):
+    """
+    从本地排放因子库中查找排放因子，并换算为指定的单位。
+
+    参数:
+    - activity: 活动名称，例如 '柴油'、'电力'，多个名称以逗号分隔
+    - region: 优先使用的地区，例如 '中国'
+    - category: 类别，例如 '燃料燃烧'、'电力'
+    - unit: 活动水平单位，例如 'GJ'、'kWh'，因子将换算为该单位
+    - emission_unit: 排放量单位，例如 'kgCO2'、'tCO2'
+    - limit: 每个名称最多返回的条数
+
+    返回:
+    - 匹配到的排放因子（字符串形式）
+    """
+    print("正在调用lookup_emission_factor工具查找排放因子...")
+
+    store = get_factor_store()
+    sections = []
+    for name in [item.strip() for item in re.split(r'[,，]', activity or '') if item.strip()]:
+        results = store.lookup(name, region=region, category=category, unit=unit,
+                               emission_unit=emission_unit, limit=limit)
+        if results:
+            sections.append(f"{name}:\n" + "\n".join(_format_factor(record) for record in results))
+        else:
+            sections.append(f"{name}: 因子库中没有找到匹配的排放因子")
+    if not sections:
+        return "请提供需要查找的活动名称"
+    return render_result("\n\n".join(sections))
@@ -0,0 +1,119 @@
+"""
+图片渲染服务模块，将matplotlib图像对象渲染为按内容寻址的图片文件，并返回可通过HTTP访问的地址
+"""
+import io
+import os
+import sys
+import hashlib
+import threading
+
+import matplotlib
+# 整个进程固定使用无交互式后端，不再在每次绘图时来回切换
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+
+from src.config import (  # noqa: E402
+    FIGURE_DIR, FIGURE_FORMAT, FIGURE_DPI, FIGURE_MAX_DPI, FIGURE_MAX_PIXELS, FIGURE_URL_PREFIX
+)
+from src.services.artifact_service import MIME_TYPES  # noqa: E402
+from src.utils.file_utils import ensure_dir  # noqa: E402
+
+# 去掉输出中的生成时间，使相同的图像得到相同的文件名
+_METADATA = {
+    'png': {'Software': None},
+    'svg': {'Date': None},
+    'webp': None,
+}
+
+
+def _clamp_dpi(fig, dpi):
+    """
+    将DPI限制在FIGURE_MAX_DPI以内，并保证图片的长边不超过FIGURE_MAX_PIXELS像素
+    """
+    dpi = min(dpi or FIGURE_DPI, FIGURE_MAX_DPI)
+    longest = max(fig.get_size_inches())
+    if longest * dpi > FIGURE_MAX_PIXELS:
+        dpi = FIGURE_MAX_PIXELS / longest
+    return dpi
+
+
+def _check_format(image_format):
+    image_format = (image_format or FIGURE_FORMAT).lower()
+    if image_format not in MIME_TYPES:
+        raise ValueError(f"不支持的图片格式 {image_format}，可选: {', '.join(MIME_TYPES)}")
+    return image_format
+
+
+def render_figure(fig, image_format=None, dpi=None):
+    """
+    将图像对象渲染为图片字节
+
+    参数:
+    - fig: matplotlib图像对象
+    - image_format: 图片格式，png、svg或webp，默认使用FIGURE_FORMAT
+    - dpi: 分辨率，会被限制在FIGURE_MAX_DPI与FIGURE_MAX_PIXELS以内
+
+    返回:
+    - (图片字节, 图片格式)
+    """
+    image_format = _check_format(image_format)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=image_format, dpi=_clamp_dpi(fig, dpi), bbox_inches='tight',
+                metadata=_METADATA[image_format])
+    return buffer.getvalue(), image_format
+
+
+def save_figure(fig, image_format=None, dpi=None, directory=FIGURE_DIR):
+    """
+    渲染图像并以内容哈希为文件名保存，相同内容只保存一次，不同请求之间不会互相覆盖
+
+    参数:
+    - fig: matplotlib图像对象
+    - image_format: 图片格式，png、svg或webp
+    - dpi: 分辨率
+    - directory: 图片保存目录
+
+    返回:
+    - 包含name、path、url、format、size的字典
+    """
+    data, image_format = _offload(render_figure, fig, _check_format(image_format), dpi)
+    name = f"{hashlib.sha256(data).hexdigest()[:32]}.{image_format}"
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        ensure_dir(directory)
+        # 先写入临时文件再重命名，避免读到写了一半的图片
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    else:
+        # 刷新时间，使磁盘配额清理时保留仍在使用的图片
+        os.utime(path)
+    return {
+        'name': name,
+        'path': path,
+        'url': f"{FIGURE_URL_PREFIX.rstrip('/')}/{name}",
+        'format': image_format,
+        'size': len(data),
+    }
+
+
+def close_new_figures(before):
+    """
+    关闭在记录before（plt.get_fignums()的返回值）之后新建的pyplot图像，避免图像在内存中堆积
+    """
+    for number in set(plt.get_fignums()) - set(before):
+        plt.close(number)
+
+
+def _offload(func, *args):
+    """
+    在gevent已monkey patch的进程中，将CPU密集的渲染放到gevent的原生线程池中执行，
+    避免阻塞事件循环；在内核池工作进程等普通进程中直接执行
+    """
+    if 'gevent' in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            import gevent
+            return gevent.get_hub().threadpool.apply(func, args)
+    return func(*args)
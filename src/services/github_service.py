@@ -0,0 +1,342 @@
+"""
+GitHub内容服务模块，提供带条件请求缓存、速率限制调度与并发获取的README读取功能
+"""
+import re
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from src.config import (GITHUB_TOKEN, GITHUB_CACHE_DIR, GITHUB_CACHE_SIZE, GITHUB_CACHE_TTL,
+                        GITHUB_CACHE_MAX_BYTES, GITHUB_FRESH_SECONDS, GITHUB_MAX_WORKERS,
+                        GITHUB_RATE_LIMIT_WAIT, GITHUB_README_MAX_CHARS, LOG_LEVEL, LOG_FORMAT)
+from src.utils.cache_utils import PersistentCache, make_cache_key
+from src.utils.http_utils import DEFAULT_TIMEOUT, get_http_session
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+GITHUB_API_URL = "https://api.github.com"
+_REPO_PATTERN = re.compile(r"^(?:https?://github\.com/)?([\w.-]+)/([\w.-]+?)(?:\.git)?/?$")
+_HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+
+
+class RateLimitError(Exception):
+    """GitHub API速率限制已用尽，且距离重置时间超过允许等待的时长"""
+
+    def __init__(self, reset_at):
+        self.reset_at = reset_at
+        super().__init__(f"GitHub API 速率限制已用尽，约 {max(int(reset_at - time.time()), 0)} 秒后恢复")
+
+
+def parse_repo(text):
+    """
+    解析仓库标识，支持 "owner/repo" 与 "https://github.com/owner/repo" 两种写法
+
+    参数:
+    - text: 仓库标识
+
+    返回:
+    - (owner, repo)，无法解析时返回None
+    """
+    match = _REPO_PATTERN.match(text.strip())
+    return (match.group(1), match.group(2)) if match else None
+
+
+class GitHubClient:
+    """
+    GitHub API客户端：
+    - 响应连同ETag保存在本地缓存中，再次请求时携带If-None-Match，未变化时服务端返回304且不消耗请求配额
+    - 根据X-RateLimit-*响应头记录剩余配额，配额用尽时在允许范围内等待至重置，否则直接使用缓存或报错
+    """
+
+    def __init__(self, token=GITHUB_TOKEN, session=None, cache=None, timeout=DEFAULT_TIMEOUT,
+                 fresh_seconds=GITHUB_FRESH_SECONDS, max_wait=GITHUB_RATE_LIMIT_WAIT,
+                 max_workers=GITHUB_MAX_WORKERS):
+        """
+        初始化客户端
+
+        Args:
+            token (str): GitHub访问令牌，为空时以匿名身份请求（配额较低）
+            session (requests.Session): HTTP会话，默认使用进程内共享的会话
+            cache (PersistentCache): 响应缓存，为None时不缓存
+            timeout (tuple): (连接超时, 读取超时)，单位秒
+            fresh_seconds (float): 缓存在该时长内直接使用，不向服务端确认
+            max_wait (float): 配额用尽时最多等待的秒数
+            max_workers (int): 批量获取时的最大并发数
+        """
+        self.token = token
+        self.session = session or get_http_session()
+        self.cache = cache
+        self.timeout = timeout
+        self.fresh_seconds = fresh_seconds
+        self.max_wait = max_wait
+        self.max_workers = max_workers
+        # 最近一次响应中的剩余配额及重置时间（Unix时间戳）
+        self.rate_remaining = None
+        self.rate_reset = None
+        self._lock = threading.Lock()
+        logger.info("GitHubClient 初始化完成")
+
+    def get_readme(self, owner, repo):
+        """
+        获取仓库README的原始文本
+
+        Args:
+            owner (str): 仓库所有者
+            repo (str): 仓库名称
+
+        Returns:
+            str: README内容
+
+        Raises:
+            RateLimitError: 速率限制已用尽且没有可用的缓存
+            requests.exceptions.RequestException: 请求失败
+        """
+        return self.get(f"/repos/{owner}/{repo}/readme", accept="application/vnd.github.raw")
+
+    def get(self, path, accept="application/vnd.github+json"):
+        """
+        发送带缓存的GET请求
+
+        Args:
+            path (str): API路径，如 /repos/{owner}/{repo}/readme
+            accept (str): Accept请求头
+
+        Returns:
+            str: 响应正文
+        """
+        key = make_cache_key("github", path.lower(), accept)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None and time.time() - cached["fetched_at"] < self.fresh_seconds:
+            return cached["body"]
+
+        try:
+            self._wait_for_quota()
+        except RateLimitError:
+            if cached is not None:
+                logger.warning(f"GitHub API 配额已用尽，使用缓存内容: {path}")
+                return cached["body"]
+            raise
+
+        headers = {"Accept": accept, "User-Agent": "Mozilla/5.0", "X-GitHub-Api-Version": "2022-11-28"}
+        if self.token:
+            headers["Authorization"] = f"token {self.token}"
+        if cached is not None and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+
+        response = self.session.get(f"{GITHUB_API_URL}{path}", headers=headers, timeout=self.timeout)
+        self._update_rate_limit(response)
+
+        if response.status_code == 304 and cached is not None:
+            logger.info(f"GitHub内容未变化，使用缓存: {path}")
+            cached["fetched_at"] = time.time()
+            self.cache.set(key, cached)
+            return cached["body"]
+        if response.status_code in (403, 429) and self.rate_remaining == 0:
+            if cached is not None:
+                return cached["body"]
+            raise RateLimitError(self.rate_reset or time.time())
+        response.raise_for_status()
+
+        body = response.text
+        if self.cache is not None:
+            self.cache.set(key, {"etag": response.headers.get("ETag"), "body": body, "fetched_at": time.time()})
+        return body
+
+    def map(self, func, items):
+        """
+        并发地对items逐个调用func，返回与items顺序一致的结果列表
+        """
+        items = list(items)
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items)),
+                                thread_name_prefix="github") as executor:
+            return list(executor.map(func, items))
+
+    def _wait_for_quota(self):
+        """
+        配额用尽时等待至重置；需要等待的时间超过max_wait时抛出RateLimitError
+        """
+        with self._lock:
+            remaining, reset_at = self.rate_remaining, self.rate_reset
+        if remaining is None or remaining > 0 or reset_at is None:
+            return
+        wait = reset_at - time.time()
+        if wait <= 0:
+            return
+        if wait > self.max_wait:
+            raise RateLimitError(reset_at)
+        logger.info(f"GitHub API 配额已用尽，等待 {wait:.0f} 秒后重试")
+        time.sleep(wait)
+
+    def _update_rate_limit(self, response):
+        """
+        根据响应头记录剩余配额与重置时间
+        """
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset_at = response.headers.get("X-RateLimit-Reset")
+        if remaining is None:
+            return
+        with self._lock:
+            self.rate_remaining = int(remaining)
+            self.rate_reset = float(reset_at) if reset_at else None
+        if self.rate_remaining < 10:
+            logger.warning(f"GitHub API 剩余配额: {self.rate_remaining}")
+
+
+def split_sections(markdown):
+    """
+    按Markdown标题将文档切分为章节（忽略代码块中的#行）
+
+    参数:
+    - markdown: Markdown文本
+
+    返回:
+    - [(标题, 标题级别, 章节全文)]，第一个标题之前的内容标题为空字符串、级别为0
+    """
+    sections = []
+    title, level, lines = "", 0, []
+    in_code = False
+    for line in markdown.splitlines():
+        if line.lstrip().startswith(("```", "~~~")):
+            in_code = not in_code
+        match = None if in_code else _HEADING_PATTERN.match(line)
+        if match:
+            if title or "".join(lines).strip():
+                sections.append((title, level, "\n".join(lines).strip()))
+            title, level, lines = match.group(2), len(match.group(1)), [line]
+        else:
+            lines.append(line)
+    if title or "".join(lines).strip():
+        sections.append((title, level, "\n".join(lines).strip()))
+    return sections
+
+
+def extract_sections(markdown, query=None, sections=None, max_chars=GITHUB_README_MAX_CHARS):
+    """
+    从README中挑选章节并控制总长度：
+    指定sections时只返回标题匹配的章节；否则保留开头的简介，并按与query的相关程度挑选其余章节
+
+    参数:
+    - markdown: README文本
+    - query: 关注的问题或关键词，用于挑选相关章节
+    - sections: 需要的章节标题列表（不区分大小写，包含即匹配）
+    - max_chars: 返回内容的最大字符数
+
+    返回:
+    - 截取后的文本，末尾附有全部章节标题及省略说明
+    """
+    if len(markdown) <= max_chars and not sections:
+        return markdown
+    parsed = split_sections(markdown)
+    if not parsed:
+        return markdown[:max_chars]
+
+    if sections:
+        wanted = [name.lower() for name in sections]
+        chosen = [index for index, (title, _, _) in enumerate(parsed)
+                  if any(name in title.lower() for name in wanted)]
+        if not chosen:
+            titles = "；".join(title for title, _, _ in parsed if title)
+            return f"未找到指定的章节，README包含以下章节: {titles}"
+    else:
+        terms = {term for term in re.split(r"\W+", (query or "").lower()) if len(term) > 1}
+
+        def relevance(index):
+            title, _, text = parsed[index]
+            lowered = text.lower()
+            return sum(3 * (term in title.lower()) + lowered.count(term) for term in terms)
+
+        # 简介总是保留，其余章节按相关程度排序（相同时保持原有顺序）
+        chosen = [0] + sorted(range(1, len(parsed)), key=lambda index: -relevance(index))
+
+    picked, used = set(), 0
+    for index in chosen:
+        text = parsed[index][2]
+        if used + len(text) > max_chars:
+            if not picked:
+                # 第一个章节就超出上限时截断后返回
+                picked.add(index)
+                used = max_chars
+            continue
+        picked.add(index)
+        used += len(text)
+
+    parts = []
+    for index in sorted(picked):
+        text = parsed[index][2]
+        parts.append(text if len(text) <= max_chars else text[:max_chars] + "\n...（章节过长，已截断）")
+    omitted = [title for index, (title, _, _) in enumerate(parsed) if index not in picked and title]
+    if omitted:
+        parts.append("（以下章节未展示，可通过 sections 参数指定查看: " + "；".join(omitted) + "）")
+    return "\n\n".join(parts)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_github_client():
+    """
+    获取进程内共享的GitHub客户端
+
+    Returns:
+        GitHubClient: GitHub客户端
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            cache = PersistentCache(GITHUB_CACHE_DIR, maxsize=GITHUB_CACHE_SIZE, ttl=GITHUB_CACHE_TTL,
+                                    max_bytes=GITHUB_CACHE_MAX_BYTES)
+            _client = GitHubClient(cache=cache)
+        return _client
+
+
+def read_github_readme(repos, query=None, sections=None):
+    """
+    读取一个或多个GitHub仓库的README，并只返回与问题相关的章节。
+
+    参数:
+    - repos: 仓库标识，如 "owner/repo"，多个仓库以逗号分隔
+    - query: 关注的问题或关键词，用于挑选相关章节
+    - sections: 需要查看的章节标题，多个标题以逗号分隔
+
+    返回:
+    - README内容（字符串形式）
+    """
+    print("正在调用read_github_readme工具读取GitHub仓库README...")
+
+    if isinstance(repos, str):
+        repos = [repo for repo in repos.split(",") if repo.strip()]
+    if isinstance(sections, str):
+        sections = [name.strip() for name in sections.split(",") if name.strip()]
+    if not repos:
+        return "请提供仓库标识，例如 owner/repo"
+
+    client = get_github_client()
+    # 多个仓库时平分字符上限
+    max_chars = max(GITHUB_README_MAX_CHARS // len(repos), 1000)
+
+    def fetch(text):
+        parsed = parse_repo(text)
+        if parsed is None:
+            return f"## {text}\n无法识别的仓库标识"
+        owner, repo = parsed
+        try:
+            readme = client.get_readme(owner, repo)
+        except RateLimitError as e:
+            return f"## {owner}/{repo}\n{e}"
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            return f"## {owner}/{repo}\n无法获取README (状态码: {status})"
+        except requests.exceptions.RequestException as e:
+            logger.error(f"获取 {owner}/{repo} 的README失败: {str(e)}")
+            return f"## {owner}/{repo}\n获取README时出错: {str(e)}"
+        return f"## {owner}/{repo}\n" + extract_sections(readme, query=query, sections=sections, max_chars=max_chars)
+
+    return "\n\n".join(client.map(fetch, repos))
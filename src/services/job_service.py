@@ -0,0 +1,329 @@
+"""
+异步任务服务模块，基于SQLite的任务队列，由后台工作线程执行耗时的分析任务
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+from src.config import JOB_DB_PATH, JOB_WORKERS, JOB_POLL_INTERVAL, JOB_STALE_SECONDS, LOG_LEVEL, LOG_FORMAT
+from src.utils.file_utils import ensure_dir
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    request TEXT NOT NULL,
+    webhook TEXT,
+    result TEXT,
+    error TEXT,
+    step_logs TEXT,
+    figures TEXT,
+    session_id TEXT,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+# JSON格式保存的字段
+_JSON_FIELDS = ('request', 'step_logs', 'figures')
+
+
+class JobStore:
+    """任务存储类，使用SQLite保存任务，多个进程可共享同一个数据库文件"""
+
+    def __init__(self, path=JOB_DB_PATH):
+        """
+        初始化任务存储，数据库文件不存在时自动创建
+
+        Args:
+            path (str): SQLite数据库文件路径
+        """
+        self.path = path
+        ensure_dir(os.path.dirname(path))
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+        logger.info(f"JobStore 初始化完成，数据库: {path}")
+
+    @contextmanager
+    def _connect(self):
+        # 每次操作使用独立连接，避免在线程间共享sqlite3连接
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            yield connection
+        finally:
+            connection.close()
+
+    def submit(self, request_body, webhook=None):
+        """
+        提交任务
+
+        Args:
+            request_body (dict): /analyze 请求体
+            webhook (str): 任务结束后接收结果的URL
+
+        Returns:
+            str: 任务ID
+        """
+        job_id = uuid.uuid4().hex
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, status, request, webhook, session_id, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(request_body, ensure_ascii=False), webhook,
+                 request_body.get('session_id'), time.time()),
+            )
+        return job_id
+
+    def claim(self, worker):
+        """
+        领取最早提交的排队任务并标记为运行中
+
+        Args:
+            worker (str): 工作线程标识
+
+        Returns:
+            dict: 任务，没有排队任务时返回None
+        """
+        with self._connect() as connection:
+            # BEGIN IMMEDIATE 获取写锁，保证多个进程不会领取同一个任务
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    connection.execute("COMMIT")
+                    return None
+                connection.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    (RUNNING, worker, time.time(), row['id']),
+                )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return self.get(row['id'])
+
+    def finish(self, job_id, status, result=None, error=None, step_logs=None, figures=None, session_id=None):
+        """
+        记录任务结束状态及结果
+
+        Args:
+            job_id (str): 任务ID
+            status (str): SUCCEEDED 或 FAILED
+            result (str): 智能体的最终回复
+            error (str): 错误信息
+            step_logs (list): 每一步的耗时与用量记录
+            figures (list): 生成的图片地址
+            session_id (str): 任务使用的会话ID
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, step_logs = ?, figures = ?, "
+                "session_id = COALESCE(?, session_id), finished_at = ? WHERE id = ?",
+                (status, result, error, json.dumps(step_logs or [], ensure_ascii=False, default=str),
+                 json.dumps(figures or [], ensure_ascii=False), session_id, time.time(), job_id),
+            )
+
+    def cancel(self, job_id):
+        """
+        取消仍在排队的任务
+
+        Returns:
+            bool: 是否取消成功
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED),
+            )
+            return cursor.rowcount > 0
+
+    def requeue_stale(self, stale_seconds=JOB_STALE_SECONDS):
+        """
+        将运行超过stale_seconds仍未结束的任务重新放回队列（其工作进程可能已退出）
+
+        Returns:
+            int: 重新排队的任务数
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND started_at < ?",
+                (QUEUED, RUNNING, time.time() - stale_seconds),
+            )
+            return cursor.rowcount
+
+    def get(self, job_id):
+        """
+        读取任务
+
+        Returns:
+            dict: 任务，不存在时返回None
+        """
+        with self._connect() as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for field in _JSON_FIELDS:
+            job[field] = json.loads(job[field]) if job[field] else None
+        return job
+
+    def stats(self):
+        """
+        返回各状态的任务数
+        """
+        with self._connect() as connection:
+            rows = connection.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status").fetchall()
+        return {row['status']: row['count'] for row in rows}
+
+
+class JobWorker:
+    """任务工作者，启动若干后台线程循环领取并执行任务"""
+
+    def __init__(self, store, handler, concurrency=JOB_WORKERS, poll_interval=JOB_POLL_INTERVAL):
+        """
+        初始化任务工作者
+
+        Args:
+            store (JobStore): 任务存储
+            handler (callable): 执行任务的函数，参数为任务字典，
+                返回 {"result", "step_logs", "figures", "session_id"} 字典
+            concurrency (int): 工作线程数
+            poll_interval (float): 没有任务时的轮询间隔（秒）
+        """
+        self.store = store
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = f"{socket.gethostname()}-{os.getpid()}"
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """
+        启动工作线程
+        """
+        requeued = self.store.requeue_stale()
+        if requeued:
+            logger.warning(f"已将 {requeued} 个长时间未结束的任务重新排队")
+        for index in range(self.concurrency):
+            thread = threading.Thread(target=self._loop, args=(f"{self.name}-{index}",),
+                                      name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"JobWorker 已启动 {self.concurrency} 个工作线程")
+
+    def stop(self):
+        """
+        通知工作线程在当前任务结束后退出
+        """
+        self._stopped.set()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _loop(self, worker):
+        while not self._stopped.is_set():
+            try:
+                job = self.store.claim(worker)
+            except Exception as e:
+                logger.error(f"领取任务失败: {str(e)}")
+                job = None
+            if job is None:
+                self._stopped.wait(self.poll_interval)
+                continue
+            self.run(job)
+
+    def run(self, job):
+        """
+        执行单个任务并记录结果，设置了webhook时推送结果
+        """
+        logger.info(f"开始执行任务 {job['id']}")
+        try:
+            outcome = self.handler(job)
+            self.store.finish(job['id'], SUCCEEDED, result=outcome.get('result'),
+                              step_logs=outcome.get('step_logs'), figures=outcome.get('figures'),
+                              session_id=outcome.get('session_id'))
+        except Exception as e:
+            logger.error(f"任务 {job['id']} 执行失败: {str(e)}")
+            self.store.finish(job['id'], FAILED, error=str(e))
+        logger.info(f"任务 {job['id']} 执行结束")
+        if job.get('webhook'):
+            notify_webhook(job['webhook'], self.store.get(job['id']))
+
+
+def notify_webhook(url, job):
+    """
+    将任务结果以JSON形式POST到webhook地址，失败时只记录日志
+
+    Args:
+        url (str): webhook地址
+        job (dict): 任务
+    """
+    from src.utils.http_utils import DEFAULT_TIMEOUT, get_http_session
+    try:
+        response = get_http_session().post(url, data=json.dumps(job_to_dict(job), ensure_ascii=False, default=str),
+                                           headers={'Content-Type': 'application/json'}, timeout=DEFAULT_TIMEOUT)
+        response.raise_for_status()
+    except Exception as e:
+        logger.error(f"推送任务 {job['id']} 的结果到webhook失败: {str(e)}")
+
+
+def job_to_dict(job):
+    """
+    将任务转换为接口返回的字典（不含原始请求与内部字段）
+    """
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'result': job['result'],
+        'error': job['error'],
+        'step_logs': job['step_logs'] or [],
+        'figures': job['figures'] or [],
+        'session_id': job['session_id'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+    }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """
+    获取进程内共享的任务存储
+
+    Returns:
+        JobStore: 任务存储
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = JobStore()
+        return _store
@@ -0,0 +1,382 @@
+"""
+Python内核池模块，在预热的独立工作进程中执行用户代码
+"""
+import os
+import sys
+import time
+import uuid
+import signal
+import logging
+import threading
+import multiprocessing
+
+from src.config import (KERNEL_POOL_SIZE, KERNEL_TIMEOUT, KERNEL_MAX_TASKS, KERNEL_MEMORY_MB,
+                        KERNEL_CPU_SECONDS, LOG_LEVEL, LOG_FORMAT)
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# 内核被回收或重启后，返回给模型的提示
+KERNEL_RESTARTED_NOTICE = "（注意：Python运行环境已重启，之前定义的变量均已清空）\n"
+
+# 工作进程因通信管道出错而退出时使用的退出码
+_IPC_ERROR_EXIT_CODE = 3
+
+
+def _apply_limits(memory_mb):
+    """
+    在工作进程中设置内存上限（仅在支持resource模块的平台生效）
+    """
+    try:
+        import resource
+    except ImportError:
+        return
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _set_cpu_limit(cpu_seconds):
+    """
+    将CPU时间软上限设置为当前已用时间加上cpu_seconds，超出后进程会收到SIGXCPU而退出
+    """
+    try:
+        import resource
+    except ImportError:
+        return
+    if cpu_seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _new_namespace():
+    """
+    创建会话的运行环境，预置常用模块以兼容原先直接使用服务模块全局变量的代码
+    """
+    import os
+    import matplotlib
+    import matplotlib.pyplot as plt
+    import numpy as np
+    import pandas as pd
+    import seaborn as sns
+    return {"__builtins__": __builtins__, "__name__": "__main__", "os": os, "matplotlib": matplotlib,
+            "plt": plt, "np": np, "pd": pd, "sns": sns}
+
+
+def _worker_main(conn, memory_mb, cpu_seconds):
+    """
+    工作进程入口：预先导入常用库，循环接收请求并在会话各自的运行环境中执行
+
+    请求为字典 {"op": 操作名, "session_id": 会话ID, ...}，响应为 {"ok": bool, "result": 结果}
+    """
+    # 预热：在接收任何请求之前导入重量级依赖（figure_service会固定使用无交互式后端）
+    import src.services.figure_service  # noqa: F401
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+    import seaborn  # noqa: F401
+    from src.services.python_service import run_python_code, run_figure_code, expand_stored_result
+    from src.utils.dataframe_utils import load_feather
+
+    # 父进程经gevent monkey patch后，管道的文件描述符可能是非阻塞的，工作进程需按阻塞方式读写
+    os.set_blocking(conn.fileno(), True)
+    _apply_limits(memory_mb)
+    namespaces = {}
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        except OSError as e:
+            print(f"内核工作进程读取请求失败: {type(e).__name__}: {e}", file=sys.stderr)
+            sys.exit(_IPC_ERROR_EXIT_CODE)
+        op = request.get("op")
+        session_id = request.get("session_id")
+        # 先清理已被释放的会话运行环境
+        for released in request.get("release", []):
+            namespaces.pop(released, None)
+        try:
+            namespace = namespaces.get(session_id)
+            if namespace is None:
+                namespace = namespaces[session_id] = _new_namespace()
+            _set_cpu_limit(cpu_seconds)
+            if op == "python":
+                result = run_python_code(request["py_code"], namespace)
+            elif op == "figure":
+                result = run_figure_code(request["py_code"], request["fname"], namespace,
+                                         request.get("image_format"), request.get("dpi"))
+            elif op == "expand":
+                result = expand_stored_result(request["handle"], request["offset"], request["limit"], namespace)
+            elif op == "load":
+                namespace[request["name"]] = load_feather(request["path"])
+                result = None
+            elif op == "set":
+                namespace[request["name"]] = request["value"]
+                result = None
+            else:
+                raise ValueError(f"未知的内核操作: {op}")
+            conn.send({"ok": True, "result": result})
+        except Exception as e:
+            conn.send({"ok": False, "result": f"{type(e).__name__}: {e}"})
+
+
+class Kernel:
+    """单个工作进程及其通信管道"""
+
+    def __init__(self, context, memory_mb, cpu_seconds):
+        """
+        启动工作进程
+
+        Args:
+            context: multiprocessing上下文
+            memory_mb (int): 内存上限（MB），0表示不限制
+            cpu_seconds (int): 单次执行的CPU时间上限（秒），0表示不限制
+        """
+        self.conn, child_conn = context.Pipe()
+        # gevent monkey patch后Pipe由非阻塞的socketpair实现，统一改为阻塞模式；
+        # 父进程只在poll确认有数据后才读取，不会长时间阻塞事件循环
+        os.set_blocking(self.conn.fileno(), True)
+        os.set_blocking(child_conn.fileno(), True)
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_mb, cpu_seconds),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.generation = uuid.uuid4().hex
+        self.exec_count = 0
+
+    def request(self, payload, timeout):
+        """
+        发送请求并等待结果，超时返回None
+
+        Raises:
+            EOFError: 工作进程已退出（如超出内存或CPU上限）
+            OSError: 与工作进程的通信管道出错
+        """
+        self.conn.send(payload)
+        if not self.conn.poll(timeout):
+            return None
+        return self.conn.recv()
+
+    def describe_failure(self, error):
+        """
+        根据工作进程的退出状态说明通信失败的原因
+
+        Args:
+            error (Exception): 发送或接收请求时的异常
+
+        Returns:
+            str: 失败原因
+        """
+        self.process.join(timeout=1)
+        exitcode = self.process.exitcode
+        if exitcode is None:
+            return f"与运行进程的通信管道出错（{type(error).__name__}: {error}）"
+        if exitcode == _IPC_ERROR_EXIT_CODE:
+            return "运行进程读取通信管道失败而退出"
+        if exitcode == -getattr(signal, 'SIGXCPU', 0):
+            return "运行进程超出了CPU时间上限而退出"
+        return f"运行进程异常退出（退出码 {exitcode}），可能超出了内存上限"
+
+    def stop(self):
+        """
+        终止工作进程
+        """
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+
+
+class KernelPool:
+    """内核池，按会话将代码分派到固定的工作进程执行，并负责超时终止与定期回收"""
+
+    def __init__(self, size=KERNEL_POOL_SIZE, timeout=KERNEL_TIMEOUT, max_tasks=KERNEL_MAX_TASKS,
+                 memory_mb=KERNEL_MEMORY_MB, cpu_seconds=KERNEL_CPU_SECONDS):
+        """
+        初始化内核池并启动全部工作进程
+
+        Args:
+            size (int): 工作进程数量
+            timeout (float): 单次执行的超时时间（秒），超时后终止并重启工作进程
+            max_tasks (int): 工作进程执行多少次后被回收重启，0表示不回收
+            memory_mb (int): 每个工作进程的内存上限（MB）
+            cpu_seconds (int): 单次执行的CPU时间上限（秒）
+        """
+        self.timeout = timeout
+        self.max_tasks = max_tasks
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        # 使用spawn启动，避免在多线程的服务进程中fork
+        self._context = multiprocessing.get_context('spawn')
+        self._kernels = [self._start_kernel() for _ in range(size)]
+        # 每个槽位一把锁，工作进程重启后仍沿用同一把锁，保证同一时间只有一个请求使用该进程
+        self._slot_locks = [threading.Lock() for _ in range(size)]
+        # 会话ID -> (内核下标, 内核代次)
+        self._assignments = {}
+        # 各工作进程中待清理的会话ID
+        self._pending_releases = [[] for _ in range(size)]
+        self._lock = threading.Lock()
+        logger.info(f"KernelPool 初始化完成，工作进程数: {size}")
+
+    def run_code(self, session_id, py_code):
+        """
+        在会话的运行环境中执行Python代码
+
+        Returns:
+            str: 执行结果
+        """
+        return self._execute(session_id, {"op": "python", "py_code": py_code})[1]
+
+    def run_figure(self, session_id, py_code, fname, image_format=None, dpi=None):
+        """
+        在会话的运行环境中执行绘图代码并保存图像
+
+        Returns:
+            str: 绘图结果信息
+        """
+        payload = {"op": "figure", "py_code": py_code, "fname": fname, "image_format": image_format, "dpi": dpi}
+        return self._execute(session_id, payload)[1]
+
+    def expand_result(self, session_id, handle, offset, limit):
+        """
+        分段查看会话运行环境中被截断的结果
+
+        Returns:
+            str: 分段内容
+        """
+        payload = {"op": "expand", "handle": handle, "offset": offset, "limit": limit}
+        return self._execute(session_id, payload)[1]
+
+    def load_dataframe(self, session_id, name, path):
+        """
+        在会话的运行环境中以内存映射方式读取Feather文件并保存为变量
+
+        Raises:
+            RuntimeError: 读取失败
+        """
+        ok, result = self._execute(session_id, {"op": "load", "name": name, "path": path})
+        if not ok:
+            raise RuntimeError(result)
+
+    def set_variable(self, session_id, name, value):
+        """
+        将变量写入会话的运行环境（value需可被pickle序列化）
+
+        Raises:
+            RuntimeError: 写入失败
+        """
+        ok, result = self._execute(session_id, {"op": "set", "name": name, "value": value})
+        if not ok:
+            raise RuntimeError(result)
+
+    def release(self, session_id):
+        """
+        释放会话的运行环境；为避免阻塞调用方，实际清理在该进程下一次执行请求时进行
+        """
+        with self._lock:
+            assignment = self._assignments.pop(session_id, None)
+            if assignment is not None:
+                index, generation = assignment
+                if self._kernels[index].generation == generation:
+                    self._pending_releases[index].append(session_id)
+
+    def shutdown(self):
+        """
+        终止全部工作进程
+        """
+        for kernel in self._kernels:
+            kernel.stop()
+
+    def _start_kernel(self):
+        return Kernel(self._context, self.memory_mb, self.cpu_seconds)
+
+    def _assign(self, session_id):
+        """
+        为会话选择工作进程：已分配的沿用，否则选择当前会话数最少的进程
+
+        Returns:
+            (内核下标, 会话上次使用时的内核代次)
+        """
+        with self._lock:
+            if session_id in self._assignments:
+                return self._assignments[session_id]
+            loads = [0] * len(self._kernels)
+            for index, _ in self._assignments.values():
+                loads[index] += 1
+            index = loads.index(min(loads))
+            self._assignments[session_id] = (index, self._kernels[index].generation)
+            return self._assignments[session_id]
+
+    def _execute(self, session_id, payload):
+        """
+        将请求发送到会话对应的工作进程并返回结果
+
+        Returns:
+            (是否成功, 结果信息)
+        """
+        session_id = session_id or "default"
+        payload["session_id"] = session_id
+        index, generation = self._assign(session_id)
+        with self._slot_locks[index]:
+            kernel = self._kernels[index]
+            notice = KERNEL_RESTARTED_NOTICE if kernel.generation != generation else ""
+            with self._lock:
+                self._assignments[session_id] = (index, kernel.generation)
+                payload["release"], self._pending_releases[index] = self._pending_releases[index], []
+
+            started = time.monotonic()
+            try:
+                response = kernel.request(payload, self.timeout)
+            except (EOFError, OSError) as e:
+                reason = kernel.describe_failure(e)
+                logger.error(f"Python内核 {index} 不可用：{reason}，正在重启")
+                self._restart(index)
+                return False, f"{notice}代码执行时报错：{reason}，运行环境已重启"
+
+            if response is None:
+                logger.warning(f"Python代码执行超时（{self.timeout} 秒），正在重启内核")
+                self._restart(index)
+                return False, f"{notice}代码执行超时（超过 {self.timeout} 秒），运行环境已重启"
+
+            kernel.exec_count += 1
+            logger.info(f"内核 {index} 执行完成，耗时 {time.monotonic() - started:.2f} 秒")
+            if self.max_tasks and kernel.exec_count >= self.max_tasks:
+                logger.info(f"内核 {index} 已执行 {kernel.exec_count} 次，进行回收")
+                self._restart(index)
+
+        if not response["ok"]:
+            return False, f"{notice}代码执行时报错{response['result']}"
+        return True, notice + (response["result"] or "")
+
+    def _restart(self, index):
+        """
+        终止并重新启动指定的工作进程，调用方需持有该槽位的锁
+        """
+        self._kernels[index].stop()
+        self._kernels[index] = self._start_kernel()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_kernel_pool():
+    """
+    获取进程内共享的内核池，首次调用时启动全部工作进程
+
+    Returns:
+        KernelPool: 内核池
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = KernelPool()
+        return _pool
@@ -1,37 +1,61 @@
 """
 Python服务模块，提供Python代码执行和绘图功能
 """
-import os
-import matplotlib
-import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
-from IPython.display import display, Image
 
+from src.config import KERNEL_POOL_ENABLED
+from src.services.figure_service import plt, save_figure, close_new_figures
+from src.utils.render_utils import ResultStore, render_result, expand
 
-def python_inter(py_code, g=None):
+# 运行环境中保存被截断结果的变量名
+RESULT_STORE_NAME = '__result_store__'
+
+
+def python_inter(py_code, g=None, session_id=None):
     """
     专门用于执行python代码，并获取最终查询或处理结果。
-    
+
     参数:
     - py_code: 字符串形式的Python代码
-    - g: 环境变量字典，默认为None，使用全局变量
-    
+    - g: 环境变量字典，默认为None，启用内核池时在会话独立的工作进程中执行，否则使用全局变量
+    - session_id: 会话ID，用于在内核池中定位该会话的运行环境
+
     返回:
     - 代码运行的最终结果（字符串形式）
-    """    
+    """
     print("正在调用python_inter工具运行Python代码...")
-    
-    if g is None:
+
+    if not isinstance(g, dict):
+        if KERNEL_POOL_ENABLED:
+            from src.services.kernel_pool import get_kernel_pool
+            return get_kernel_pool().run_code(session_id, py_code)
         g = globals()
-        
+
+    return run_python_code(py_code, g)
+
+
+def run_python_code(py_code, g):
+    """
+    在给定的运行环境中执行Python代码，表达式返回其值，语句返回新定义的变量
+
+    参数:
+    - py_code: 字符串形式的Python代码
+    - g: 环境变量字典
+
+    返回:
+    - 代码运行的最终结果（字符串形式）
+    """
+    store = g.get(RESULT_STORE_NAME)
+    if store is None:
+        store = g[RESULT_STORE_NAME] = ResultStore('py')
     try:
         # 尝试如果是表达式，则返回表达式运行结果
-        return str(eval(py_code, g))
+        return render_result(eval(py_code, g), store)
     # 若报错，则先测试是否是对相同变量重复赋值
     except Exception as e:
         global_vars_before = set(g.keys())
-        try:            
+        try:
             exec(py_code, g)
         except Exception as e:
             return f"代码执行时报错{e}"
@@ -41,40 +65,97 @@ def python_inter(py_code, g=None):
         if new_vars:
             result = {var: g[var] for var in new_vars}
             print("代码已顺利执行，正在进行结果梳理...")
-            return str(result)
+            return render_result(result, store)
         else:
             print("代码已顺利执行，正在进行结果梳理...")
             return "已经顺利执行代码"
 
 
-def fig_inter(py_code, fname, g=None):
+def expand_result(handle, offset=0, limit=50, session_id=None):
+    """
+    分段查看被截断的工具结果。
+
+    参数:
+    - handle: 截断提示中给出的结果句柄
+    - offset: 起始行（元素）序号
+    - limit: 展示的行（元素）数
+    - session_id: 会话ID，用于在内核池中定位该会话的运行环境
+
+    返回:
+    - 分段内容（字符串形式）
+    """
+    if handle.startswith('sql-'):
+        from src.services.db_service import expand_sql_result
+        return expand_sql_result(handle, offset, limit)
+    if KERNEL_POOL_ENABLED:
+        from src.services.kernel_pool import get_kernel_pool
+        return get_kernel_pool().expand_result(session_id, handle, offset, limit)
+    return expand_stored_result(handle, offset, limit, globals())
+
+
+def expand_stored_result(handle, offset, limit, g):
+    """
+    从运行环境的结果存储中读取句柄对应的对象并分段渲染
+
+    参数:
+    - handle: 结果句柄
+    - offset: 起始行（元素）序号
+    - limit: 展示的行（元素）数
+    - g: 环境变量字典
+
+    返回:
+    - 分段内容（字符串形式）
+    """
+    store = g.get(RESULT_STORE_NAME)
+    obj = store.get(handle) if store is not None else None
+    if obj is None:
+        return f"结果句柄 {handle} 不存在或已过期，请重新执行代码获取结果"
+    return expand(obj, offset, limit)
+
+
+def fig_inter(py_code, fname, image_format=None, dpi=None, g=None, session_id=None):
     """
     用于执行Python绘图代码并保存图像。
-    
+
     参数:
     - py_code: 字符串形式的Python绘图代码
     - fname: 图像对象的变量名（字符串形式）
-    - g: 环境变量字典，默认为None，使用全局变量
-    
+    - image_format: 图片格式，png、svg或webp，默认为png
+    - dpi: 图片分辨率
+    - g: 环境变量字典，默认为None，启用内核池时在会话独立的工作进程中执行，否则使用全局变量
+    - session_id: 会话ID，用于在内核池中定位该会话的运行环境
+
     返回:
     - 绘图结果信息（字符串形式）
     """
     print("正在调用fig_inter工具运行Python代码...")
-    
-    if g is None:
+
+    if not isinstance(g, dict):
+        if KERNEL_POOL_ENABLED:
+            from src.services.kernel_pool import get_kernel_pool
+            return get_kernel_pool().run_figure(session_id, py_code, fname, image_format, dpi)
         g = globals()
-    
-    # 切换为无交互式后端
-    current_backend = matplotlib.get_backend()
-    matplotlib.use('Agg')
 
+    return run_figure_code(py_code, fname, g, image_format, dpi)
+
+
+def run_figure_code(py_code, fname, g, image_format=None, dpi=None):
+    """
+    在给定的运行环境中执行绘图代码并保存图像，内核池工作进程也通过该函数绘图
+
+    参数:
+    - py_code: 字符串形式的Python绘图代码
+    - fname: 图像对象的变量名（字符串形式）
+    - g: 环境变量字典
+    - image_format: 图片格式，png、svg或webp
+    - dpi: 图片分辨率
+
+    返回:
+    - 绘图结果信息（字符串形式）
+    """
     # 用于执行代码的本地变量
     local_vars = {"plt": plt, "pd": pd, "sns": sns}
-
-    # 相对路径保存目录
-    pics_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'pics')
-    if not os.path.exists(pics_dir):
-        os.makedirs(pics_dir)
+    figures_before = plt.get_fignums()
 
     try:
         # 执行用户代码
@@ -84,15 +165,13 @@ def fig_inter(py_code, fname, g=None):
         # 获取图像对象
         fig = local_vars.get(fname, None)
         if fig:
-            rel_path = os.path.join(pics_dir, f"{fname}.png")
-            fig.savefig(rel_path, bbox_inches='tight')
-            display(Image(filename=rel_path))
+            figure = save_figure(fig, image_format, dpi)
             print("代码已顺利执行，正在进行结果梳理...")
-            return f"✅ 图片已保存，相对路径: {rel_path}"
+            return f"✅ 图片已保存，图片地址: {figure['url']}"
         else:
             return "⚠️ 代码执行成功，但未找到图像对象，请确保有 `fig = ...`。"
     except Exception as e:
         return f"❌ 执行失败：{e}"
     finally:
-        # 恢复原有绘图后端
-        matplotlib.use(current_backend) 
\ No newline at end of file
+        # 图像对象仍保留在运行环境中可继续使用，但不再由pyplot持有，避免图像在内存中堆积
+        close_new_figures(figures_before)
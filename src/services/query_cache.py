@@ -0,0 +1,191 @@
+"""
+SQL查询结果缓存模块，按规范化后的SQL文本缓存只读查询的结果
+"""
+import re
+import logging
+import threading
+
+from src.config import (DB_NAME, SQL_CACHE_SIZE, SQL_CACHE_TTL, SQL_CACHE_SCHEMA_TTL, SQL_CACHE_MAX_ROWS,
+                        LOG_LEVEL, LOG_FORMAT)
+from src.utils.cache_utils import TTLCache
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# 依次匹配：字符串/标识符字面量（保持原样）、注释（移除）、空白（合并）
+_TOKEN_PATTERN = re.compile(
+    r"('(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"|`[^`]*`)"
+    r"|(--[^\n]*|#[^\n]*|/\*.*?\*/)"
+    r"|(\s+)",
+    re.S,
+)
+
+# 可以缓存的只读语句
+_READ_KEYWORDS = {"SELECT", "SHOW", "DESCRIBE", "DESC", "EXPLAIN", "WITH"}
+# 查询表结构等元数据的语句，使用更长的过期时间
+_SCHEMA_KEYWORDS = {"SHOW", "DESCRIBE", "DESC"}
+# 每次执行结果可能不同或带有副作用的写法，不缓存
+_UNCACHEABLE_PATTERN = re.compile(
+    r"\b(NOW|SYSDATE|CURDATE|CURTIME|CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|UTC_DATE|UTC_TIME|"
+    r"UTC_TIMESTAMP|UNIX_TIMESTAMP|RAND|UUID|UUID_SHORT|CONNECTION_ID|LAST_INSERT_ID|FOUND_ROWS|ROW_COUNT|"
+    r"SLEEP|GET_LOCK|RELEASE_LOCK|NEXTVAL)\b"
+    r"|\bFOR\s+(UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b|\bINTO\b"
+    r"|\b(INSERT|UPDATE|DELETE|REPLACE)\b",
+    re.I,
+)
+# 会修改数据或表结构、需要使缓存失效的语句
+_WRITE_KEYWORDS = {"INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "ALTER", "DROP", "TRUNCATE", "RENAME",
+                   "LOAD", "CALL", "IMPORT", "GRANT", "REVOKE"}
+
+
+def normalize_sql(sql):
+    """
+    规范化SQL文本：移除注释、合并空白、去掉结尾分号，字符串与反引号标识符保持原样
+
+    参数:
+    - sql: SQL语句
+
+    返回:
+    - 规范化后的SQL文本
+    """
+    def replace(match):
+        if match.group(1):
+            return match.group(1)
+        return " "
+
+    return _TOKEN_PATTERN.sub(replace, sql).strip().rstrip(";").strip()
+
+
+def _strip_literals(sql):
+    """
+    去掉字符串字面量，避免其中的文字被误判为关键字
+    """
+    return _TOKEN_PATTERN.sub(lambda m: "''" if m.group(1) and m.group(1)[0] != "`" else " ", sql)
+
+
+def statement_type(sql):
+    """
+    返回规范化SQL的首个关键字（大写）
+    """
+    match = re.match(r"\(*\s*([A-Za-z]+)", sql)
+    return match.group(1).upper() if match else ""
+
+
+class QueryCache:
+    """
+    只读查询结果缓存，按 (数据库, 规范化SQL) 作为键，LRU淘汰并为每个条目设置过期时间；
+    执行写入或DDL语句时清空对应数据库的缓存
+    """
+
+    def __init__(self, maxsize=SQL_CACHE_SIZE, ttl=SQL_CACHE_TTL, schema_ttl=SQL_CACHE_SCHEMA_TTL,
+                 max_rows=SQL_CACHE_MAX_ROWS):
+        """
+        初始化查询缓存
+
+        Args:
+            maxsize (int): 最多缓存的查询数
+            ttl (float): 普通查询结果的过期时间（秒）
+            schema_ttl (float): SHOW/DESCRIBE等元数据查询结果的过期时间（秒）
+            max_rows (int): 结果行数超过该值时不缓存
+        """
+        self.ttl = ttl
+        self.schema_ttl = schema_ttl
+        self.max_rows = max_rows
+        self.invalidations = 0
+        self._cache = TTLCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        logger.info(f"QueryCache 初始化完成，最大条目数: {maxsize}")
+
+    def key(self, sql, database=DB_NAME):
+        """
+        计算查询的缓存键，不可缓存的语句返回None
+
+        Args:
+            sql (str): SQL语句
+            database (str): 执行语句的数据库
+
+        Returns:
+            tuple: 缓存键 (数据库, 规范化SQL)，或None
+        """
+        normalized = normalize_sql(sql)
+        if statement_type(normalized) not in _READ_KEYWORDS:
+            return None
+        if _UNCACHEABLE_PATTERN.search(_strip_literals(normalized)):
+            return None
+        return database, normalized
+
+    def get(self, key):
+        """
+        读取缓存的查询结果，未命中时返回None
+        """
+        return self._cache.get(key)
+
+    def set(self, key, results):
+        """
+        缓存查询结果，元数据查询使用更长的过期时间
+        """
+        if self.max_rows and len(results) > self.max_rows:
+            return
+        ttl = self.schema_ttl if self._is_schema_query(key[1]) else self.ttl
+        self._cache.set(key, results, ttl=ttl)
+
+    def is_write(self, sql):
+        """
+        判断语句是否会修改数据或表结构
+
+        Args:
+            sql (str): SQL语句
+
+        Returns:
+            bool: 是否为写入语句
+        """
+        normalized = normalize_sql(sql)
+        kind = statement_type(normalized)
+        if kind == "WITH":
+            # MySQL 8 允许 WITH ... UPDATE/DELETE
+            return re.search(r"\b(UPDATE|DELETE)\b", _strip_literals(normalized), re.I) is not None
+        return kind in _WRITE_KEYWORDS
+
+    def invalidate(self, database=DB_NAME):
+        """
+        清空指定数据库的全部缓存条目
+        """
+        removed = 0
+        for key in self._cache.keys():
+            if key[0] == database and self._cache.pop(key) is not None:
+                removed += 1
+        with self._lock:
+            self.invalidations += 1
+        logger.info(f"数据库 {database} 执行了写入语句，已清除 {removed} 条查询缓存")
+
+    def stats(self):
+        """
+        返回缓存的命中统计信息
+        """
+        stats = self._cache.stats()
+        stats["invalidations"] = self.invalidations
+        return stats
+
+    @staticmethod
+    def _is_schema_query(sql):
+        return (statement_type(sql) in _SCHEMA_KEYWORDS
+                or re.search(r"\binformation_schema\b", sql, re.I) is not None)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache():
+    """
+    获取进程内共享的查询结果缓存
+
+    Returns:
+        QueryCache: 查询缓存
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = QueryCache()
+        return _cache
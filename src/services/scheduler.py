@@ -0,0 +1,180 @@
+"""
+请求调度模块，限制同时运行的智能体任务数，超出时排队等待或拒绝
+"""
+import math
+import time
+import logging
+import threading
+from collections import deque
+
+from src.config import ANALYZE_MAX_CONCURRENCY, ANALYZE_MAX_QUEUE, ANALYZE_QUEUE_TIMEOUT, LOG_LEVEL, LOG_FORMAT
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# 计算等待时间分位数时保留的最近样本数
+_SAMPLE_SIZE = 1000
+
+
+class AdmissionRejected(Exception):
+    """请求未被接纳：排队已满（429）或排队超时（503）"""
+
+    def __init__(self, status, message, retry_after):
+        """
+        Args:
+            status (int): 建议返回的HTTP状态码
+            message (str): 错误信息
+            retry_after (int): 建议客户端重试前等待的秒数
+        """
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class Scheduler:
+    """
+    并发受限的先来先服务调度器：运行中的任务达到上限时，新请求进入有界队列等待，
+    队列已满时立即拒绝，等待超过各自的期限时放弃排队
+
+    使用threading同步原语实现；在gevent monkey patch之后等待不会阻塞事件循环。
+    """
+
+    def __init__(self, max_concurrent=ANALYZE_MAX_CONCURRENCY, max_queue=ANALYZE_MAX_QUEUE,
+                 queue_timeout=ANALYZE_QUEUE_TIMEOUT):
+        """
+        初始化调度器
+
+        Args:
+            max_concurrent (int): 同时运行的任务数上限
+            max_queue (int): 排队等待的请求数上限
+            queue_timeout (float): 默认的最长排队时间（秒）
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+        self._cond = threading.Condition()
+        # 统计信息
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_queue_depth = 0
+        self._wait_samples = deque(maxlen=_SAMPLE_SIZE)
+        self._run_samples = deque(maxlen=_SAMPLE_SIZE)
+        logger.info(f"Scheduler 初始化完成，并发上限: {max_concurrent}，队列上限: {max_queue}")
+
+    def admit(self, timeout=None):
+        """
+        申请一个运行名额，必要时排队等待
+
+        Args:
+            timeout (float): 最长排队时间（秒），默认使用queue_timeout，且不会超过queue_timeout
+
+        Returns:
+            callable: 释放名额的函数，可重复调用
+
+        Raises:
+            AdmissionRejected: 队列已满或排队超时
+        """
+        timeout = self.queue_timeout if timeout is None else min(max(timeout, 0), self.queue_timeout)
+        enqueued_at = time.monotonic()
+        with self._cond:
+            if self.active >= self.max_concurrent or self._waiters:
+                if len(self._waiters) >= self.max_queue:
+                    self.rejected += 1
+                    logger.warning(f"请求队列已满（{len(self._waiters)}），拒绝新请求")
+                    raise AdmissionRejected(429, "服务繁忙，请稍后重试", self._retry_after(len(self._waiters)))
+                waiter = object()
+                self._waiters.append(waiter)
+                self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+                try:
+                    while self._waiters[0] is not waiter or self.active >= self.max_concurrent:
+                        remaining = enqueued_at + timeout - time.monotonic()
+                        if remaining <= 0:
+                            self.timed_out += 1
+                            position = self._waiters.index(waiter)
+                            logger.warning(f"请求排队超过 {timeout} 秒，放弃等待")
+                            raise AdmissionRejected(503, f"排队等待超过 {timeout:g} 秒，请稍后重试",
+                                                    self._retry_after(position))
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiters.remove(waiter)
+                    # 队首变化，唤醒其余等待者重新检查
+                    self._cond.notify_all()
+            self.active += 1
+            self.admitted += 1
+            waited = time.monotonic() - enqueued_at
+            self._wait_samples.append(waited)
+
+        started = time.monotonic()
+        released = False
+
+        def release():
+            nonlocal released
+            with self._cond:
+                if released:
+                    return
+                released = True
+                self.active -= 1
+                self._run_samples.append(time.monotonic() - started)
+                self._cond.notify_all()
+
+        return release
+
+    def stats(self):
+        """
+        返回调度器的运行状态与统计信息
+
+        Returns:
+            dict: 运行中任务数、队列深度、接纳/拒绝/超时次数及排队、运行耗时统计
+        """
+        with self._cond:
+            waits = sorted(self._wait_samples)
+            runs = list(self._run_samples)
+            return {
+                "active": self.active,
+                "max_concurrent": self.max_concurrent,
+                "queue_depth": len(self._waiters),
+                "max_queue": self.max_queue,
+                "max_queue_depth": self.max_queue_depth,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "wait_seconds_avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "wait_seconds_p50": round(_percentile(waits, 0.5), 3),
+                "wait_seconds_p95": round(_percentile(waits, 0.95), 3),
+                "run_seconds_avg": round(sum(runs) / len(runs), 3) if runs else 0.0,
+            }
+
+    def _retry_after(self, position):
+        """
+        按最近的平均运行耗时估计排在position之后的请求需要等待的秒数，调用方需持有锁
+        """
+        average = sum(self._run_samples) / len(self._run_samples) if self._run_samples else 10.0
+        return max(1, math.ceil(average * (position + 1) / self.max_concurrent))
+
+
+def _percentile(sorted_values, ratio):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * ratio), len(sorted_values) - 1)]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    获取进程内共享的调度器
+
+    Returns:
+        Scheduler: 调度器
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
@@ -0,0 +1,350 @@
+"""
+数据库结构索引模块，从information_schema读取表、列、键及行数估计，供提示词摘要和查询工具使用
+"""
+import re
+import time
+import logging
+import threading
+
+import pymysql
+
+from src.config import DB_NAME, SCHEMA_REFRESH_INTERVAL, SCHEMA_PROMPT_MAX_TOKENS, LOG_LEVEL, LOG_FORMAT
+from src.services.db_pool import get_db_pool
+from src.services.query_cache import normalize_sql, statement_type
+from src.utils.render_utils import render_result
+from src.utils.token_utils import count_tokens
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# 会改变表结构的语句
+_DDL_KEYWORDS = {"CREATE", "ALTER", "DROP", "TRUNCATE", "RENAME"}
+# 从DDL语句中解析表名，如 ALTER TABLE `db`.`orders` ...
+_DDL_TABLE_PATTERN = re.compile(
+    r"^\s*(?:CREATE|ALTER|DROP|TRUNCATE|RENAME)\s+(?:TEMPORARY\s+)?TABLE\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?"
+    r"(?:`?\w+`?\.)?`?(\w+)`?",
+    re.I,
+)
+
+_TABLES_SQL = (
+    "SELECT TABLE_NAME, TABLE_TYPE, TABLE_ROWS, TABLE_COMMENT, CREATE_TIME "
+    "FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s"
+)
+_COLUMNS_SQL = (
+    "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, COLUMN_KEY, IS_NULLABLE, COLUMN_COMMENT "
+    "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s AND TABLE_NAME IN ({}) "
+    "ORDER BY TABLE_NAME, ORDINAL_POSITION"
+)
+_FOREIGN_KEYS_SQL = (
+    "SELECT TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME "
+    "FROM information_schema.KEY_COLUMN_USAGE "
+    "WHERE TABLE_SCHEMA = %s AND TABLE_NAME IN ({}) AND REFERENCED_TABLE_NAME IS NOT NULL"
+)
+
+
+def detect_ddl(sql):
+    """
+    判断语句是否为DDL，并尽量解析出被修改的表名
+
+    参数:
+    - sql: SQL语句
+
+    返回:
+    - (是否为DDL, 表名)，无法解析表名时表名为None
+    """
+    normalized = normalize_sql(sql)
+    if statement_type(normalized) not in _DDL_KEYWORDS:
+        return False, None
+    match = _DDL_TABLE_PATTERN.match(normalized)
+    return True, match.group(1) if match else None
+
+
+class SchemaIndex:
+    """
+    数据库结构索引，首次使用时全量构建，之后按时间间隔增量刷新：
+    每次刷新都会更新表清单与行数估计，只对新增、重建或被DDL修改过的表重新读取列信息
+    """
+
+    def __init__(self, database=DB_NAME, refresh_interval=SCHEMA_REFRESH_INTERVAL, pool=None):
+        """
+        初始化结构索引（不会立即访问数据库）
+
+        Args:
+            database (str): 数据库名
+            refresh_interval (float): 自动刷新的时间间隔（秒），0表示只在检测到DDL时刷新
+            pool: 数据库连接池，默认使用进程内共享的连接池
+        """
+        self.database = database
+        self.refresh_interval = refresh_interval
+        self.pool = pool
+        # 表名 -> 表信息字典
+        self.tables = {}
+        self.refreshed_at = None
+        # 需要重新读取列信息的表；None表示全部
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def mark_stale(self, table=None):
+        """
+        标记索引需要刷新，下次使用时重新读取
+
+        Args:
+            table (str): 被修改的表名，为None时全部重新读取
+        """
+        with self._lock:
+            if table is None or self._dirty is None:
+                self._dirty = None
+            else:
+                self._dirty.add(table)
+        logger.info(f"数据库结构已变更，索引将在下次使用时刷新（表: {table or '全部'}）")
+
+    def ensure_fresh(self):
+        """
+        在索引未构建、已过期或被标记变更时刷新索引
+        """
+        with self._lock:
+            expired = (self.refreshed_at is None
+                       or (self.refresh_interval and time.monotonic() - self.refreshed_at > self.refresh_interval))
+            if expired or self._dirty is None or self._dirty:
+                self._refresh()
+
+    def refresh(self):
+        """
+        立即刷新索引
+        """
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        """
+        增量刷新索引，调用方需持有锁
+        """
+        started = time.monotonic()
+        pool = self.pool or get_db_pool()
+        with pool.connection(cursorclass=pymysql.cursors.DictCursor) as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(_TABLES_SQL, (self.database,))
+                rows = cursor.fetchall()
+                current = {row["TABLE_NAME"]: row for row in rows}
+
+                changed = []
+                for name, row in current.items():
+                    table = self.tables.get(name)
+                    if (table is None or self._dirty is None or name in self._dirty
+                            or table["create_time"] != row["CREATE_TIME"]):
+                        changed.append(name)
+
+                columns, foreign_keys = {}, {}
+                if changed:
+                    placeholders = ", ".join(["%s"] * len(changed))
+                    cursor.execute(_COLUMNS_SQL.format(placeholders), (self.database, *changed))
+                    for row in cursor.fetchall():
+                        columns.setdefault(row["TABLE_NAME"], []).append({
+                            "name": row["COLUMN_NAME"],
+                            "type": row["COLUMN_TYPE"],
+                            "key": row["COLUMN_KEY"],
+                            "nullable": row["IS_NULLABLE"] == "YES",
+                            "comment": row["COLUMN_COMMENT"],
+                        })
+                    cursor.execute(_FOREIGN_KEYS_SQL.format(placeholders), (self.database, *changed))
+                    for row in cursor.fetchall():
+                        foreign_keys.setdefault(row["TABLE_NAME"], {})[row["COLUMN_NAME"]] = (
+                            f"{row['REFERENCED_TABLE_NAME']}.{row['REFERENCED_COLUMN_NAME']}")
+
+        tables = {}
+        for name, row in current.items():
+            if name in changed:
+                table = {"name": name, "columns": columns.get(name, []), "foreign_keys": foreign_keys.get(name, {})}
+            else:
+                table = self.tables[name]
+            table.update({
+                "view": row["TABLE_TYPE"] == "VIEW",
+                "rows": row["TABLE_ROWS"],
+                "comment": row["TABLE_COMMENT"],
+                "create_time": row["CREATE_TIME"],
+            })
+            tables[name] = table
+        self.tables = tables
+        self.refreshed_at = time.monotonic()
+        self._dirty = set()
+        logger.info(f"数据库结构索引已刷新，共 {len(tables)} 张表，重新读取 {len(changed)} 张，"
+                    f"耗时 {time.monotonic() - started:.2f} 秒")
+
+    def describe(self, table_names):
+        """
+        返回指定表的完整结构描述
+
+        Args:
+            table_names (list): 表名列表
+
+        Returns:
+            str: 结构描述文本
+        """
+        self.ensure_fresh()
+        lines = []
+        for name in table_names:
+            table = self._find(name)
+            if table is None:
+                lines.append(f"表 {name} 不存在")
+                continue
+            lines.append(self._format_table(table))
+        return "\n".join(lines)
+
+    def search(self, keyword):
+        """
+        按关键字在表名、列名及注释中查找表
+
+        Args:
+            keyword (str): 关键字（不区分大小写）
+
+        Returns:
+            list: 匹配的表名列表
+        """
+        self.ensure_fresh()
+        keyword = keyword.lower()
+        return [name for name, table in sorted(self.tables.items()) if keyword in self._search_text(table)]
+
+    def summary(self, question="", max_tokens=SCHEMA_PROMPT_MAX_TOKENS):
+        """
+        生成用于提示词的结构摘要：按与问题的相关程度排序，在token上限内尽量给出完整的表结构，
+        其余的表只列出表名
+
+        Args:
+            question (str): 用户问题，用于判断表的相关程度
+            max_tokens (int): 摘要的token上限
+
+        Returns:
+            str: 结构摘要，数据库中没有表时返回空字符串
+        """
+        self.ensure_fresh()
+        if not self.tables:
+            return ""
+        question = (question or "").lower()
+        ranked = sorted(self.tables.values(), key=lambda table: (-self._relevance(table, question), table["name"]))
+
+        lines, used = [], 0
+        remaining = []
+        for table in ranked:
+            line = self._format_table(table)
+            tokens = count_tokens(line)
+            if not remaining and used + tokens <= max_tokens:
+                lines.append(line)
+                used += tokens
+            else:
+                remaining.append(table["name"])
+        if remaining:
+            lines.append("其余表（可调用 lookup_schema 查看结构）: " + ", ".join(remaining))
+        return "\n".join(lines)
+
+    def _find(self, name):
+        name = name.strip().strip("`")
+        if "." in name:
+            name = name.split(".", 1)[1].strip("`")
+        table = self.tables.get(name)
+        if table is None:
+            # MySQL在部分平台上表名不区分大小写
+            lowered = {key.lower(): value for key, value in self.tables.items()}
+            table = lowered.get(name.lower())
+        return table
+
+    @staticmethod
+    def _format_table(table):
+        """
+        将表信息格式化为一行紧凑的文本，如：
+        表 orders（约1200行，订单）: id bigint PK, user_id int FK->users.id, amount decimal(10,2)
+        """
+        meta = []
+        if table["view"]:
+            meta.append("视图")
+        if table["rows"] is not None and not table["view"]:
+            meta.append(f"约{table['rows']}行")
+        if table["comment"]:
+            meta.append(table["comment"])
+        columns = []
+        for column in table["columns"]:
+            text = f"{column['name']} {column['type']}"
+            if column["key"] == "PRI":
+                text += " PK"
+            elif column["key"] == "UNI":
+                text += " UNIQUE"
+            if column["name"] in table["foreign_keys"]:
+                text += f" FK->{table['foreign_keys'][column['name']]}"
+            if column["comment"]:
+                text += f"（{column['comment']}）"
+            columns.append(text)
+        header = f"表 {table['name']}" + (f"（{'，'.join(meta)}）" if meta else "")
+        return f"{header}: {', '.join(columns)}"
+
+    @staticmethod
+    def _search_text(table):
+        parts = [table["name"], table["comment"] or ""]
+        for column in table["columns"]:
+            parts.extend([column["name"], column["comment"] or ""])
+        return " ".join(parts).lower()
+
+    @staticmethod
+    def _relevance(table, question):
+        """
+        估计表与问题的相关程度：表名及列名的各个单词、注释中的中文词组在问题中出现的次数
+        """
+        if not question:
+            return 0
+        score = 0
+        terms = set(re.split(r"[_\W]+", table["name"].lower()))
+        for column in table["columns"]:
+            terms.update(re.split(r"[_\W]+", column["name"].lower()))
+        score += 3 * sum(1 for term in terms if len(term) > 2 and term in question)
+        comments = [table["comment"] or ""] + [column["comment"] or "" for column in table["columns"]]
+        for comment in comments:
+            # 中文注释按相邻两字切分后匹配
+            for word in re.findall(r"[\u4e00-\u9fff]+", comment):
+                score += sum(1 for i in range(len(word) - 1) if word[i:i + 2] in question)
+        return score
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_schema_index():
+    """
+    获取进程内共享的数据库结构索引
+
+    Returns:
+        SchemaIndex: 结构索引
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SchemaIndex()
+        return _index
+
+
+def lookup_schema(table_names=None, keyword=None):
+    """
+    查看MySQL数据库的表结构，无需逐条执行SHOW TABLES、DESCRIBE语句。
+
+    参数:
+    - table_names: 需要查看完整结构的表名，多个表名以逗号分隔
+    - keyword: 在表名、列名及注释中查找的关键字
+
+    返回:
+    - 表结构信息（字符串形式）
+    """
+    print("正在调用lookup_schema工具查看数据库结构...")
+
+    index = get_schema_index()
+    try:
+        if table_names:
+            if isinstance(table_names, str):
+                table_names = [name for name in table_names.split(",") if name.strip()]
+            return render_result(index.describe(table_names))
+        if keyword:
+            matched = index.search(keyword)
+            if not matched:
+                return f"没有找到与 {keyword} 相关的表"
+            return render_result(index.describe(matched))
+        return render_result(index.summary())
+    except Exception as e:
+        return f"读取数据库结构时报错{e}"
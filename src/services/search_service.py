@@ -3,28 +3,55 @@
 """
 import os
 import json
-import base64
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import jsonpath
-from src.config import SEARCH_API_KEY, GITHUB_TOKEN, LOG_LEVEL, LOG_FORMAT
+from src.config import (SEARCH_API_KEY, SEARCH_MAX_WORKERS, SEARCH_CACHE_ENABLED, SEARCH_CACHE_DIR,
+                        SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_BYTES,
+                        LOG_LEVEL, LOG_FORMAT)
+from src.services.github_service import get_github_client
+from src.utils.cache_utils import PersistentCache, make_cache_key
+from src.utils.http_utils import DEFAULT_TIMEOUT, get_http_session
 
 # 配置日志
 logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
+def normalize_query(query):
+    """
+    规范化搜索查询词：合并空白并统一大小写，使仅格式不同的重复查询命中同一缓存
+    
+    参数:
+    - query: 搜索查询词
+    
+    返回:
+    - 规范化后的查询词
+    """
+    return " ".join(query.split()).casefold()
+
+
 class WebSearcher:
     """搜索工具类，用于从网络获取信息"""
     
-    def __init__(self, api_key):
+    def __init__(self, api_key, session=None, timeout=DEFAULT_TIMEOUT, max_workers=SEARCH_MAX_WORKERS, cache=None):
         """
         初始化搜索工具
         
         Args:
             api_key (str): 搜索API密钥
+            session (requests.Session): HTTP会话，默认使用进程内共享的带连接池与重试的会话
+            timeout (tuple): (连接超时, 读取超时)，单位秒
+            max_workers (int): 批量搜索时的最大并发数
+            cache (PersistentCache): 搜索结果缓存，为None时不缓存
         """
         self.api_key = api_key
         self.search_url = "https://api.bochaai.com/v1/web-search"
+        self.session = session or get_http_session()
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.cache = cache
         logger.info("WebSearcher 初始化完成")
     
     def search(self, query):
@@ -37,14 +64,21 @@ class WebSearcher:
         Returns:
             str: 搜索结果摘要
         """
-        logger.info(f"执行网络搜索: {query}")
-        
-        payload = json.dumps({
-            "query": query,
+        params = {
             "summary": True,
             "count": 10,
             "page": 1
-        })
+        }
+        cache_key = make_cache_key(self.search_url, normalize_query(query), params)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"网络搜索命中缓存: {query}")
+                return cached
+        
+        logger.info(f"执行网络搜索: {query}")
+        
+        payload = json.dumps({"query": query, **params})
 
         headers = {
             'Authorization': f'Bearer {self.api_key}',
@@ -52,7 +86,7 @@ class WebSearcher:
         }
         
         try:
-            response = requests.request("POST", self.search_url, headers=headers, data=payload)
+            response = self.session.post(self.search_url, headers=headers, data=payload, timeout=self.timeout)
             response.raise_for_status()  # 检查请求是否成功
             
             search_result_str = ""
@@ -63,6 +97,9 @@ class WebSearcher:
                     search_result_str += i
                 
                 logger.info(f"搜索成功，获取到 {len(results)} 条结果")
+                # 只缓存有效结果
+                if self.cache is not None:
+                    self.cache.set(cache_key, search_result_str)
             else:
                 logger.warning("搜索未返回结果")
                 search_result_str = "未找到相关信息"
@@ -76,6 +113,50 @@ class WebSearcher:
             logger.error(f"搜索处理错误: {str(e)}")
             return f"处理搜索结果时发生错误: {str(e)}"
 
+    def search_batch(self, queries):
+        """
+        并发执行多个搜索
+        
+        Args:
+            queries (list): 搜索查询词列表
+        
+        Returns:
+            list: 与queries顺序一致的搜索结果摘要列表
+        """
+        if not queries:
+            return []
+        if len(queries) == 1:
+            return [self.search(queries[0])]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(queries)),
+                                thread_name_prefix="search") as executor:
+            return list(executor.map(self.search, queries))
+
+
+_searcher = None
+_searcher_lock = threading.Lock()
+
+
+def get_web_searcher():
+    """
+    获取进程内共享的搜索工具实例
+    
+    Returns:
+        WebSearcher: 搜索工具
+    """
+    global _searcher
+    with _searcher_lock:
+        if _searcher is None:
+            cache = None
+            if SEARCH_CACHE_ENABLED:
+                cache = PersistentCache(SEARCH_CACHE_DIR, maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL,
+                                        max_bytes=SEARCH_CACHE_MAX_BYTES)
+            _searcher = WebSearcher(SEARCH_API_KEY, cache=cache)
+        return _searcher
+
+
+def _is_search_error(result):
+    return not result or result.startswith("搜索时发生错误") or result.startswith("处理搜索结果时发生错误")
+
 
 def get_search_result(q):
     """
@@ -88,13 +169,10 @@ def get_search_result(q):
     - 搜索结果内容（字符串）
     """
     try:
-        # 创建搜索器实例
-        searcher = WebSearcher(SEARCH_API_KEY)
-        
         # 执行搜索
-        result = searcher.search(q)
+        result = get_web_searcher().search(q)
         
-        if not result or result.startswith("搜索时发生错误") or result.startswith("处理搜索结果时发生错误"):
+        if _is_search_error(result):
             logger.warning(f"搜索失败: {result}")
             return "搜索未能返回有效结果。"
             
@@ -105,6 +183,20 @@ def get_search_result(q):
         return f"搜索过程中发生错误: {str(e)}"
 
 
+def get_search_results(queries):
+    """
+    并发获取多个搜索问题的结果
+    
+    参数:
+    - queries: 搜索查询字符串列表
+    
+    返回:
+    - 与queries顺序一致的搜索结果内容列表
+    """
+    results = get_web_searcher().search_batch(list(queries))
+    return ["搜索未能返回有效结果。" if _is_search_error(result) else result for result in results]
+
+
 def get_github_readme(dic):
     """
     获取GitHub仓库的README内容
@@ -123,27 +215,19 @@ def get_github_readme(dic):
             logger.warning("缺少仓库所有者或仓库名称")
             return "缺少仓库所有者或仓库名称"
 
-        headers = {
-            "Authorization": f"token {GITHUB_TOKEN}",
-            "User-Agent": "Mozilla/5.0"
-        }
-
-        response = requests.get(f"https://api.github.com/repos/{owner}/{repo}/readme", headers=headers)
-
-        if response.status_code != 200:
-            logger.warning(f"获取README失败，状态码: {response.status_code}")
-            return f"无法获取README (状态码: {response.status_code})"
-
-        readme_data = response.json()
-        encoded_content = readme_data.get('content', '')
-        if not encoded_content:
+        # 通过共享的GitHub客户端获取，内容未变化时直接使用本地缓存
+        decoded_content = get_github_client().get_readme(owner, repo)
+        if not decoded_content:
             logger.warning("README内容为空")
             return "README内容为空"
             
-        decoded_content = base64.b64decode(encoded_content).decode('utf-8')
         logger.info(f"成功获取 {owner}/{repo} 的README")
         
         return decoded_content
+    except requests.exceptions.HTTPError as e:
+        status_code = e.response.status_code if e.response is not None else None
+        logger.warning(f"获取README失败，状态码: {status_code}")
+        return f"无法获取README (状态码: {status_code})"
     except Exception as e:
         logger.error(f"获取GitHub README时出错: {str(e)}")
         return f"获取README时出错: {str(e)}"
@@ -160,14 +244,13 @@ def get_answer_github(q):
     - 搜索结果内容（字符串）
     """
     try:
-        # 创建搜索器实例并添加GitHub限制
-        searcher = WebSearcher(SEARCH_API_KEY)
+        # 添加GitHub限制
         github_query = f"site:github.com {q}"
         
         # 执行GitHub搜索
-        search_results = searcher.search(github_query)
+        search_results = get_web_searcher().search(github_query)
         
-        if not search_results or search_results.startswith("搜索时发生错误") or search_results.startswith("处理搜索结果时发生错误"):
+        if _is_search_error(search_results):
             logger.warning(f"GitHub搜索失败: {search_results}")
             return "未找到相关GitHub内容。"
             
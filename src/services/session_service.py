@@ -0,0 +1,200 @@
+"""
+会话服务模块，按会话ID管理智能体实例及其对话历史
+"""
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import threading
+
+from src.config import (SESSION_MAX_SIZE, SESSION_TTL, SESSION_BACKEND, SESSION_DIR,
+                        LOG_LEVEL, LOG_FORMAT)
+from src.utils.cache_utils import TTLCache
+from src.utils.file_utils import ensure_dir
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class Session:
+    """单个会话，持有智能体实例以及串行化同一会话内请求的锁"""
+
+    def __init__(self, session_id, agent):
+        """
+        初始化会话
+
+        Args:
+            session_id (str): 会话ID
+            agent: 该会话独占的智能体实例
+        """
+        self.session_id = session_id
+        self.agent = agent
+        self.lock = threading.Lock()
+
+
+class SessionStore:
+    """会话存储类，内存中按LRU/TTL淘汰会话，可选将对话历史持久化到磁盘"""
+
+    def __init__(self, agent_factory, maxsize=SESSION_MAX_SIZE, ttl=SESSION_TTL,
+                 backend=SESSION_BACKEND, directory=SESSION_DIR):
+        """
+        初始化会话存储
+
+        Args:
+            agent_factory (callable): 以会话ID为参数构造新智能体实例的工厂函数
+            maxsize (int): 内存中最多保留的会话数
+            ttl (float): 会话空闲过期时间（秒）
+            backend (str): 存储后端，'memory' 或 'disk'
+            directory (str): 磁盘后端的存储目录
+        """
+        self.agent_factory = agent_factory
+        self.ttl = ttl
+        self.backend = backend
+        self.directory = directory
+        self._sessions = TTLCache(maxsize=maxsize, ttl=ttl, on_evict=self._on_evict)
+        self._lock = threading.Lock()
+        if self.backend == 'disk':
+            ensure_dir(self.directory)
+        logger.info(f"SessionStore 初始化完成，后端: {self.backend}")
+
+    @staticmethod
+    def new_session_id():
+        """
+        生成新的会话ID
+
+        Returns:
+            str: 会话ID
+        """
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def is_valid_session_id(session_id):
+        """
+        检查会话ID是否合法（仅允许字母、数字、下划线和短横线）
+
+        Args:
+            session_id (str): 会话ID
+
+        Returns:
+            bool: 是否合法
+        """
+        return isinstance(session_id, str) and bool(SESSION_ID_PATTERN.match(session_id))
+
+    def get(self, session_id=None):
+        """
+        获取会话，不存在时从磁盘恢复或新建
+
+        Args:
+            session_id (str): 会话ID，为空时新建会话
+
+        Returns:
+            Session: 会话对象
+        """
+        if not session_id:
+            session_id = self.new_session_id()
+        elif not self.is_valid_session_id(session_id):
+            raise ValueError(f"非法的会话ID: {session_id}")
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(session_id, self.agent_factory(session_id))
+                messages = self._load(session_id)
+                if messages:
+                    session.agent.messages = messages
+                    logger.info(f"从磁盘恢复会话 {session_id}，共 {len(messages)} 条消息")
+                self._sessions.set(session_id, session)
+        return session
+
+    def save(self, session):
+        """
+        刷新会话的过期时间，磁盘后端下同时持久化对话历史
+
+        Args:
+            session (Session): 会话对象
+        """
+        self._sessions.set(session.session_id, session)
+        self._dump(session)
+
+    def delete(self, session_id):
+        """
+        删除会话及其持久化数据
+
+        Args:
+            session_id (str): 会话ID
+        """
+        session = self._sessions.pop(session_id)
+        if session is not None:
+            self._close(session)
+        if self.backend == 'disk' and self.is_valid_session_id(session_id):
+            path = self._path(session_id)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _on_evict(self, session_id, session):
+        """
+        会话被淘汰时，磁盘后端下保存其对话历史，并释放智能体占用的资源
+        """
+        logger.info(f"会话 {session_id} 已从内存中淘汰")
+        self._dump(session)
+        self._close(session)
+
+    def _close(self, session):
+        """
+        调用智能体的close方法（如有）释放其占用的资源
+        """
+        close = getattr(session.agent, 'close', None)
+        if close is None:
+            return
+        try:
+            close()
+        except Exception as e:
+            logger.error(f"释放会话 {session.session_id} 的资源失败: {str(e)}")
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def _dump(self, session):
+        """
+        将会话的对话历史写入磁盘
+        """
+        if self.backend != 'disk':
+            return
+        path = self._path(session.session_id)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(session.agent.messages, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"保存会话 {session.session_id} 失败: {str(e)}")
+
+    def _load(self, session_id):
+        """
+        从磁盘读取会话的对话历史，已过期的文件会被删除
+
+        Returns:
+            list: 对话消息列表，不存在时返回None
+        """
+        if self.backend != 'disk':
+            return None
+        path = self._path(session_id)
+        if not os.path.exists(path):
+            return None
+        if self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl:
+            os.remove(path)
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"读取会话 {session_id} 失败: {str(e)}")
+            return None
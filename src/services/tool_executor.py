@@ -0,0 +1,219 @@
+"""
+工具执行服务模块，并发执行模型在一次回复中发起的多个工具调用
+"""
+import json
+import time
+import inspect
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from src.config import TOOL_MAX_WORKERS, TOOL_TIMEOUT, TOOL_TIMEOUTS, LOG_LEVEL, LOG_FORMAT
+from src.models.registry import HIDDEN_PARAMS
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# 共享同一Python运行环境的工具，同一回复中的多次调用之间可能存在依赖，需按顺序执行
+SERIAL_TOOLS = {"python_inter", "fig_inter", "extract_data"}
+
+# 进程内共享的线程池，限制同时执行的工具调用总数
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_tool_pool():
+    """
+    获取进程内共享的工具执行线程池
+
+    Returns:
+        ThreadPoolExecutor: 线程池
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="tool")
+        return _pool
+
+
+class ToolExecutor:
+    """工具执行器，并发执行相互独立的工具调用，并对每次调用施加超时限制"""
+
+    def __init__(self, available_tools, timeout=TOOL_TIMEOUT, timeouts=None, session_id=None):
+        """
+        初始化工具执行器
+
+        Args:
+            available_tools (dict): 工具名到函数的映射
+            timeout (float): 单次工具调用的默认超时时间（秒）
+            timeouts (dict): 按工具名覆盖的超时时间（秒）
+            session_id (str): 会话ID，会传给声明了session_id参数的工具
+        """
+        self.available_tools = available_tools
+        self.session_id = session_id
+        self.timeout = timeout
+        self.timeouts = TOOL_TIMEOUTS if timeouts is None else timeouts
+
+    def run(self, tool_calls):
+        """
+        执行一组工具调用，按完成先后产出结果
+
+        SERIAL_TOOLS 中的工具会按出现顺序在同一个任务中依次执行，
+        其余工具各自并发执行。超时的调用会返回超时提示（已在运行的线程无法被强制终止），
+        在线程池中排队的调用从提交时起计时，排队超时同样按超时处理。
+
+        Args:
+            tool_calls (list): assistant消息中的tool_calls列表
+
+        Returns:
+            生成器，产出 (tool_call, 结果字符串)
+        """
+        groups = []
+        serial_group = []
+        for tool_call in tool_calls:
+            if tool_call["function"]["name"] in SERIAL_TOOLS:
+                serial_group.append(tool_call)
+            else:
+                groups.append([tool_call])
+        if serial_group:
+            groups.append(serial_group)
+
+        pool = get_tool_pool()
+        started = {}
+        finished = {}
+        futures = {}
+        for group in groups:
+            stop = threading.Event()
+            future = pool.submit(self._run_group, group, started, finished, stop)
+            futures[future] = (group, stop, time.monotonic())
+
+        pending = set(futures)
+        reported = set()
+        while pending:
+            _, pending = wait(pending, timeout=self._next_timeout(pending, futures, started, reported),
+                              return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future, (group, stop, submitted) in futures.items():
+                # 先记录任务是否已结束，此时组内已执行调用的结果都已写入finished
+                group_done = future.done()
+                for position, tool_call in enumerate(group):
+                    call_id = tool_call["id"]
+                    if call_id in reported:
+                        continue
+                    name = tool_call["function"]["name"]
+                    timeout = self._timeout_for(tool_call)
+                    if call_id in finished:
+                        reported.add(call_id)
+                        yield tool_call, finished[call_id]
+                        continue
+                    if call_id in started:
+                        if now - started[call_id] < timeout:
+                            break
+                        logger.warning(f"工具 {name} 执行超时")
+                        result = f"工具 {name} 执行超时（超过 {timeout} 秒）"
+                    elif group_done:
+                        # 前序调用超时后工作线程已停止执行同组的后续调用
+                        reported.add(call_id)
+                        yield tool_call, f"工具 {name} 未执行：前序调用超时"
+                        continue
+                    elif future.running() or now - submitted < timeout:
+                        # 工作线程即将执行该调用，或仍在排队且未超时
+                        break
+                    else:
+                        # 线程池被超时未结束的调用占满时排队的调用无法开始，从提交时起计时
+                        logger.warning(f"工具 {name} 排队超时")
+                        result = f"工具 {name} 执行超时（排队超过 {timeout} 秒仍未开始执行）"
+                    # 通知工作线程不再执行同组的后续调用，仍在排队的任务直接取消
+                    stop.set()
+                    future.cancel()
+                    reported.add(call_id)
+                    yield tool_call, result
+                    # 同组后续调用依赖本次调用的结果，不再执行
+                    for skipped in group[position + 1:]:
+                        reported.add(skipped["id"])
+                        yield skipped, f"工具 {skipped['function']['name']} 未执行：前序调用超时"
+                    break
+                if all(tool_call["id"] in reported for tool_call in group):
+                    pending.discard(future)
+
+    def _run_group(self, group, started, finished, stop):
+        """
+        在工作线程中依次执行一组工具调用；调用是否超时由run判定，
+        被判定超时后run会设置stop，后续调用不再执行
+        """
+        for tool_call in group:
+            if stop.is_set():
+                break
+            started[tool_call["id"]] = time.monotonic()
+            finished[tool_call["id"]] = self.call(tool_call)
+
+    def call(self, tool_call):
+        """
+        执行单个工具调用
+
+        Args:
+            tool_call (dict): 工具调用字典
+
+        Returns:
+            str: 工具执行结果
+        """
+        function_name = tool_call["function"]["name"]
+        if function_name not in self.available_tools:
+            # 工具不可用
+            return f"工具 {function_name} 不可用"
+
+        try:
+            function_args = json.loads(tool_call["function"]["arguments"] or "{}")
+        except json.JSONDecodeError as e:
+            return f"工具参数不是合法的JSON: {e}"
+
+        # 获取函数参数
+        function = self.available_tools[function_name]
+        sig = inspect.signature(function)
+
+        # 准备参数
+        kwargs = {}
+        for param_name, param in sig.parameters.items():
+            if param_name in HIDDEN_PARAMS:
+                # 运行环境相关的参数不接受模型传入的值
+                continue
+            if param_name in function_args:
+                kwargs[param_name] = function_args[param_name]
+            elif param.default != inspect.Parameter.empty:
+                pass  # 使用默认值
+            else:
+                # 必需参数未提供
+                print(f"缺少必要参数: {param_name}")
+        if "session_id" in sig.parameters:
+            # 会话ID由智能体注入
+            kwargs["session_id"] = self.session_id
+
+        try:
+            return str(function(**kwargs))
+        except Exception as e:
+            logger.error(f"工具 {function_name} 执行出错: {str(e)}")
+            return f"工具 {function_name} 执行出错: {e}"
+
+    def _timeout_for(self, tool_call):
+        return self.timeouts.get(tool_call["function"]["name"], self.timeout)
+
+    def _next_timeout(self, pending, futures, started, reported):
+        """
+        计算下一次等待的时长：各组当前调用的剩余时间（运行中的从开始执行时计时，排队中的从提交时计时），
+        工作线程正在切换到组内下一个调用时最多等待0.2秒
+        """
+        now = time.monotonic()
+        remaining = []
+        for future in pending:
+            group, _, submitted = futures[future]
+            tool_call = next((tool_call for tool_call in group if tool_call["id"] not in reported), None)
+            if tool_call is None:
+                continue
+            if tool_call["id"] in started:
+                remaining.append(started[tool_call["id"]] + self._timeout_for(tool_call) - now)
+            elif future.running() or future.done():
+                remaining.append(0.2)
+            else:
+                remaining.append(submitted + self._timeout_for(tool_call) - now)
+        return max(0.0, min(remaining)) if remaining else None
@@ -0,0 +1,362 @@
+"""
+缓存工具模块，提供带过期时间的LRU缓存及其磁盘持久化版本
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from src.utils.file_utils import ensure_dir
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    线程安全的LRU缓存，支持全局及单条目的过期时间
+    """
+
+    def __init__(self, maxsize=128, ttl=None, on_evict=None):
+        """
+        初始化缓存
+
+        参数:
+        - maxsize: 最大条目数，超出后淘汰最久未使用的条目
+        - ttl: 默认过期时间（秒），None表示不过期
+        - on_evict: 条目因容量或过期被淘汰时的回调，签名为 on_evict(key, value)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        """
+        读取缓存条目，命中时将其标记为最近使用
+
+        参数:
+        - key: 缓存键
+        - default: 未命中时返回的默认值
+
+        返回:
+        - 缓存值或默认值
+        """
+        evicted = None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                evicted = (key, self._data.pop(key)[0])
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+        if evicted is not None:
+            self._notify_evict([evicted])
+        return default if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        """
+        写入缓存条目
+
+        参数:
+        - key: 缓存键
+        - value: 缓存值
+        - ttl: 该条目的过期时间（秒），默认使用缓存的ttl
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        evicted = []
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            evicted.extend(self._purge_expired())
+            while len(self._data) > self.maxsize:
+                old_key, (old_value, _) = self._data.popitem(last=False)
+                evicted.append((old_key, old_value))
+        self._notify_evict(evicted)
+
+    def pop(self, key, default=None):
+        """
+        移除并返回缓存条目（不触发淘汰回调）
+
+        参数:
+        - key: 缓存键
+        - default: 条目不存在时返回的默认值
+
+        返回:
+        - 缓存值或默认值
+        """
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        """
+        清空缓存（不触发淘汰回调）
+        """
+        with self._lock:
+            self._data.clear()
+
+    def expire(self):
+        """
+        主动清理所有已过期的条目
+        """
+        with self._lock:
+            evicted = self._purge_expired()
+        self._notify_evict(evicted)
+
+    def keys(self):
+        """
+        返回当前所有缓存键（按最久未使用到最近使用排序）
+        """
+        with self._lock:
+            return list(self._data.keys())
+
+    def stats(self):
+        """
+        返回缓存的命中统计信息
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and (entry[1] is None or entry[1] > time.monotonic())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def _purge_expired(self):
+        """
+        移除已过期的条目，调用方需持有锁
+
+        返回:
+        - 被移除的 (key, value) 列表
+        """
+        now = time.monotonic()
+        expired = [key for key, (_, expires_at) in self._data.items()
+                   if expires_at is not None and expires_at <= now]
+        return [(key, self._data.pop(key)[0]) for key in expired]
+
+    def _notify_evict(self, evicted):
+        """
+        在锁外调用淘汰回调
+        """
+        if self.on_evict is None:
+            return
+        for key, value in evicted:
+            self.on_evict(key, value)
+
+
+def make_cache_key(*parts):
+    """
+    将任意可JSON序列化的参数计算为稳定的缓存键（字典按键排序）
+
+    参数:
+    - parts: 参与计算的参数
+
+    返回:
+    - 十六进制SHA-256摘要，可直接用作文件名
+    """
+    text = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PersistentCache:
+    """
+    两级缓存：内存中为TTLCache，磁盘上每个条目保存为一个JSON文件。
+    磁盘条目按写入时间过期，总大小超出上限时按最近访问时间从旧到新删除
+    """
+
+    def __init__(self, directory, maxsize=128, ttl=None, max_bytes=None):
+        """
+        初始化缓存，目录不存在时自动创建
+
+        参数:
+        - directory: 磁盘缓存目录
+        - maxsize: 内存中最多保留的条目数
+        - ttl: 过期时间（秒），None表示不过期
+        - max_bytes: 磁盘缓存的总大小上限（字节），None表示不限制
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.disk_hits = 0
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        ensure_dir(directory)
+
+    def get(self, key, default=None):
+        """
+        读取缓存条目，内存未命中时从磁盘读取
+
+        参数:
+        - key: make_cache_key生成的缓存键
+        - default: 未命中时返回的默认值
+
+        返回:
+        - 缓存值或默认值
+        """
+        value = self._memory.get(key)
+        if value is not None:
+            return value
+        entry = self._read(key)
+        if entry is None:
+            return default
+        remaining = None if self.ttl is None else self.ttl - (time.time() - entry["created"])
+        self._memory.set(key, entry["value"], ttl=remaining)
+        with self._lock:
+            self.disk_hits += 1
+        return entry["value"]
+
+    def set(self, key, value):
+        """
+        写入缓存条目（value需可被JSON序列化）
+
+        参数:
+        - key: make_cache_key生成的缓存键
+        - value: 缓存值
+        """
+        self._memory.set(key, value)
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"created": time.time(), "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"写入磁盘缓存失败: {str(e)}")
+            return
+        self.prune()
+
+    def prune(self):
+        """
+        删除已过期的磁盘条目，并在总大小超出上限时删除最久未访问的条目
+        """
+        now = time.time()
+        entries = []
+        with self._lock:
+            for item in os.scandir(self.directory):
+                if not item.name.endswith(".json"):
+                    continue
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue
+                # 文件修改时间即写入时间，访问时间在每次命中时刷新
+                if self.ttl is not None and now - stat.st_mtime > self.ttl:
+                    self._remove(item.path)
+                    continue
+                entries.append((stat.st_atime, stat.st_size, item.path))
+            if self.max_bytes is None:
+                return
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    def stats(self):
+        """
+        返回缓存的命中统计信息
+        """
+        stats = self._memory.stats()
+        stats["disk_hits"] = self.disk_hits
+        return stats
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read(self, key):
+        """
+        读取磁盘条目，过期或损坏的文件会被删除
+
+        返回:
+        - {"created": 写入时间, "value": 缓存值}，不存在时返回None
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"磁盘缓存文件损坏，已删除: {str(e)}")
+            self._remove(path)
+            return None
+        if self.ttl is not None and time.time() - entry["created"] > self.ttl:
+            self._remove(path)
+            return None
+        # 刷新访问时间，供按最近访问淘汰使用（保持修改时间不变）
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except OSError:
+            pass
+        return entry
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class SingleFlight:
+    """
+    合并并发的相同计算：同一个键同一时间只执行一次，其余调用等待并共享其结果或异常
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+        执行或等待键对应的计算
+
+        参数:
+        - key: 计算的键
+        - func: 无参数的计算函数
+
+        返回:
+        - (计算结果, 是否由本次调用执行)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "result": None, "error": None}
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"], False
+        try:
+            call["result"] = func()
+            return call["result"], True
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call["done"].set()
@@ -0,0 +1,41 @@
+"""
+DataFrame工具模块，提供列类型压缩与Feather文件加载功能
+"""
+import pandas as pd
+
+
+def compact_dtypes(df, category_ratio=0.5):
+    """
+    压缩DataFrame的列类型：重复值较多的字符串列转换为category。
+    整数列保持int64、浮点列保持float64，避免后续计算溢出或损失精度。
+
+    参数:
+    - df: DataFrame
+    - category_ratio: 不同取值数占行数的比例低于该值的字符串列转换为category
+
+    返回:
+    - 压缩后的DataFrame
+    """
+    for column in df.columns:
+        series = df[column]
+        if series.dtype == object and len(series) and series.nunique(dropna=True) < len(series) * category_ratio:
+            try:
+                df[column] = series.astype('category')
+            except TypeError:
+                pass
+    return df
+
+
+def load_feather(path):
+    """
+    以内存映射方式读取Feather文件并压缩列类型（需要安装pyarrow）
+
+    参数:
+    - path: Feather文件路径
+
+    返回:
+    - DataFrame
+    """
+    import pyarrow.feather as feather
+    table = feather.read_table(path, memory_map=True)
+    return compact_dtypes(table.to_pandas(split_blocks=True, self_destruct=True))
@@ -0,0 +1,65 @@
+"""
+HTTP工具模块，提供进程内共享、带连接池与自动重试的requests会话
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.config import HTTP_POOL_SIZE, HTTP_RETRIES, HTTP_BACKOFF, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+
+# 默认的 (连接超时, 读取超时)，单位秒
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+# 遇到这些状态码时按指数退避重试
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def create_session(pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF):
+    """
+    创建带连接池与重试策略的requests会话
+
+    参数:
+    - pool_size: 每个主机保持的最大连接数
+    - retries: 连接失败或返回可重试状态码时的最大重试次数
+    - backoff: 指数退避的基数（秒），第n次重试前等待 backoff * 2^(n-1) 秒，服务端返回Retry-After时以其为准
+
+    返回:
+    - requests.Session
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUS_CODES,
+        # 搜索接口使用POST，需要显式允许重试
+        allowed_methods=frozenset({"GET", "HEAD", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """
+    获取进程内共享的requests会话，复用keep-alive连接与TLS会话
+
+    返回:
+    - requests.Session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
@@ -0,0 +1,248 @@
+"""
+结果渲染工具模块，将工具执行结果转换为长度受限、按类型摘要的文本
+"""
+import sys
+import json
+import itertools
+
+from src.config import RESULT_MAX_CHARS, RESULT_MAX_TOKENS, RESULT_PREVIEW_ROWS, RESULT_STORE_SIZE
+from src.utils.cache_utils import TTLCache
+from src.utils.token_utils import count_tokens, truncate_tokens
+
+
+class ResultStore:
+    """
+    被截断结果的原始对象存储，模型可通过句柄分段查看完整内容
+    """
+
+    def __init__(self, prefix, maxsize=RESULT_STORE_SIZE):
+        """
+        初始化结果存储
+
+        参数:
+        - prefix: 句柄前缀，用于区分结果来源（如 'py'、'sql'）
+        - maxsize: 最多保留的结果数，超出后淘汰最久未使用的结果
+        """
+        self.prefix = prefix
+        self._objects = TTLCache(maxsize=maxsize)
+        self._counter = itertools.count(1)
+
+    def put(self, obj):
+        """
+        保存对象并返回句柄
+        """
+        handle = f"{self.prefix}-{next(self._counter)}"
+        self._objects.set(handle, obj)
+        return handle
+
+    def get(self, handle):
+        """
+        根据句柄读取对象，不存在时返回None
+        """
+        return self._objects.get(handle)
+
+
+def _pandas():
+    # 仅在pandas已被导入时才可能出现DataFrame，避免为渲染而导入重量级依赖
+    return sys.modules.get('pandas')
+
+
+def _numpy():
+    return sys.modules.get('numpy')
+
+
+# 逐个元素渲染的内置容器类型及其括号
+_BRACKETS = {
+    list: ('[', ']'),
+    tuple: ('(', ')'),
+    set: ('{', '}'),
+    frozenset: ('frozenset({', '})'),
+    dict: ('{', '}'),
+}
+
+
+def summarize(obj, preview_rows=RESULT_PREVIEW_ROWS, max_chars=RESULT_MAX_CHARS):
+    """
+    按对象类型生成摘要文本：DataFrame给出形状、列类型及首尾若干行，ndarray给出形状与统计量，
+    列表、元组、集合与字典只渲染开头约max_chars个字符的元素
+
+    参数:
+    - obj: 任意对象
+    - preview_rows: DataFrame/Series首尾各展示的行数
+    - max_chars: 容器类对象的渲染字符数上限，0表示不限制
+
+    返回:
+    - 摘要文本
+    """
+    pd = _pandas()
+    np = _numpy()
+    if pd is not None and isinstance(obj, pd.DataFrame):
+        if len(obj) <= preview_rows * 2:
+            return f"DataFrame shape={obj.shape}\n{obj.to_string()}"
+        dtypes = ", ".join(f"{column}: {dtype}" for column, dtype in obj.dtypes.items())
+        return (f"DataFrame shape={obj.shape}\n列类型: {dtypes}\n"
+                f"前{preview_rows}行:\n{obj.head(preview_rows).to_string()}\n"
+                f"后{preview_rows}行:\n{obj.tail(preview_rows).to_string()}")
+    if pd is not None and isinstance(obj, pd.Series):
+        if len(obj) <= preview_rows * 2:
+            return f"Series name={obj.name} length={len(obj)} dtype={obj.dtype}\n{obj.to_string()}"
+        return (f"Series name={obj.name} length={len(obj)} dtype={obj.dtype}\n"
+                f"前{preview_rows}项:\n{obj.head(preview_rows).to_string()}\n"
+                f"后{preview_rows}项:\n{obj.tail(preview_rows).to_string()}")
+    if np is not None and isinstance(obj, np.ndarray):
+        text = f"ndarray shape={obj.shape} dtype={obj.dtype}"
+        if obj.size and np.issubdtype(obj.dtype, np.number):
+            text += (f"\nmin={obj.min()} max={obj.max()} mean={obj.mean()} "
+                     f"std={obj.std()} sum={obj.sum()}")
+        return text + "\n" + np.array2string(obj, threshold=preview_rows * 4, edgeitems=max(preview_rows // 2, 1))
+    if isinstance(obj, dict):
+        if any(_is_large(value) for value in obj.values()):
+            return "\n".join(f"{key} = {summarize(value, preview_rows)}" for key, value in obj.items())
+    if max_chars and type(obj) in _BRACKETS:
+        return _render_items(obj, max_chars)
+    return str(obj)
+
+
+def _render_items(obj, max_chars):
+    """
+    按str(obj)的格式逐个渲染容器中的元素，累计长度超过max_chars后停止（超出部分由render_result截断），
+    避免为展示开头部分而先将整个容器转换为字符串
+    """
+    if not obj:
+        return str(obj)
+    opening, closing = _BRACKETS[type(obj)]
+    if type(obj) is tuple and len(obj) == 1:
+        closing = ',)'
+    is_dict = type(obj) is dict
+    parts, used = [], len(opening)
+    for item in (obj.items() if is_dict else obj):
+        budget = max_chars - used
+        if is_dict:
+            text = f"{_render_value(item[0], budget)}: {_render_value(item[1], budget)}"
+        else:
+            text = _render_value(item, budget)
+        parts.append(text)
+        used += len(text) + 2
+        if used > max_chars:
+            return opening + ", ".join(parts) + ", ..."
+    return opening + ", ".join(parts) + closing
+
+
+def _render_value(value, max_chars):
+    max_chars = max(max_chars, 1)
+    if type(value) in _BRACKETS:
+        return _render_items(value, max_chars)
+    if isinstance(value, str) and len(value) > max_chars:
+        return repr(value[:max_chars]) + "..."
+    return repr(value)
+
+
+def _is_large(obj):
+    pd = _pandas()
+    np = _numpy()
+    return ((pd is not None and isinstance(obj, (pd.DataFrame, pd.Series)))
+            or (np is not None and isinstance(obj, np.ndarray)))
+
+
+def render_result(obj, store=None, max_chars=RESULT_MAX_CHARS, max_tokens=RESULT_MAX_TOKENS):
+    """
+    将结果渲染为不超过字符数与token数上限的文本，超限时截断并在store中保存原始对象
+
+    参数:
+    - obj: 任意对象（字符串会原样按上限截断）
+    - store: ResultStore实例，为None时只截断不保存
+    - max_chars: 字符数上限
+    - max_tokens: token数上限
+
+    返回:
+    - 渲染后的文本
+    """
+    text = obj if isinstance(obj, str) else summarize(obj, max_chars=max_chars)
+    truncated = False
+    if max_chars and len(text) > max_chars:
+        text = text[:max_chars]
+        truncated = True
+    if max_tokens and count_tokens(text) > max_tokens:
+        text = truncate_tokens(text, max_tokens)
+        truncated = True
+    if not truncated and not _needs_handle(obj):
+        return text
+
+    if store is None:
+        return text + "\n...（结果过长，已截断）"
+    handle = store.put(obj)
+    return (text + f"\n...（结果过长，已截断。可调用 expand_result 工具并传入 handle='{handle}'、"
+                   f"offset 与 limit 分段查看完整内容）")
+
+
+def _needs_handle(obj):
+    """
+    摘要未能展示全部数据的对象（大DataFrame、大数组）也需要句柄
+    """
+    pd = _pandas()
+    np = _numpy()
+    if pd is not None and isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj) > RESULT_PREVIEW_ROWS * 2
+    if np is not None and isinstance(obj, np.ndarray):
+        return obj.size > RESULT_PREVIEW_ROWS * 4
+    if isinstance(obj, dict):
+        return any(_needs_handle(value) for value in obj.values())
+    return False
+
+
+def expand(obj, offset=0, limit=50, max_chars=RESULT_MAX_CHARS, max_tokens=RESULT_MAX_TOKENS):
+    """
+    分段展示对象的一部分：DataFrame/Series/数组/列表/集合按行或元素切片，
+    包含多个变量的结果对每个大对象取同一区间，其他对象按文本行切片
+
+    参数:
+    - obj: 保存在ResultStore中的原始对象
+    - offset: 起始行（元素）序号
+    - limit: 展示的行（元素）数
+
+    返回:
+    - 分段内容文本
+    """
+    offset, limit = max(int(offset), 0), max(int(limit), 1)
+    if isinstance(obj, dict) and len(obj) == 1:
+        obj = next(iter(obj.values()))
+    total, text = _window(obj, offset, limit)
+    header = f"第 {offset} 至 {min(offset + limit, total)} 项（共 {total} 项）:\n"
+    return render_result(header + text, max_chars=max_chars, max_tokens=max_tokens)
+
+
+def _window(obj, offset, limit):
+    """
+    先切片再渲染，只将区间内的数据转换为文本
+
+    返回:
+    - (总行数或元素数, 区间内容文本)
+    """
+    pd = _pandas()
+    np = _numpy()
+    if pd is not None and isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj), obj.iloc[offset:offset + limit].to_string()
+    if np is not None and isinstance(obj, np.ndarray):
+        if not obj.ndim:
+            return 1, np.array2string(obj)
+        return len(obj), np.array2string(obj[offset:offset + limit], threshold=sys.maxsize)
+    if isinstance(obj, (list, tuple)):
+        return len(obj), json.dumps(list(obj[offset:offset + limit]), ensure_ascii=False, default=str)
+    if isinstance(obj, (set, frozenset)):
+        items = list(itertools.islice(obj, offset, offset + limit))
+        return len(obj), json.dumps(items, ensure_ascii=False, default=str)
+    if isinstance(obj, dict):
+        if any(_is_large(value) for value in obj.values()):
+            total, parts = 0, []
+            for key, value in obj.items():
+                if _is_large(value):
+                    count, text = _window(value, offset, limit)
+                    total = max(total, count)
+                    parts.append(f"{key} =\n{text}")
+                else:
+                    parts.append(f"{key} = {summarize(value)}")
+            return total, "\n".join(parts)
+        items = itertools.islice(obj.items(), offset, offset + limit)
+        return len(obj), "\n".join(f"{key}: {value}" for key, value in items)
+    lines = (obj if isinstance(obj, str) else str(obj)).splitlines()
+    return len(lines), "\n".join(lines[offset:offset + limit])
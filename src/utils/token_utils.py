@@ -0,0 +1,122 @@
+"""
+Token计数工具模块，基于tiktoken估算文本及对话消息的token数
+"""
+import json
+import logging
+
+from src.config import TOKENIZER_ENCODING, LOG_LEVEL, LOG_FORMAT
+
+# 配置日志
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# 每条消息除内容外的固定开销（role、分隔符等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+_encoding_loaded = False
+
+
+def get_encoding():
+    """
+    获取tiktoken编码器，加载失败（如未安装或无法下载编码文件）时返回None
+
+    返回:
+    - tiktoken.Encoding 或 None
+    """
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception as e:
+            logger.warning(f"tiktoken编码器加载失败，将按字符数估算token: {str(e)}")
+            _encoding = None
+    return _encoding
+
+
+def count_tokens(text):
+    """
+    计算文本的token数
+
+    参数:
+    - text: 字符串
+
+    返回:
+    - token数（int）
+    """
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # 粗略估算：中日韩字符约1个token，其余约4个字符1个token
+    wide = sum(1 for char in text if ord(char) > 0x2E80)
+    return wide + (len(text) - wide + 3) // 4
+
+
+def truncate_tokens(text, max_tokens):
+    """
+    将文本截断到指定的token数以内
+
+    参数:
+    - text: 字符串
+    - max_tokens: 最大token数
+
+    返回:
+    - 截断后的字符串
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    # 无编码器时按估算比例二分查找截断位置
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low]
+
+
+def count_message_tokens(message):
+    """
+    计算单条对话消息的token数
+
+    参数:
+    - message: 消息字典
+
+    返回:
+    - token数（int）
+    """
+    tokens = MESSAGE_OVERHEAD_TOKENS
+    content = message.get("content")
+    if isinstance(content, str):
+        tokens += count_tokens(content)
+    elif isinstance(content, list):
+        tokens += sum(count_tokens(part.get("text", "")) for part in content if isinstance(part, dict))
+    if message.get("name"):
+        tokens += count_tokens(message["name"])
+    for tool_call in message.get("tool_calls") or []:
+        tokens += count_tokens(tool_call["function"]["name"])
+        tokens += count_tokens(tool_call["function"]["arguments"])
+    return tokens
+
+
+def count_tools_tokens(tools):
+    """
+    计算工具定义列表的token数
+
+    参数:
+    - tools: 工具定义列表
+
+    返回:
+    - token数（int）
+    """
+    if not tools:
+        return 0
+    return count_tokens(json.dumps(tools, ensure_ascii=False))
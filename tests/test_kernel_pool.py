@@ -0,0 +1,44 @@
+"""
+内核池在gevent monkey patch后的服务进程中的行为测试
+"""
+import os
+import sys
+import subprocess
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 与main.py相同：先打补丁，再启动内核池
+SCRIPT = textwrap.dedent("""
+    from gevent import monkey
+    monkey.patch_all()
+
+    import time
+    from src.services.kernel_pool import get_kernel_pool
+    from src.services.python_service import python_inter
+
+    if __name__ == "__main__":
+        pool = get_kernel_pool()
+        try:
+            print("first:", python_inter("x = 41", session_id="s1"))
+            # 空闲一段时间后工作进程仍应存活，会话中的变量仍应保留
+            time.sleep(1)
+            print("second:", python_inter("x + 1", session_id="s1"))
+            print("third:", python_inter("x + 2", session_id="s1"))
+        finally:
+            pool.shutdown()
+""")
+
+
+def test_kernel_pool_keeps_session_under_gevent(tmp_path):
+    script = tmp_path / "run_pool.py"
+    script.write_text(SCRIPT, encoding="utf-8")
+    env = dict(os.environ, PYTHONPATH=ROOT, KERNEL_POOL_ENABLED="true", KERNEL_POOL_SIZE="1")
+    env.setdefault("API_KEY", "test")
+    completed = subprocess.run([sys.executable, str(script)], cwd=ROOT, env=env, capture_output=True,
+                               text=True, timeout=120)
+    output = completed.stdout
+    assert completed.returncode == 0, completed.stderr
+    assert "second: 42" in output, output
+    assert "third: 43" in output, output
+    assert "运行环境已重启" not in output, output